@@ -41,6 +41,15 @@ Message.init(
       type: DataTypes.BOOLEAN,
       defaultValue: false,
     },
+    // Lease held by an extraction run that claimed this message
+    claimed_by: {
+      type: DataTypes.STRING,
+      allowNull: true,
+    },
+    claim_expires_at: {
+      type: DataTypes.DATE,
+      allowNull: true,
+    },
   },
   {
     sequelize,
@@ -13,6 +13,7 @@ class Transaction extends Model {
   public transaction_date!: Date;
   public description?: string;
   public reference_id?: string;
+  public source_message_id?: string;
   public created_at!: Date;
   public updated_at!: Date;
 }
@@ -1,4 +1,5 @@
 import { Router } from "express";
+import { Op } from "sequelize";
 import { Message } from "../models/messageModel";
 import Transaction from "../models/transactionsModel";
 import { processUnprocessedMessages, getProcessingStatus } from "../controllers/processingController";
@@ -10,10 +11,24 @@ const router = Router();
 router.get("/messages/unprocessed", async (req, res) => {
   try {
     const limit = req.query.limit ? parseInt(req.query.limit as string) : null;
+    // Optional keyset cursor: only messages with an id after the last one seen
+    const after = req.query.after ? (req.query.after as string) : null;
+    // Messages under a live claim belong to another run
     const queryOptions: any = {
-      where: { processed: false }
+      where: {
+        processed: false,
+        [Op.or]: [
+          { claim_expires_at: null },
+          { claim_expires_at: { [Op.lt]: new Date() } }
+        ]
+      },
+      order: [["id", "ASC"]]
     };
     
+    if (after) {
+      queryOptions.where.id = { [Op.gt]: after };
+    }
+    
     if (limit) {
       queryOptions.limit = limit;
     }
@@ -26,6 +41,78 @@ router.get("/messages/unprocessed", async (req, res) => {
   }
 });
 
+// Claim unprocessed messages under a lease so concurrent runs split the backlog
+router.post("/messages/claim", async (req, res) => {
+  try {
+    const limit = req.body.limit ? parseInt(req.body.limit) : 500;
+    const leaseSeconds = req.body.leaseSeconds ? parseInt(req.body.leaseSeconds) : 300;
+    const leaseId = require('uuid').v4();
+    const now = new Date();
+    const expiresAt = new Date(now.getTime() + leaseSeconds * 1000);
+
+    const transaction = await sequelize.transaction();
+    try {
+      // Unclaimed or expired rows only; rows locked by another claim are skipped
+      const messages = await Message.findAll({
+        where: {
+          processed: false,
+          [Op.or]: [
+            { claim_expires_at: null },
+            { claim_expires_at: { [Op.lt]: now } }
+          ]
+        },
+        order: [["id", "ASC"]],
+        limit,
+        lock: transaction.LOCK.UPDATE,
+        skipLocked: true,
+        transaction
+      });
+
+      if (messages.length > 0) {
+        await Message.update(
+          { claimed_by: leaseId, claim_expires_at: expiresAt },
+          { where: { id: messages.map((message: any) => message.id) }, transaction }
+        );
+      }
+
+      await transaction.commit();
+      res.json({ leaseId, expiresAt, messages });
+    } catch (error) {
+      await transaction.rollback();
+      throw error;
+    }
+  } catch (error) {
+    console.error("Error claiming messages:", error);
+    res.status(500).json({ error: "Failed to claim messages" });
+  }
+});
+
+// Release a lease (or part of it) so the messages can be claimed again
+router.post("/messages/release", async (req, res) => {
+  try {
+    const { leaseId, messageIds } = req.body;
+    if (!leaseId) {
+      res.status(400).json({ error: "leaseId is required" });
+      return;
+    }
+
+    const where: any = { claimed_by: leaseId, processed: false };
+    if (messageIds && messageIds.length > 0) {
+      where.id = messageIds;
+    }
+
+    const [released] = await Message.update(
+      { claimed_by: null, claim_expires_at: null },
+      { where }
+    );
+
+    res.json({ success: true, released });
+  } catch (error) {
+    console.error("Error releasing messages:", error);
+    res.status(500).json({ error: "Failed to release messages" });
+  }
+});
+
 // Process all unprocessed messages
 router.post("/messages/process-all", processUnprocessedMessages);
 
@@ -59,9 +146,27 @@ router.post("/transactions/bulk-create", async (req, res) => {
           existingRefIds = new Set(existingTransactions.map(t => t.reference_id));
         }
         
+        // A retried chunk whose first attempt committed (the response was lost)
+        // finds its transactions here, so resending a chunk never saves it twice
+        const sourceMessageIds = transactions
+          .map((txn: any) => txn.source_message_id)
+          .filter((id: any) => id !== null && id !== undefined);
+        
+        let existingSourceIds = new Set();
+        
+        if (sourceMessageIds.length > 0) {
+          const savedTransactions = await Transaction.findAll({
+            where: { source_message_id: sourceMessageIds },
+            attributes: ['source_message_id'],
+            transaction
+          });
+          existingSourceIds = new Set(savedTransactions.map(t => t.source_message_id));
+        }
+        
         // Add UUID and validate transaction data before insertion
         transactionsWithIds = transactions
           .filter((txn: any) => !txn.reference_id || !existingRefIds.has(txn.reference_id))
+          .filter((txn: any) => !txn.source_message_id || !existingSourceIds.has(txn.source_message_id))
           .map((txn: any) => {
             if (!txn.user_id || !txn.amount || !txn.transaction_type || !txn.transaction_date) {
               throw new Error(`Invalid transaction data: ${JSON.stringify(txn)}`);
@@ -1,5 +1,16 @@
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import path from 'path';
+import readline from 'readline';
+
+interface PendingJob {
+    resolve: (result: { processed: number; transactions: number }) => void;
+    reject: (error: Error) => void;
+}
+
+// One warm `run_extraction.py --daemon` process shared by every PythonProcessor
+let daemon: ChildProcessWithoutNullStreams | null = null;
+let nextJobId = 1;
+const pendingJobs = new Map<string, PendingJob>();
 
 export class PythonProcessor {
     private pythonPath: string;
@@ -10,47 +21,75 @@ export class PythonProcessor {
         this.scriptPath = path.join(__dirname, '../../../data_processing/run_extraction.py');
     }
 
+    private getDaemon(): ChildProcessWithoutNullStreams {
+        if (daemon) {
+            return daemon;
+        }
+
+        const child = spawn(this.pythonPath, [this.scriptPath, '--daemon'], {
+            env: { ...process.env, PYTHONIOENCODING: 'utf-8', PYTHONUNBUFFERED: '1' }
+        });
+
+        // stdout carries one JSON reply per line; logs arrive on stderr
+        readline.createInterface({ input: child.stdout }).on('line', (line) => {
+            let reply: any;
+            try {
+                reply = JSON.parse(line);
+            } catch {
+                console.log(`🐍 ${line.trim()}`);
+                return;
+            }
+
+            const job = pendingJobs.get(String(reply.id));
+            if (!job) {
+                return;
+            }
+            pendingJobs.delete(String(reply.id));
+
+            if (reply.ok) {
+                job.resolve({ processed: reply.processed || 0, transactions: reply.transactions || 0 });
+            } else {
+                job.reject(new Error(`Python processing failed: ${reply.error || 'Unknown error'}`));
+            }
+        });
+
+        child.stderr.on('data', (data) => {
+            console.log(`🐍 ${data.toString().trim()}`);
+        });
+
+        const fail = (error: Error) => {
+            if (daemon === child) {
+                daemon = null;
+            }
+            for (const job of pendingJobs.values()) {
+                job.reject(error);
+            }
+            pendingJobs.clear();
+        };
+
+        child.on('exit', (code) => fail(new Error(`Python daemon exited with code ${code}`)));
+        child.on('error', (error) => fail(new Error(`Failed to start Python process: ${error.message}`)));
+
+        daemon = child;
+        return child;
+    }
+
     async processMessages(limit: number | null = null): Promise<{ processed: number; transactions: number }> {
         return new Promise((resolve, reject) => {
-            const args = [this.scriptPath];
+            const id = String(nextJobId++);
+            // Claim under a lease, so a manual run_extraction.py alongside the daemon splits the backlog
+            const job: { id: string; limit?: number; claim: boolean } = { id, claim: true };
             if (limit) {
-                args.push('--limit', limit.toString());
+                job.limit = limit;
+            }
+
+            pendingJobs.set(id, { resolve, reject });
+            try {
+                this.getDaemon().stdin.write(JSON.stringify(job) + '\n');
+            } catch (error) {
+                pendingJobs.delete(id);
+                reject(new Error(`Failed to send job to Python process: ${error instanceof Error ? error.message : error}`));
             }
-            const pythonProcess = spawn(this.pythonPath, args, {
-                env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
-            });
-            
-            let output = '';
-            let errorOutput = '';
-
-            pythonProcess.stdout.on('data', (data) => {
-                output += data.toString();
-                console.log(`🐍 ${data.toString().trim()}`);
-            });
-
-            pythonProcess.stderr.on('data', (data) => {
-                errorOutput += data.toString();
-                console.error(`🐍 Error: ${data.toString().trim()}`);
-            });
-
-            pythonProcess.on('close', (code) => {
-                if (code === 0) {
-                    // Parse output for results
-                    const processedMatch = output.match(/processed (\d+) messages/);
-                    const transactionsMatch = output.match(/created (\d+) transactions/);
-                    
-                    resolve({
-                        processed: processedMatch ? parseInt(processedMatch[1]) : 0,
-                        transactions: transactionsMatch ? parseInt(transactionsMatch[1]) : 0
-                    });
-                } else {
-                    reject(new Error(`Python process failed with code ${code}: ${errorOutput}`));
-                }
-            });
-
-            pythonProcess.on('error', (error) => {
-                reject(new Error(`Failed to start Python process: ${error.message}`));
-            });
         });
     }
-}
\ No newline at end of file
+}
@@ -1,11 +1,44 @@
+import math
+import threading
 from flask import Flask, request, jsonify
 from transaction_extractor import TransactionExtractor
+from enhanced_confidence_extractor import TRANSACTION_TYPES
+from job_queue import JobQueue
+from rule_pack import RULE_PACK_PATH, current_rule_pack, reload_rule_pack
 
 app = Flask(__name__)
 
 # Initialize the transaction extractor
 API_BASE_URL = "http://localhost:5000/api"
 extractor = TransactionExtractor(API_BASE_URL)
+extractor_lock = threading.Lock()
+
+# Batch runs happen in the background; requests only enqueue them
+jobs = JobQueue(API_BASE_URL, max_workers=2)
+
+def _current_extractor() -> TransactionExtractor:
+    """The request extractor, rebuilt once after a rule pack reload.
+    
+    Requests already holding the previous extractor finish on the old pack.
+    """
+    global extractor
+    rule_pack = current_rule_pack()
+    if extractor.rule_pack is not rule_pack:
+        with extractor_lock:
+            if extractor.rule_pack is not rule_pack:
+                extractor = TransactionExtractor(API_BASE_URL, rule_pack=rule_pack)
+    return extractor
+
+def _job_accepted(job):
+    """202 response pointing at the job's progress endpoint"""
+    if job is None:
+        return jsonify({'error': 'Too many extraction jobs queued, try again later'}), 429
+    return jsonify({
+        'message': 'Processing job queued',
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': f"/api/jobs/{job['id']}"
+    }), 202
 
 @app.route('/api/process-message', methods=['POST'])
 def process_message():
@@ -18,7 +51,7 @@ def process_message():
             return jsonify({'error': 'Message data required'}), 400
         
         # Process the message
-        success = extractor.process_single_message(message)
+        success = _current_extractor().process_single_message(message)
         
         if success:
             return jsonify({
@@ -36,87 +69,90 @@ def process_message():
 
 @app.route('/api/process-batch', methods=['POST'])
 def process_batch():
-    """Process batch of unprocessed messages"""
+    """Queue a batch run over unprocessed messages"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         limit = data.get('limit', 500)
         
-        # Fetch and process messages
-        messages = extractor.fetch_unprocessed_messages_with_limit(limit)
-        
-        if not messages:
-            return jsonify({
-                'message': 'No unprocessed messages found',
-                'processed': 0,
-                'transactions': 0
-            })
-        
-        transactions = []
-        processed_message_ids = []
-        
-        for message in messages:
-            transaction = extractor.extract_transaction_data(message)
-            if transaction:
-                transactions.append(transaction)
-            processed_message_ids.append(message['id'])
-        
-        # Save to database
-        success = extractor.save_transactions(transactions, processed_message_ids)
-        
-        if success:
-            return jsonify({
-                'message': 'Processing completed successfully',
-                'processed': len(messages),
-                'transactions': len(transactions)
-            })
-        else:
-            return jsonify({'error': 'Failed to save transactions'}), 500
+        # Claim, extract and save in overlapping chunks on a background worker
+        return _job_accepted(jobs.submit(limit, pipelined=True, claim=True))
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/auto-process', methods=['POST'])
 def auto_process():
-    """Automatically process all unprocessed messages"""
+    """Queue a run over all unprocessed messages"""
     try:
         print("🚀 Auto-processing triggered with confidence-based extraction...")
         
-        # Fetch and process all unprocessed messages
-        messages = extractor.fetch_unprocessed_messages_with_limit(1000)  # Process up to 1000
-        
-        if not messages:
-            print("No unprocessed messages found")
-            return jsonify({
-                'message': 'No unprocessed messages found',
-                'processed': 0,
-                'transactions': 0
-            })
-        
-        transactions = []
-        processed_message_ids = []
-        
-        for message in messages:
-            transaction = extractor.extract_transaction_data(message)
-            if transaction:
-                transactions.append(transaction)
-            processed_message_ids.append(message['id'])
+        job = jobs.submit(1000, pipelined=True, claim=True)  # Process up to 1000
+        if job:
+            print(f"Auto-processing queued as job {job['id']}")
+        return _job_accepted(job)
+            
+    except Exception as e:
+        print(f"Auto-processing error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/extract-batch', methods=['POST'])
+def extract_batch():
+    """Extract a list of messages without saving them; results come back as columns"""
+    try:
+        data = request.get_json(silent=True) or {}
+        messages = data.get('messages')
+        
+        if not isinstance(messages, list):
+            return jsonify({'error': 'List of messages required'}), 400
+        
+        columns = _current_extractor().confidence_extractor.extract_batch(
+            [message.get('message_body', '') for message in messages],
+            [message.get('sender', '') for message in messages],
+            debug=bool(data.get('debug'))
+        )
+        # JSON has no NaN, and type names read better than codes
+        columns['amount'] = [None if math.isnan(amount) else amount for amount in columns['amount']]
+        columns['type'] = [TRANSACTION_TYPES[code] for code in columns['type']]
+        columns['is_transaction'] = [bool(flag) for flag in columns['is_transaction']]
+        if 'extractor_results' in columns:
+            columns['extractor_results'] = [[vote.to_dict() for vote in votes] for votes in columns['extractor_results']]
+        return jsonify({key: list(values) for key, values in columns.items()})
         
-        # Save to database
-        success = extractor.save_transactions(transactions, processed_message_ids)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/rules/reload', methods=['POST'])
+def reload_rules():
+    """Recompile the rule pack file and swap it in; running jobs and requests finish on the old one"""
+    try:
+        previous = current_rule_pack()
         
-        result = {
-            'message': 'Auto-processing completed',
-            'processed': len(messages),
-            'transactions': len(transactions)
-        }
+        # Compiled before the swap, so nothing waits on it
+        rule_pack = reload_rule_pack(RULE_PACK_PATH)
+        print(f"Rule pack reloaded: version {previous.version} -> {rule_pack.version}")
+        return jsonify({
+            'success': True,
+            'previous_version': previous.version,
+            'version': rule_pack.version
+        })
         
-        print(f"Auto-processing result: {result}")
-        return jsonify(result)
-            
     except Exception as e:
-        print(f"Auto-processing error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/rules', methods=['GET'])
+def rules_version():
+    """Version of the rule pack new requests and jobs use"""
+    rule_pack = current_rule_pack()
+    return jsonify({'version': rule_pack.version, 'digest': rule_pack.digest})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Progress and final result of a queued processing job"""
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Category backfill for stored transactions
+Usage: python backfill_categories.py [--batch-size NUMBER] [--rate ROWS_PER_SECOND] [--resume | --after ID] [--dry-run]
+
+Re-categorises the transactions table with the same TransactionCategorizer the
+extractor uses, replacing the LIKE rules of update_categories.sql. Rows are
+streamed in primary-key order through a server-side cursor, categorised a
+batch at a time, and only categories that changed are written back with one
+UPDATE ... FROM (VALUES ...) per batch. After every committed batch the last
+id is saved, so --resume continues where a stopped run left off.
+"""
+
+import os
+import json
+import time
+import argparse
+import psycopg2
+import psycopg2.extras
+from typing import Dict, List, Optional, Tuple
+from db_pool import db_config_from_env
+from transaction_categorizer import TransactionCategorizer
+
+BACKFILL_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backfill_state.json')
+
+UPDATE_CHANGED_CATEGORIES = """
+UPDATE transactions AS t
+SET category = v.category, updated_at = NOW()
+FROM (VALUES %s) AS v(id, category)
+WHERE t.id = v.id AND t.category IS DISTINCT FROM v.category
+"""
+
+class CategoryBackfill:
+    def __init__(self, batch_size: int = 1000, rows_per_second: Optional[float] = None, dry_run: bool = False,
+                 state_path: Optional[str] = BACKFILL_STATE_PATH):
+        self.db_config = db_config_from_env()
+        self.batch_size = batch_size
+        self.rows_per_second = rows_per_second
+        self.dry_run = dry_run
+        self.state_path = state_path
+        # The extractor's category set; descriptions are the first 200 characters of the message.
+        # No merchant memo, so every row's category depends on its own description alone.
+        self.categorizer = TransactionCategorizer(memo_size=0)
+
+    def get_db_connection(self):
+        # Dedicated connections rather than pooled ones: the reader is switched to a read-only session
+        return psycopg2.connect(**self.db_config)
+
+    def load_watermark(self) -> Optional[str]:
+        """Last id committed by a previous run under the current category rules"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        # Rows below the watermark were categorised under other rules, so they need another pass
+        if state.get('rules_digest') != self.categorizer.rules_digest:
+            print("Category rules changed since the last backfill, starting from the first row")
+            return None
+        return state.get('last_id')
+
+    def save_watermark(self, last_id: str):
+        if not self.state_path:
+            return
+        # Written aside and renamed so a killed run never leaves half a state file
+        partial = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump({'last_id': last_id, 'rules_digest': self.categorizer.rules_digest, 'saved_at': time.time()}, f)
+        os.replace(partial, self.state_path)
+
+    def changed_categories(self, rows: List[Tuple]) -> List[Tuple[str, str]]:
+        """(id, category) for rows whose stored category differs from the categorizer's"""
+        # Rows without a description keep whatever category they were saved with
+        described = [row for row in rows if row[1]]
+        categories = self.categorizer.categorize_many(row[1] for row in described)
+        return [(row[0], category) for row, category in zip(described, categories) if category != row[2]]
+
+    def run(self, after: Optional[str] = None) -> Dict:
+        """Re-categorise every transaction with an id above after, batch by batch, and return a summary"""
+        summary = {'scanned': 0, 'changed': 0, 'updated': 0, 'batches': 0, 'last_id': after, 'elapsed_seconds': 0.0}
+        started = time.monotonic()
+
+        # The server-side cursor keeps its transaction open on one connection; batches commit on the other
+        read_conn = self.get_db_connection()
+        write_conn = self.get_db_connection()
+        try:
+            read_conn.set_session(readonly=True)
+            rows_cursor = read_conn.cursor(name='category_backfill')
+            rows_cursor.itersize = self.batch_size
+            if after:
+                rows_cursor.execute(
+                    "SELECT id, description, category FROM transactions WHERE id > %s ORDER BY id", (after,))
+            else:
+                rows_cursor.execute("SELECT id, description, category FROM transactions ORDER BY id")
+
+            while True:
+                rows = rows_cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+
+                changed = self.changed_categories(rows)
+                if changed and not self.dry_run:
+                    with write_conn.cursor() as cursor:
+                        psycopg2.extras.execute_values(cursor, UPDATE_CHANGED_CATEGORIES, changed,
+                                                       template='(%s::uuid, %s)', page_size=len(changed))
+                        summary['updated'] += cursor.rowcount
+                    write_conn.commit()
+
+                summary['scanned'] += len(rows)
+                summary['changed'] += len(changed)
+                summary['batches'] += 1
+                summary['last_id'] = str(rows[-1][0])
+                if not self.dry_run:
+                    self.save_watermark(summary['last_id'])
+                print(f"Batch {summary['batches']}: {len(rows)} rows, {len(changed)} changed (up to id {summary['last_id']})")
+
+                # Hold the long-run average at rows_per_second
+                if self.rows_per_second:
+                    delay = started + summary['scanned'] / self.rows_per_second - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+            rows_cursor.close()
+        finally:
+            read_conn.close()
+            write_conn.close()
+
+        summary['elapsed_seconds'] = round(time.monotonic() - started, 1)
+        return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-categorise stored transactions with the transaction categorizer')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows categorised and updated per batch (default: 1000)')
+    parser.add_argument('--rate', type=float, default=None, help='Maximum rows per second (default: unlimited)')
+    parser.add_argument('--resume', action='store_true', help='Continue after the last id committed by a previous run')
+    parser.add_argument('--after', default=None, help='Only backfill transactions with an id above this one')
+    parser.add_argument('--dry-run', action='store_true', help='Count changed categories without writing them')
+    parser.add_argument('--state', default=BACKFILL_STATE_PATH, help='File that keeps the resume watermark')
+    args = parser.parse_args()
+
+    backfill = CategoryBackfill(args.batch_size, args.rate, args.dry_run, args.state)
+    after = args.after
+    if args.resume and not after:
+        after = backfill.load_watermark()
+        if after:
+            print(f"Resuming after id {after}")
+
+    summary = backfill.run(after)
+    rate = summary['scanned'] / summary['elapsed_seconds'] if summary['elapsed_seconds'] else 0
+    print(f"Backfill {'dry run ' if args.dry_run else ''}completed: {summary['scanned']} rows scanned, "
+          f"{summary['changed']} categories changed, {summary['updated']} rows updated "
+          f"in {summary['elapsed_seconds']}s ({rate:.0f} rows/s)")
+    if summary['last_id']:
+        print(f"Last id: {summary['last_id']}")
+
+if __name__ == "__main__":
+    main()
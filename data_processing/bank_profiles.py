@@ -0,0 +1,151 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from keyword_matcher import KeywordMatcher
+from records import ExtractorVote
+
+# DLT sender IDs look like VM-BOBTXN or VM-BOBSMS-S: an operator/circle prefix,
+# the registered header, and an optional message category suffix
+DLT_PREFIX = re.compile(r'^[A-Z]{2}-')
+DLT_SUFFIX = re.compile(r'-[SPTG]$')
+AMOUNT = r'(?P<amount>\d+(?:,\d+)*(?:\.\d{2})?)'
+
+def normalize_sender(sender: str) -> str:
+    """Registered header of a DLT sender ID ('VM-BOBSMS-S' -> 'BOBSMS')"""
+    header = sender.strip().upper()
+    header = DLT_PREFIX.sub('', header)
+    return DLT_SUFFIX.sub('', header)
+
+class BankParser:
+    """One precompiled regex for a single message template of a bank.
+
+    The pattern must match the whole message and capture `amount`; `account` and
+    `reference` groups are optional. A match is trusted as the final extraction.
+    """
+
+    def __init__(self, name: str, pattern: str, transaction_type: str, confidence: int = 95):
+        self.name = name
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.transaction_type = transaction_type
+        self.confidence = confidence
+
+    def parse(self, message: str) -> Optional[Tuple[ExtractorVote, Optional[str]]]:
+        """Return (vote, reference id) for a matching message"""
+        match = self.pattern.fullmatch(message)
+        if not match:
+            return None
+        groups = match.groupdict()
+        vote = ExtractorVote(float(groups['amount'].replace(',', '')), self.transaction_type,
+                             groups.get('account'), self.confidence)
+        return vote, groups.get('reference')
+
+class BankProfile:
+    """A bank or service identified by its DLT headers, with its template parsers"""
+
+    def __init__(self, name: str, kind: str, headers: List[str], parsers: List[BankParser] = None):
+        self.name = name
+        self.kind = kind
+        self.headers = frozenset(header.upper() for header in headers)
+        self.parsers = parsers or []
+
+    def parse(self, message: str) -> Optional[Tuple[BankParser, ExtractorVote, Optional[str]]]:
+        """Return (parser, vote, reference id) of the first parser matching the message"""
+        for parser in self.parsers:
+            parsed = parser.parse(message)
+            if parsed is not None:
+                return (parser,) + parsed
+        return None
+
+BANK_PROFILES = [
+    BankProfile('bob', 'bank', ['BOBTXN', 'BOBSMS', 'BOBCRD'], [
+        # Rs.6000 Credited to A/c ...9212 thru UPI/511857530160 by name. Total Bal:...(28-04-2025 07:40:39) - Bank of Baroda
+        BankParser('bob_upi_credit',
+                   r'Rs\.' + AMOUNT + r' Credited to A/c \.\.\.(?P<account>\d{4}) thru UPI/(?P<reference>\d{12}) by \w+\. '
+                   r'Total Bal:Rs\.\d+(?:\.\d{2})?CR\. Avlbl Amt:Rs\.\d+(?:\.\d{2})?'
+                   r'\(\d{2}-\d{2}-\d{4} \d{2}:\d{2}:\d{2}\) - Bank of Baroda',
+                   'credit'),
+        # Rs 40.00 debited from A/C XXXXXX9212 and credited to vpa@okicici UPI Ref:409594145449. Not you? Call 18005700 -BOB
+        BankParser('bob_upi_debit',
+                   r'Rs ' + AMOUNT + r' debited from A/C X+(?P<account>\d{4}) and credited to [\w.\-]+@[\w.\-]+ '
+                   r'UPI Ref:(?P<reference>\d{12})\. Not you\? Call \d+ -BOB',
+                   'debit'),
+        # Dear BOB UPI User: Your account is credited with INR 1.00 on 2025-07-21 12:22:21 PM by UPI Ref No 556899569329; AvlBal: Rs2137.64 - BOB
+        BankParser('bob_upi_user_credit',
+                   r'Dear BOB UPI User: Your account is credited with INR ' + AMOUNT +
+                   r' on \d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} [AP]M by UPI Ref No (?P<reference>\d{12}); '
+                   r'AvlBal: Rs\d+(?:\.\d{2})? - BOB',
+                   'credit'),
+        # Rs.230.00 Dr. from A/C XXXXXX9212 to VPA zomato@upi UPI Ref 412345678901 - BOB
+        BankParser('bob_vpa_debit',
+                   r'Rs\.' + AMOUNT + r' Dr\. from A/C X+(?P<account>\d{4}) to VPA [\w.\-]+@[\w.\-]+ '
+                   r'UPI Ref (?P<reference>\d{12}) - BOB',
+                   'debit'),
+    ]),
+    BankProfile('icici', 'bank', ['ICICIT', 'ICICIB'], [
+        # Rs.100.00 Cr. to A/c ...4455 on 05-06-2025. Ref:553430571659 -ICICI
+        BankParser('icici_credit',
+                   r'Rs\.' + AMOUNT + r' Cr\. to A/c \.\.\.(?P<account>\d{4}) on \d{2}-\d{2}-\d{4}\. '
+                   r'Ref:(?P<reference>\d{12}) -ICICI',
+                   'credit'),
+    ]),
+    BankProfile('hdfc', 'bank', ['HDFCBK', 'HDFCMF']),
+    BankProfile('sbi', 'bank', ['SBIINB', 'SBIUPI', 'ATMSBI', 'CBSSBI']),
+    BankProfile('jio', 'telecom', ['JIOPAY', 'JIOCPN']),
+    BankProfile('airtel', 'telecom', ['AIRTEL', 'AIRMTA']),
+]
+
+PROFILES_BY_HEADER = {header: profile for profile in BANK_PROFILES for header in profile.headers}
+
+def sender_bank(sender: str) -> str:
+    """Name of the bank behind a sender ID, or its registered header when no profile knows it"""
+    header = normalize_sender(sender)
+    profile = PROFILES_BY_HEADER.get(header)
+    return profile.name if profile is not None else header
+
+class SenderRegistry:
+    """Resolves raw sender IDs to their bank profile and sender keyword classes.
+
+    Both depend only on the sender, so they are computed once per distinct sender
+    and kept in a bounded LRU, locked because request threads share it.
+    """
+
+    def __init__(self, sender_matcher: KeywordMatcher, profiles: List[BankProfile] = None, max_senders: int = 1024):
+        self.sender_matcher = sender_matcher
+        self.max_senders = max_senders
+        self._profiles: Dict[str, BankProfile] = {}
+        for profile in BANK_PROFILES if profiles is None else profiles:
+            for header in profile.headers:
+                self._profiles[header] = profile
+        self._senders: 'OrderedDict[str, Tuple[Optional[BankProfile], FrozenSet[str]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, sender: str) -> Tuple[Optional[BankProfile], FrozenSet[str]]:
+        """Return (profile or None, sender keyword classes) for a raw sender ID"""
+        with self._lock:
+            entry = self._senders.get(sender)
+            if entry is not None:
+                self._senders.move_to_end(sender)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        matches = frozenset(self.sender_matcher.match(sender.lower())) if sender else frozenset()
+        entry = (self._profiles.get(normalize_sender(sender)), matches)
+        with self._lock:
+            self._senders[sender] = entry
+            self._senders.move_to_end(sender)
+            if len(self._senders) > self.max_senders:
+                self._senders.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            'senders': len(self._senders)
+        }
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Per-message latency benchmark and fuzz check for the confidence extractor
+Usage: python benchmark_latency.py [--messages NUMBER] [--seed NUMBER] [--verify]
+
+Times extract_with_confidence on three input classes and reports p50/p99/max
+latency per message:
+  normal       single bank/telecom SMS built from templates
+  long         concatenated multi-part SMS and forwarded statements
+  adversarial  fuzzed keyword/amount floods, hazard characters, long VPA-like
+               runs and whitespace runs, up to twice the length cap
+Latency per character should stay flat as inputs grow; a quadratic pattern
+shows up as a max us/char far above the normal class.
+
+--verify also checks the token-stream extractors against their regex reference
+implementations on every input short enough for the backtracking regexes.
+"""
+
+import re
+import time
+import random
+import argparse
+from enhanced_confidence_extractor import EnhancedConfidenceExtractor, MAX_MESSAGE_LENGTH
+from message_scanner import CASE_FOLD_HAZARDS, PreparedMessage
+from records import ExtractorVote
+from benchmark_memory import make_messages
+
+STATEMENT_LINE = "{day:02d}-05 Rs.{amount} {verb} a/c XX{account} {name}@upi Ref {ref} Avl bal Rs {balance}"
+VERBS = ['debited', 'credited', 'paid', 'transferred', 'withdrawn']
+FLOOD_WORDS = ['credited ', 'debited ', 'paid ', 'rs ', 'rs.1 ', 'inr 5 ', 'a/c ', 'upi/', 'ref:', 'avl bal ',
+               'credited with ', '1,', '\n', ' ' * 40, 'x' * 40, 'a.b-c_' * 6, '@', 'ſ', 'ı', 'İ']
+# The regex reference extractors backtrack, so --verify only feeds them short inputs
+VERIFY_MAX_LENGTH = 600
+
+def long_messages(count: int, rng: random.Random):
+    """Concatenated multi-part SMS and forwarded statements"""
+    messages = []
+    parts = [message['message_body'] for message in make_messages(count * 4, rng.randint(0, 10 ** 6))]
+    for i in range(count):
+        if i % 2:
+            body = '\n'.join(rng.choice(parts) for _ in range(rng.randint(2, 10)))
+        else:
+            body = 'Fwd: statement\n' + '\n'.join(
+                STATEMENT_LINE.format(day=rng.randint(1, 28), amount=f"{rng.randint(1, 90000)}.{rng.randint(0, 99):02d}",
+                                      verb=rng.choice(VERBS), account=rng.randint(1000, 9999), name=rng.choice(['zomato', 'uber']),
+                                      ref=rng.randint(10 ** 11, 10 ** 12 - 1), balance=rng.randint(1, 90000))
+                for _ in range(rng.randint(5, 40)))
+        messages.append((body, rng.choice(['VM-BOBTXN', 'VK-HDFCBK', 'AD-SBICRD'])))
+    return messages
+
+def adversarial_messages(count: int, rng: random.Random):
+    """Fuzzed floods of the extractors' anchors, from short to twice the length cap"""
+    messages = []
+    for _ in range(count):
+        target = int(rng.choice([0.1, 0.5, 1.0, 2.0]) * MAX_MESSAGE_LENGTH * rng.random()) + 10
+        # A transaction-looking head so the message reaches the extractors
+        chunks = [rng.choice(['Rs 5 credited to a/c bank. ', 'Credited a/c bank Rs 5 ', 'a/c bank credited\n', ''])]
+        flood = rng.sample(FLOOD_WORDS, rng.randint(1, 4))
+        length = len(chunks[0])
+        while length < target:
+            chunk = rng.choice(flood)
+            chunks.append(chunk)
+            length += len(chunk)
+        messages.append((''.join(chunks), rng.choice(['VM-BOBSMS', 'VK-HDFCBK', ''])))
+    return messages
+
+def percentile(sorted_values, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def measure(extractor: EnhancedConfidenceExtractor, messages):
+    """Sorted per-message latencies in microseconds, and the worst latency per character"""
+    latencies = []
+    worst_per_char = 0.0
+    for body, sender in messages:
+        start = time.perf_counter()
+        extractor.extract_with_confidence(body, sender)
+        elapsed = (time.perf_counter() - start) * 1e6
+        latencies.append(elapsed)
+        worst_per_char = max(worst_per_char, elapsed / max(len(body), 1))
+    return sorted(latencies), worst_per_char
+
+# Regex reference implementations of the four extractors, moved out of the extractor:
+# extraction runs their token-stream equivalents, whose time is linear in the message
+# length, and --verify checks those against these backtracking versions.
+
+def reference_regex_vote(extractor: EnhancedConfidenceExtractor, prepared: PreparedMessage) -> ExtractorVote:
+    """Enhanced regex using real CSV message patterns"""
+    result = ExtractorVote()
+    message = prepared.text
+    
+    # BOB-specific pattern first (highest priority)
+    bob_credit_match = re.search(r'credited with\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+on', message, re.IGNORECASE)
+    if bob_credit_match:
+        result.amount = float(bob_credit_match.group(1).replace(',', ''))
+        result.type = 'credit'
+        result.confidence = 98
+        return result
+    
+    # Other credit patterns
+    credit_patterns = [
+        r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',  # credited with INR 1000.00
+        r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+credited',      # Rs.6000 Credited
+        r'credited.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # credited with Rs.1000
+        r'credited.*?inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # credited with INR 130.00
+        r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+cr\.',          # Rs.100.00 Cr.
+        r'received.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',      # received Rs.500
+        r'deposited.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # deposited Rs.1000
+        r'refund.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # refund Rs.250
+        r'cashback.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # cashback Rs.50
+        r'added.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',        # added Rs.1000
+    ]
+    
+    # Comprehensive debit patterns
+    debit_patterns = [
+        r'rs\.?(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+dr\.',          # Rs.230.00 Dr.
+        r'rs\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+debited',       # Rs 40.00 debited
+        r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+transferred',   # Rs.527 transferred
+        r'debited.*?rs\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # debited Rs 40.00
+        r'withdrawn.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',    # withdrawn Rs.500
+        r'paid.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',        # paid Rs.1000
+        r'purchase.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',    # purchase Rs.250
+        r'charged.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # charged Rs.100
+        r'deducted.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',    # deducted Rs.50
+        r'spent.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # spent Rs.300
+    ]
+    
+    # Try credit patterns
+    for pattern in credit_patterns:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            amount = float(match.group(1).replace(',', ''))
+            result.amount = amount
+            result.type = 'credit'
+            result.confidence = 95
+            break
+    
+    # Try debit patterns if no credit found
+    if not result.amount:
+        for pattern in debit_patterns:
+            match = re.search(pattern, message, re.IGNORECASE)
+            if match:
+                amount = float(match.group(1).replace(',', ''))
+                # Skip if this is a balance amount
+                if not extractor._is_balance_amount(prepared.scan, match.start(), match.end()):
+                    result.amount = amount
+                    result.type = 'debit'
+                    result.confidence = 95
+                    break
+    
+    # Enhanced account extraction
+    account_patterns = [
+        r'a/c[:\s]*\.{3}(\d{4})',           # A/c ...9212
+        r'a/c[:\s]*x+(\d{4})',              # A/C XXXXXX9212
+        r'from\s+a/c[:\s]*x+(\d{4})',       # from A/C XXXXXX9212
+    ]
+    
+    for pattern in account_patterns:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            result.account = match.group(1)
+            break
+            
+    return result
+
+def reference_keyword_vote(extractor: EnhancedConfidenceExtractor, prepared: PreparedMessage) -> ExtractorVote:
+    """Enhanced keyword-based extraction"""
+    result = ExtractorVote()
+    message = prepared.text
+    message_lower = prepared.lower
+    
+    # Determine type by keywords with higher accuracy
+    credit_score = sum(1 for word in extractor.credit_keywords if word in message_lower)
+    debit_score = sum(1 for word in extractor.debit_keywords if word in message_lower)
+    
+    if credit_score > debit_score:
+        result.type = 'credit'
+    elif debit_score > credit_score:
+        result.type = 'debit'
+    
+    # BOB-specific pattern first (highest priority)
+    bob_match = re.search(r'credited with\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+on', message, re.IGNORECASE)
+    if bob_match:
+        result.amount = float(bob_match.group(1).replace(',', ''))
+        result.confidence = 95
+        return result
+    
+    # Other amount extraction patterns
+    amount_patterns = [
+        # INR patterns
+        r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',  # credited with INR 1000.00
+        r'debited.*?inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # debited INR 500.00
+        
+        # Dr./Cr. patterns
+        r'rs\.?(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+dr\.',          # Rs.230.00 Dr.
+        r'rs\.?(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+cr\.',          # Rs.100.00 Cr.
+        
+        # Main transaction patterns
+        r'rs\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+debited from a/c.*?and credited',  # Main debit
+        r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+(?:credited|debited|transferred|withdrawn|paid|charged|received|deposited)',
+        
+        # Generic patterns
+        r'(?:credited|debited|transferred|withdrawn|paid|charged|received|deposited|dr\.|cr\.|refund|cashback).*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',
+        r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?).*?(?:credited|debited|transferred|withdrawn|paid|charged|received|deposited|dr\.|cr\.|refund|cashback)',
+    ]
+    
+    for pattern in amount_patterns:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            amount = float(match.group(1).replace(',', ''))
+            # Skip if this looks like a balance amount (check for balance keywords nearby)
+            if not extractor._is_balance_amount(prepared.scan, match.start(), match.end()):
+                result.amount = amount
+                result.confidence = 80
+                break
+            
+    return result
+
+def reference_position_vote(extractor: EnhancedConfidenceExtractor, prepared: PreparedMessage) -> ExtractorVote:
+    """Enhanced position-based extraction"""
+    result = ExtractorVote()
+    message = prepared.text
+    
+    # Find all amounts and their positions
+    amounts_with_pos = []
+    for match in re.finditer(r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{2})?)', message, re.IGNORECASE):
+        amounts_with_pos.append((float(match.group(1).replace(',', '')), match.start()))
+    
+    if amounts_with_pos:
+        # Find transaction keywords and their positions
+        transaction_keywords = ['credited', 'debited', 'transferred']
+        keyword_positions = []
+        
+        for keyword in transaction_keywords:
+            for match in re.finditer(keyword, message, re.IGNORECASE):
+                keyword_positions.append((keyword, match.start()))
+        
+        # Find amount closest to transaction keyword
+        best_amount = None
+        best_distance = float('inf')
+        best_type = None
+        
+        for amount, amt_pos in amounts_with_pos:
+            for keyword, kw_pos in keyword_positions:
+                distance = abs(amt_pos - kw_pos)
+                if distance < best_distance and distance < 100:  # Within 100 characters
+                    best_amount = amount
+                    best_distance = distance
+                    best_type = 'credit' if keyword == 'credited' else 'debit'
+        
+        if best_amount:
+            result.amount = best_amount
+            result.type = best_type
+            result.confidence = 75
+            
+    return result
+
+def reference_context_vote(extractor: EnhancedConfidenceExtractor, prepared: PreparedMessage) -> ExtractorVote:
+    """Enhanced context-based extraction using sender info"""
+    result = ExtractorVote()
+    message = prepared.text
+    
+    # Bank-specific patterns based on real messages - more specific patterns
+    bank_patterns = {
+        'bob': {
+            'credit': [
+                r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{2})?)',  # credited with INR 1000.00
+                r'rs\.?(\d+(?:,\d+)*(?:\.\d{2})?)\s+credited.*?bank of baroda'
+            ],
+            'debit': [
+                r'rs\s+(\d+(?:,\d+)*(?:\.\d{2})?)\s+debited.*?-bob'
+            ]
+        }
+    }
+    
+    # Check sender for bank identification
+    bank_identified = None
+    
+    if 'bob' in prepared.sender_lower:
+        bank_identified = 'bob'
+    
+    # Use bank-specific patterns if identified
+    if bank_identified and bank_identified in bank_patterns:
+        patterns = bank_patterns[bank_identified]
+        
+        for trans_type, pattern_list in patterns.items():
+            for pattern in pattern_list:
+                match = re.search(pattern, message, re.IGNORECASE)
+                if match:
+                    result.amount = float(match.group(1).replace(',', ''))
+                    result.type = trans_type
+                    result.confidence = 90
+                    break
+            if result.amount:  # Break outer loop if found
+                break
+    
+    # Fallback to general context patterns - prioritize transaction amounts
+    if not result.amount:
+        # Look for transaction amount with specific context
+        transaction_patterns = [
+            r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{2})?)',  # credited with INR amount
+            r'(?:credited|debited).*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{2})?)',  # credited/debited Rs amount
+            r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{2})?).*?(?:credited|debited)',  # Rs amount credited/debited
+        ]
+        
+        for pattern in transaction_patterns:
+            match = re.search(pattern, message, re.IGNORECASE)
+            if match:
+                amount = float(match.group(1).replace(',', ''))
+                # Skip if this looks like a balance amount
+                if not extractor._is_balance_amount(prepared.scan, match.start(), match.end()):
+                    result.amount = amount
+                    
+                    if 'credited' in prepared.lower:
+                        result.type = 'credit'
+                    elif any(word in prepared.lower for word in ['debited', 'transferred']):
+                        result.type = 'debit'
+                    
+                    result.confidence = 85
+                    break
+            
+    return result
+
+def verify(extractor: EnhancedConfidenceExtractor, messages) -> int:
+    """Count inputs whose token-stream votes differ from the regex reference votes"""
+    mismatches = 0
+    for body, sender in messages:
+        # Hazard characters are folded by the scanner but not by the reference's substring checks
+        if len(body) > VERIFY_MAX_LENGTH or CASE_FOLD_HAZARDS.search(body):
+            continue
+        prepared = extractor.prepare(body, sender)
+        scan = prepared.scan
+        token_votes = [extractor._scan_regex_extractor(scan), extractor._scan_keyword_extractor(scan),
+                       extractor._scan_position_extractor(scan), extractor._scan_context_extractor(scan, prepared.sender_lower)]
+        regex_votes = [reference_regex_vote(extractor, prepared), reference_keyword_vote(extractor, prepared),
+                       reference_position_vote(extractor, prepared), reference_context_vote(extractor, prepared)]
+        if [vote.to_dict() for vote in token_votes] != [vote.to_dict() for vote in regex_votes]:
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"  mismatch: {body[:120]!r}")
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-message extraction latency on normal, long and adversarial inputs')
+    parser.add_argument('--messages', type=int, default=2000, help='Messages per input class (default: 2000)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the generated inputs')
+    parser.add_argument('--verify', action='store_true', help='Check token-stream votes against the regex reference extractors')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    classes = [
+        ('normal', [(m['message_body'], m['sender']) for m in make_messages(args.messages, args.seed)]),
+        ('long', long_messages(args.messages, rng)),
+        ('adversarial', adversarial_messages(args.messages, rng)),
+    ]
+
+    print(f"Length cap: {MAX_MESSAGE_LENGTH} characters")
+    print(f"{'class':14}{'messages':>9}{'avg len':>9}{'p50 us':>10}{'p99 us':>10}{'max us':>10}{'max us/char':>13}")
+    for name, messages in classes:
+        extractor = EnhancedConfidenceExtractor()
+        latencies, worst_per_char = measure(extractor, messages)
+        average_length = sum(len(body) for body, _ in messages) / max(len(messages), 1)
+        print(f"{name:14}{len(messages):>9}{average_length:>9.0f}{percentile(latencies, 0.5):>10.1f}"
+              f"{percentile(latencies, 0.99):>10.1f}{latencies[-1]:>10.1f}{worst_per_char:>13.2f}")
+        if extractor.truncated_messages:
+            print(f"  {extractor.truncated_messages} messages over the cap were extracted from their head")
+
+    if args.verify:
+        extractor = EnhancedConfidenceExtractor()
+        for name, messages in classes:
+            print(f"verify {name}: {verify(extractor, messages)} mismatches")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for batch extraction records
+Usage: python benchmark_memory.py [--messages NUMBER] [--seed NUMBER]
+
+Builds a synthetic batch from bank SMS templates and reports the memory held by
+extractor votes, extraction results and transaction payloads, each as slotted
+records / columns and as the equivalent per-message dicts. Votes are measured
+twice: on the full four-extractor vote (no template cache, no bank parsers) and
+on the steady-state path, where cached templates record no votes and a bank
+parser records one.
+"""
+
+import io
+import copy
+import random
+import argparse
+import contextlib
+import tracemalloc
+from bank_profiles import SenderRegistry
+from enhanced_confidence_extractor import EnhancedConfidenceExtractor
+from transaction_extractor import TransactionExtractor
+
+TEMPLATES = [
+    ("Rs.{amount} Credited to A/c ...{account} thru UPI/{ref} by {name}. Total Bal:Rs.{balance}CR. "
+     "Avlbl Amt:Rs.{balance}({day:02d}-04-2025 07:40:39) - Bank of Baroda", "VM-BOBTXN"),
+    ("Rs {amount} debited from A/C XXXXXX{account} and credited to {name}@okicici UPI Ref:{ref}. "
+     "Not you? Call 18005700 -BOB", "JK-BOBSMS"),
+    ("Dear BOB UPI User: Your account is credited with INR {amount} on 2025-07-{day:02d} 12:22:21 PM "
+     "by UPI Ref No {ref}; AvlBal: Rs{balance} - BOB", "VM-BOBSMS-S"),
+    ("Your a/c XX{account} is debited for Rs {amount} on {day:02d}-02-2025 by NEFT. Avl Bal:Rs {balance}", "VK-HDFCBK"),
+    ("Rs.{amount} spent on card {account} at {name} on {day:02d}-03-2025. Avl bal Rs {balance}", "AD-SBICRD"),
+    ("50% Daily Data quota used as on {day:02d}-Nov-24 22:13. Jio Number : 8487005334", "JE-JioPay"),
+]
+NAMES = ['zomato', 'swiggy', 'amazon', 'uber', 'rameshk', 'bigbasket']
+
+def make_messages(count: int, seed: int):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        template, sender = rng.choice(TEMPLATES)
+        body = template.format(amount=f"{rng.randint(1, 20000)}.{rng.randint(0, 99):02d}",
+                               balance=f"{rng.randint(1, 90000)}.{rng.randint(0, 99):02d}",
+                               account=rng.randint(1000, 9999), ref=rng.randint(10 ** 11, 10 ** 12 - 1),
+                               name=rng.choice(NAMES), day=rng.randint(1, 28))
+        messages.append({'id': f"{i:08d}", 'user_id': f"user-{i % 50}", 'sender': sender,
+                         'message_body': body, 'received_at': '2025-04-28T07:40:39Z'})
+    return messages
+
+def retained(build):
+    """Return (result, bytes still allocated by build once it returns)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure memory held by batch extraction records')
+    parser.add_argument('--messages', type=int, default=20000, help='Messages in the synthetic batch (default: 20000)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the synthetic batch')
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.seed)
+    extractor = TransactionExtractor('http://localhost:5000/api', fingerprint_index_path=None)
+    confidence_extractor = extractor.confidence_extractor
+    bodies = [message['message_body'] for message in messages]
+    senders = [message['sender'] for message in messages]
+
+    # Every transaction through the four extractors: no templates to serve, no bank parsers
+    full_vote = EnhancedConfidenceExtractor(template_cache_size=0, rule_pack=extractor.rule_pack)
+    full_vote.sender_registry = SenderRegistry(full_vote._sender_matcher, profiles=[])
+
+    # Warm the template cache and sender registry so both sides see the same steady state
+    confidence_extractor.extract_batch(bodies, senders)
+
+    # Same values either way; only the containers differ
+    votes = {}
+    for label, vote_extractor in (('Extractor votes (full)', full_vote), ('Extractor votes (served)', confidence_extractor)):
+        rows = vote_extractor.extract_batch(bodies, senders, debug=True)['extractor_results']
+        _, records = retained(lambda: [[copy.copy(vote) for vote in row] for row in rows])
+        _, dicts = retained(lambda: [[vote.to_dict() for vote in row] for row in rows])
+        votes[label] = (records, dicts, sum(len(row) for row in rows))
+    del rows
+
+    extractions, results_records = retained(lambda: extractor.extract_many(messages))
+    _, results_dicts = retained(lambda: [confidence_extractor.extract_with_confidence(body, sender)
+                                         for body, sender in zip(bodies, senders)])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        payloads = [extractor.build_transaction(extraction) for extraction in extractions]
+    payloads = [payload for payload in payloads if payload is not None]
+    _, payloads_records = retained(lambda: [copy.copy(payload) for payload in payloads])
+    _, payloads_dicts = retained(lambda: [payload.to_dict() for payload in payloads])
+
+    print(f"Batch: {len(messages)} messages, {len(payloads)} transactions")
+    print(f"{'':26}{'records':>14}{'dicts':>14}{'saved':>8}{'votes/m':>9}")
+    report = [(label, records, dicts, len(messages), f"{count / len(messages):>9.2f}")
+              for label, (records, dicts, count) in votes.items()]
+    report += [
+        ('Extraction results', results_records, results_dicts, len(messages), ''),
+        ('Transaction payloads', payloads_records, payloads_dicts, len(payloads), ''),
+    ]
+    for label, records, dicts, count, per_message in report:
+        saved = (1 - records / dicts) * 100 if dicts else 0.0
+        print(f"{label:26}{records / max(count, 1):>10.0f} B/m{dicts / max(count, 1):>10.0f} B/m{saved:>7.0f}%{per_message}")
+    print("B/m: bytes held per message (per transaction for payloads); votes/m: extractor votes recorded per message")
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,57 @@
 import sys
 import json
+from typing import Dict, TextIO
+from transaction_categorizer import TransactionCategorizer
+
+USAGE = 'Usage: categorize_transaction.py DESCRIPTION | --stdin | --file PATH'
+
+# This script's narrower category list, matched in a single pass like the extractor's categorizer
+categorizer = None
 
 def categorize_transaction(description):
     """Determine transaction category from description"""
-    if not description:
-        return 'Others'
-    
-    desc = description.lower()
-    
-    # Food & Dining
-    if any(word in desc for word in ['zomato', 'swiggy', 'dominos', 'pizza', 'burger', 'kfc', 'mcdonalds', 
-                                     'restaurant', 'food', 'cafe', 'hotel', 'dining', 'eatery', 'bakery']):
-        return 'Food & Dining'
-    
-    # Petrol & Fuel
-    if any(word in desc for word in ['petrol', 'fuel', 'diesel', 'gas', 'pump', 'hp', 'iocl', 'bpcl']):
-        return 'Petrol & Fuel'
-    
-    # Shopping & E-commerce  
-    if any(word in desc for word in ['amazon', 'flipkart', 'myntra', 'shopping', 'mall', 'store', 'purchase']):
-        return 'Shopping & E-commerce'
-    
-    # Transport & Travel
-    if any(word in desc for word in ['uber', 'ola', 'taxi', 'metro', 'bus', 'train', 'irctc', 'makemytrip', 
-                                     'ixigo', 'travel', 'ticket']):
-        return 'Transport & Travel'
-    
-    # Utilities & Bills
-    if any(word in desc for word in ['recharge', 'mobile', 'electricity', 'gas', 'water', 'bill', 
-                                     'airtel', 'jio', 'vodafone', 'broadband']):
-        return 'Utilities & Bills'
-    
-    # Education
-    if any(word in desc for word in ['coursera', 'udemy', 'education', 'school', 'college', 'byjus', 
-                                     'unacademy', 'course']):
-        return 'Education'
-    
-    # Entertainment
-    if any(word in desc for word in ['netflix', 'spotify', 'movie', 'cinema', 'entertainment', 'music',
-                                     'hotstar', 'prime']):
-        return 'Entertainment'
-    
-    # Healthcare
-    if any(word in desc for word in ['hospital', 'doctor', 'medical', 'pharmacy', 'medicine', 'health',
-                                     'apollo', 'medplus']):
-        return 'Healthcare'
-    
-    # Banking & Financial
-    if any(word in desc for word in ['atm', 'neft', 'imps', 'minimum balance', 'charges', 'fee', 'bank']):
-        return 'Banking'
-    
-    # Personal (family/friends)
-    if any(word in desc for word in ['atodariyadharme', 'neetu.collation', '_fam', 'family', 'personal']):
-        return 'Personal'
-    
-    return 'Others'
+    global categorizer
+    if categorizer is None:
+        categorizer = TransactionCategorizer(category_set='description_categories')
+    return categorizer.categorize(description)
+
+def categorize_line(line: str) -> Dict:
+    """Reply for one request line: a JSON string, or an object with a description and an optional id"""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return {'error': f"Invalid request: {e}"}
+
+    reply = {}
+    if isinstance(request, dict):
+        if 'id' in request:
+            reply['id'] = request['id']
+        description = request.get('description')
+    else:
+        description = request
+    if not isinstance(description, str):
+        reply['error'] = 'No description provided'
+        return reply
+
+    reply['category'] = categorize_transaction(description)
+    return reply
+
+def serve_lines(reader: TextIO, writer: TextIO):
+    """Categorize NDJSON requests until the reader is exhausted, one reply line per request.
+
+    Each reply is flushed as soon as it is written, so a caller holding this
+    process open as a co-process can read it before sending the next request.
+    A bad line gets an error reply instead of ending the stream.
+    """
+    for line in reader:
+        if not line.strip():
+            continue
+        try:
+            reply = categorize_line(line)
+        except Exception as e:
+            reply = {'error': str(e)}
+        writer.write(json.dumps(reply) + '\n')
+        writer.flush()
 
 if __name__ == "__main__":
     try:
@@ -62,6 +59,17 @@ if __name__ == "__main__":
             print(json.dumps({'error': 'No description provided'}))
             sys.exit(1)
         
+        if sys.argv[1] == '--stdin':
+            serve_lines(sys.stdin, sys.stdout)
+            sys.exit(0)
+        if sys.argv[1] == '--file':
+            if len(sys.argv) < 3:
+                print(json.dumps({'error': USAGE}))
+                sys.exit(1)
+            with open(sys.argv[2], encoding='utf-8') as reader:
+                serve_lines(reader, sys.stdout)
+            sys.exit(0)
+        
         description = sys.argv[1]
         category = categorize_transaction(description)
         
@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def db_config_from_env() -> Dict:
+    """PostgreSQL connection settings from DB_* environment variables"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'database': os.getenv('DB_NAME', 'money_mate'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'port': os.getenv('DB_PORT', '5432')
+    }
+
+class TimedConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that records how long each new connection took to open"""
+
+    def __init__(self, minconn: int, maxconn: int, *args, **kwargs):
+        self.connections_opened = 0
+        self.connect_seconds = 0.0
+        self.max_connect_seconds = 0.0
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _connect(self, key=None):
+        started = time.perf_counter()
+        conn = super()._connect(key)
+        elapsed = time.perf_counter() - started
+        self.connections_opened += 1
+        self.connect_seconds += elapsed
+        self.max_connect_seconds = max(self.max_connect_seconds, elapsed)
+        return conn
+
+class DatabasePool:
+    """Connections shared by every query and write of a process.
+
+    Opens at most max_connections connections (DB_POOL_MAX, default 4) and
+    reuses them across calls and threads. min_connections (DB_POOL_MIN,
+    default 1) stay open between uses; ThreadedConnectionPool closes the ones
+    beyond that when they are returned, so concurrent callers should set it to
+    their concurrency. Callers beyond max_connections wait for a connection to
+    come back instead of failing. The pool opens on first use.
+    """
+
+    def __init__(self, db_config: Optional[Dict] = None, min_connections: Optional[int] = None,
+                 max_connections: Optional[int] = None):
+        self.db_config = db_config or db_config_from_env()
+        self.max_connections = max_connections or int(os.getenv('DB_POOL_MAX', '4'))
+        self.min_connections = min(min_connections if min_connections is not None else int(os.getenv('DB_POOL_MIN', '1')),
+                                   self.max_connections)
+        self._pool: Optional[TimedConnectionPool] = None
+        self._lock = threading.Lock()
+        # ThreadedConnectionPool raises when exhausted; this makes callers queue instead
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def pool(self) -> TimedConnectionPool:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = TimedConnectionPool(self.min_connections, self.max_connections, **self.db_config)
+        return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted work is rolled back when it is returned"""
+        started = time.perf_counter()
+        self._slots.acquire()
+        try:
+            pool = self.pool
+            conn = pool.getconn()
+            with self._lock:
+                self.checkouts += 1
+                self.wait_seconds += time.perf_counter() - started
+            try:
+                yield conn
+            finally:
+                pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        pool = self._pool
+        opened = pool.connections_opened if pool else 0
+        return {
+            'connections_opened': opened,
+            'connect_ms_total': round(pool.connect_seconds * 1000, 1) if pool else 0.0,
+            'connect_ms_avg': round(pool.connect_seconds / opened * 1000, 1) if opened else 0.0,
+            'connect_ms_max': round(pool.max_connect_seconds * 1000, 1) if pool else 0.0,
+            'checkouts': self.checkouts,
+            'wait_ms_total': round(self.wait_seconds * 1000, 1),
+            'max_connections': self.max_connections
+        }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
@@ -0,0 +1,101 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bank_profiles import sender_bank
+
+# Reference numbers carry digits and some length; the extractors also pick up words
+# after "ref" ("Refund" gives "und", "Ref No 123" gives "No") that identify nothing
+MIN_REFERENCE_LENGTH = 6
+ACCOUNT_DIGITS_PATTERN = re.compile(r'\d{4}$')
+
+def usable_reference(reference_id: Optional[str]) -> Optional[str]:
+    """The reference id if it can identify a transaction, else None"""
+    if reference_id and len(reference_id) >= MIN_REFERENCE_LENGTH and any(c.isdigit() for c in reference_id):
+        return reference_id
+    return None
+
+def account_suffix(account_number: Optional[str]) -> Optional[str]:
+    """Last four digits of a (masked) account number, the part every sender shows"""
+    if not account_number:
+        return None
+    match = ACCOUNT_DIGITS_PATTERN.search(account_number)
+    return match.group(0) if match else None
+
+class DuplicateMatcher:
+    """Finds the same transaction reported twice in differently formatted messages.
+
+    Candidates are indexed by (user, amount, type) into time buckets one window
+    wide, so a lookup only inspects the current and neighbouring buckets instead
+    of every earlier transaction. A candidate is the same transaction when it has
+    the same user, amount and type within the window and a compatible account
+    (unknown on either side, or the same last four digits). Then matching
+    reference ids confirm it, conflicting ones rule it out, and without a
+    reference on both sides it must come from another sender ID of the same bank
+    (VM-BOBSMS and VK-BOBTXN), since equal debits at two banks are two payments.
+    References that are not usable_reference() count as absent.
+
+    Candidates live as long as the matcher, i.e. one run; across runs only exact
+    repeats are caught, by the fingerprint index.
+    """
+
+    def __init__(self, window_seconds: int = 300):
+        self.window_seconds = window_seconds
+        self._buckets: Dict[Tuple, Dict[int, List[Tuple[float, Optional[str], str, str, Optional[str]]]]] = {}
+
+    @staticmethod
+    def _timestamp(value) -> Optional[float]:
+        if hasattr(value, 'timestamp'):
+            return value.timestamp()
+        try:
+            return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+
+    def _key(self, user_id: str, amount: float, transaction_type: str) -> Tuple:
+        return (user_id, round(float(amount), 2), transaction_type)
+
+    def is_duplicate(self, user_id: str, amount: float, transaction_type: str, occurred_at,
+                     reference_id: Optional[str] = None, sender: str = '', account_number: Optional[str] = None) -> bool:
+        """True when an indexed transaction is the same one as this"""
+        timestamp = self._timestamp(occurred_at)
+        if timestamp is None:
+            return False
+
+        buckets = self._buckets.get(self._key(user_id, amount, transaction_type))
+        if not buckets:
+            return False
+        reference_id = usable_reference(reference_id)
+        account = account_suffix(account_number)
+        bank = sender_bank(sender)
+        bucket = int(timestamp // self.window_seconds)
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            for seen_at, seen_reference, seen_sender, seen_bank, seen_account in buckets.get(neighbour, ()):
+                if abs(seen_at - timestamp) > self.window_seconds:
+                    continue
+                if account and seen_account and account != seen_account:
+                    continue
+                if reference_id and seen_reference:
+                    if seen_reference == reference_id:
+                        return True
+                    continue
+                if seen_bank == bank and seen_sender != sender:
+                    return True
+        return False
+
+    def add(self, user_id: str, amount: float, transaction_type: str, occurred_at,
+            reference_id: Optional[str] = None, sender: str = '', account_number: Optional[str] = None):
+        """Index a transaction as a candidate for later matches"""
+        timestamp = self._timestamp(occurred_at)
+        if timestamp is None:
+            return
+        buckets = self._buckets.setdefault(self._key(user_id, amount, transaction_type), {})
+        buckets.setdefault(int(timestamp // self.window_seconds), []).append(
+            (timestamp, usable_reference(reference_id), sender, sender_bank(sender), account_suffix(account_number)))
+
+    def check_and_add(self, user_id: str, amount: float, transaction_type: str, occurred_at,
+                      reference_id: Optional[str] = None, sender: str = '', account_number: Optional[str] = None) -> bool:
+        """Return True for a duplicate; otherwise index the transaction and return False"""
+        if self.is_duplicate(user_id, amount, transaction_type, occurred_at, reference_id, sender, account_number):
+            return True
+        self.add(user_id, amount, transaction_type, occurred_at, reference_id, sender, account_number)
+        return False
@@ -1,7 +1,13 @@
 import re
 import hashlib
-from typing import Dict, List, Optional, Tuple
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from enum import Enum
+from message_scanner import PreparedMessage, ANY_AMOUNT, UNSPACED_AMOUNT, SPACED_AMOUNT
+from template_cache import TemplateCache
+from bank_profiles import SenderRegistry
+from records import ExtractorVote
+from rule_pack import RulePack, current_rule_pack
 
 class MessageType(Enum):
     TRANSACTION = 'transaction'
@@ -11,94 +17,158 @@ class MessageType(Enum):
     OTP = 'otp'
     OTHER = 'other'
 
+AMOUNT_PRESENCE_PATTERN = re.compile(r'rs\.?\s*\d+|inr\s*\d+', re.IGNORECASE)
+OTP_DIGITS_PATTERN = re.compile(r'\d{4,6}')
+
+# Fingerprint components, matched against the lowercased message
+FINGERPRINT_AMOUNT_PATTERN = re.compile(r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)')
+FINGERPRINT_ACCOUNT_PATTERN = re.compile(r'a/c[:\s]*\.{3}(\d{4})')
+FINGERPRINT_SENDER_PATTERN = re.compile(r'(?:by\s+(\w+)|from:(\w+))')
+FINGERPRINT_TIMESTAMP_PATTERN = re.compile(r'\((\d{2}-\d{2}-\d{4}\s+\d{2}:\d{2}:\d{2})\)')
+
+REFERENCE_PRESENCE_PATTERN = re.compile(r'ref[:\s]*\w+|upi[:/]\w+', re.IGNORECASE)
+
+# Voting order of the extractors, and the order fast consensus runs them in (cheapest first)
+EXTRACTOR_ORDER = ('regex', 'keyword', 'position', 'context')
+FAST_CONSENSUS_ORDER = ('position', 'context', 'regex', 'keyword')
+# Only these extractors ever report an account number
+ACCOUNT_EXTRACTORS = frozenset(['regex'])
+
+# Columnar (extract_batch) encodings
+TRANSACTION_TYPES = (None, 'credit', 'debit')
+TRANSACTION_TYPE_CODES = {transaction_type: code for code, transaction_type in enumerate(TRANSACTION_TYPES)}
+MISSING_AMOUNT = float('nan')
+NOT_A_TRANSACTION = (None, None, None, 0, None, [], None)
+# Source of an extraction served by the template cache
+SOURCE_TEMPLATE = 'template'
+# Longer messages (forwarded statements, runaway concatenations) are extracted from
+# their head; a 10-part concatenated SMS is at most 1530 characters
+MAX_MESSAGE_LENGTH = 2000
+
 class EnhancedConfidenceExtractor:
-    def __init__(self):
-        self.credit_keywords = ['credited', 'received', 'deposited', 'refund', 'cashback', 'cr.', 'cr ', 'credit', 'added', 'received from', 'deposit', 'reversal', 'interest credited']
-        self.debit_keywords = ['debited', 'transferred', 'paid', 'withdrawn', 'purchase', 'dr.', 'dr ', 'debit', 'spent', 'charged', 'deducted', 'sent to', 'payment', 'withdrawal']
-        self.bank_keywords = ['account', 'upi', 'neft', 'rtgs', 'bank', 'atm', 'a/c', 'imps', 'wallet', 'card', 'pos', 'online', 'mobile banking', 'net banking', 'fund transfer', 'transaction', 'txn']
+    def __init__(self, template_cache_size: int = 256, fast_consensus: bool = False, rule_pack: RulePack = None,
+                 max_message_length: int = MAX_MESSAGE_LENGTH):
+        # Keyword lists and their compiled matchers come from the shared rule pack
+        self.rule_pack = rule_pack or current_rule_pack()
+        pack = self.rule_pack
+        self.credit_keywords = pack.credit_keywords
+        self.debit_keywords = pack.debit_keywords
+        self.bank_keywords = pack.bank_keywords
         
         # Comprehensive bank sender patterns
-        self.bank_senders = ['bobsms', 'bobtxn', 'icicit', 'hdfcmf', 'sbi', 'hdfc', 'axis', 'kotak', 'pnb', 'canara', 'union', 'indian', 'federal', 'yes', 'rbl', 'idfc', 'indusind', 'paytm', 'phonepe', 'gpay', 'amazonpay', 'mobikwik']
-        self.telecom_senders = ['jiopay', 'jiocpn', 'vicare', 'airtel', 'vodafone', 'bsnl', 'mtnl']
+        self.bank_senders = pack.bank_senders
+        self.telecom_senders = pack.telecom_senders
+        self.promotional_senders = pack.promotional_senders
+        
+        # Promotional/spam phrases that rule a message out before anything else
+        self.spam_indicators = pack.spam_indicators
+        self.security_keywords = pack.security_keywords
+        self.otp_keywords = pack.otp_keywords
+        self.telecom_indicators = pack.telecom_indicators
+        self.promotional_keywords = pack.promotional_keywords
+        
+        # Prebuilt matchers so classification scans body and sender once each
+        self._body_matcher = pack.body_matcher
+        self._sender_matcher = pack.sender_matcher
+        # Sender keyword classes and bank profile, resolved once per distinct sender
+        self.sender_registry = SenderRegistry(self._sender_matcher)
         
+        # Balance indicators that appear close to amounts
+        self.balance_keywords = pack.balance_keywords
+        self.bank_indicators = pack.bank_indicators
+        self.transaction_verbs = pack.transaction_verbs
+        self.amount_context_words = pack.amount_context_words
+        self._credit_keyword_set = set(self.credit_keywords)
+        self._debit_keyword_set = set(self.debit_keywords)
+        self._bank_indicator_set = set(self.bank_indicators)
+        
+        # Single-pass tokenizer shared by the four voting strategies
+        self._scanner = pack.scanner
+        
+        # Learned message templates whose slots are filled without running the extractors (0 disables)
+        self.template_cache = TemplateCache(template_cache_size, scanner=self._scanner) if template_cache_size else None
+        
+        # Opt-in: stop voting once the remaining extractors cannot change the outcome
+        self.fast_consensus = fast_consensus
+        self.consensus_stats = {'messages': 0, 'skipped': {name: 0 for name in EXTRACTOR_ORDER}}
+        
+        # Input-length cap that bounds the time spent on any one message
+        self.max_message_length = max_message_length
+        self.truncated_messages = 0
+        
+    def prepare(self, message_body: str, sender: str = "") -> PreparedMessage:
+        """Normalise a message once: lowercased text plus the sender's bank profile and keyword classes"""
+        prepared = self._scanner.prepare(message_body, sender)
+        prepared.profile, prepared.sender_classes = self.sender_registry.lookup(sender)
+        return prepared
+    
     def classify_message(self, message_body: str, sender: str = "") -> MessageType:
         """Enhanced classification using sender and content"""
-        message = message_body.lower()
-        sender_lower = sender.lower()
+        return self._classify(self.prepare(message_body, sender))
+    
+    def _classify(self, prepared: PreparedMessage) -> MessageType:
+        message = prepared.lower
         
-        # Filter out promotional/spam messages first
-        spam_indicators = [
-            'loan is ready', 'apply now', 'click here', 'http://', 'https://', 
-            'limited time offer', 'congratulations', 'winner', 'prize',
-            'otp to apply', 'finance hero', 'finance guru', 'loan approved', 'pre-approved',
-            'instant loan', 'personal loan', 'credit card offer', 'cashback offer',
-            'download app', 'register now', 'claim now', 'hurry up', 'use your otp',
-            'ready to be credited', 'loan offer', 'eligible for', 'apply for loan',
-            'click to check', 'purchase request', 'transaction id:',
-            'nav of rs', 'dear investor', 'dear consumer', 'finserv', 'mutual fund',
-            'has requested money through', 'on approval', 'will be debited from your bank account',
-            'payout for redemption', 'folio', 'growth option', 'amount will be credited to your bank',
-            'just credited:', 'in your wallet', 'redeem your exclusive', 'bwkoof.com',
-            'cupid cash', 'bewakoof', 'prepaid recharges has requested', 'irctc cf has requested'
-        ]
+        # One pass over body and sender finds every keyword class present
+        body_matches = self._body_matcher.match(message)
+        sender_matches = prepared.sender_classes
         
-        if any(spam_word in message for spam_word in spam_indicators):
+        # Filter out promotional/spam messages first
+        if 'spam' in body_matches:
             return MessageType.PROMOTIONAL
         
         # Check for promotional senders
-        promotional_senders = ['finance hero', 'loan', 'offer', 'promo', 'marketing', 'credit']
-        if any(promo in sender_lower for promo in promotional_senders):
+        if 'promotional_sender' in sender_matches:
             return MessageType.PROMOTIONAL
         
         # Check for transaction (higher priority than security alerts for bank messages)
-        has_action = any(keyword in message for keyword in self.credit_keywords + self.debit_keywords)
-        has_bank_context = (any(keyword in message for keyword in self.bank_keywords) or
-                           any(sender_part in sender_lower for sender_part in self.bank_senders))
-        has_amount = bool(re.search(r'rs\.?\s*\d+|inr\s*\d+', message, re.IGNORECASE))
+        has_action = 'credit' in body_matches or 'debit' in body_matches
+        has_bank_context = 'bank' in body_matches or 'bank_sender' in sender_matches
+        # Only needed alongside an action keyword, so skip the regex otherwise
+        has_amount = has_action and bool(AMOUNT_PRESENCE_PATTERN.search(message))
         
         # Only classify as transaction if it's from legitimate bank sources
         if has_action and has_bank_context and has_amount:
             return MessageType.TRANSACTION
         
         # Security alerts - but not if it's clearly a transaction
-        if any(keyword in message for keyword in ['never share', 'fraud', 'suspicious', 'block']) and not (has_action and has_amount):
+        if 'security' in body_matches and not (has_action and has_amount):
             return MessageType.SECURITY_ALERT
             
         # OTP messages
-        if ('otp' in message or 'verification' in message) and re.search(r'\d{4,6}', message):
+        if 'otp' in body_matches and OTP_DIGITS_PATTERN.search(message):
             return MessageType.OTP
             
         # Telecom messages (enhanced with sender info)
-        telecom_indicators = ['data', 'gb', 'mb', 'missed call', 'jio', 'airtel', 'vi', 'quota', 'recharge']
-        if (any(keyword in message for keyword in telecom_indicators) or 
-            any(sender_part in sender_lower for sender_part in self.telecom_senders)):
+        if 'telecom' in body_matches or 'telecom_sender' in sender_matches:
             return MessageType.TELECOM
             
         # Promotional messages
-        if any(keyword in message for keyword in ['offer', 'discount', 'sale', 'click', 'download', 'coupon']):
+        if 'promotional' in body_matches:
             return MessageType.PROMOTIONAL
             
-        # This check was moved up above security alerts
-            
         return MessageType.OTHER
     
     def generate_transaction_fingerprint(self, message_body: str, sender: str = "") -> str:
         """Generate a fingerprint for duplicate detection"""
-        message = message_body.lower()
+        return self._fingerprint(self.prepare(message_body, sender))
+    
+    def _fingerprint(self, prepared: PreparedMessage) -> str:
+        message = prepared.lower
         
         # Extract key components for fingerprint
-        amount_match = re.search(r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)', message)
+        amount_match = FINGERPRINT_AMOUNT_PATTERN.search(message)
         amount = amount_match.group(1).replace(',', '') if amount_match else ''
         
-        account_match = re.search(r'a/c[:\s]*\.{3}(\d{4})', message)
+        account_match = FINGERPRINT_ACCOUNT_PATTERN.search(message)
         account = account_match.group(1) if account_match else ''
         
         # Handle both 'by' and 'from:' patterns - extract actual sender name
-        sender_match = re.search(r'(?:by\s+(\w+)|from:(\w+))', message)
+        sender_match = FINGERPRINT_SENDER_PATTERN.search(message)
         sender_name = sender_match.group(1) or sender_match.group(2) if sender_match else ''
         
         # Extract full timestamp for exact duplicate detection
-        timestamp_match = re.search(r'\((\d{2}-\d{2}-\d{4}\s+\d{2}:\d{2}:\d{2})\)', message)
+        timestamp_match = FINGERPRINT_TIMESTAMP_PATTERN.search(message)
         timestamp = timestamp_match.group(1) if timestamp_match else ''
         
         transaction_type = 'credit' if 'credited' in message else 'debit' if any(word in message for word in ['debited', 'transferred']) else ''
@@ -108,27 +178,131 @@ class EnhancedConfidenceExtractor:
     
     def extract_with_confidence(self, message_body: str, sender: str = "") -> Dict:
         """Extract transaction data using 4 enhanced methods"""
+        prepared = self.prepare(self._bounded(message_body), sender)
         
         # Only process if it's a transaction
-        if self.classify_message(message_body, sender) != MessageType.TRANSACTION:
+        extraction = self._extract(prepared)
+        if extraction is None:
             return {
                 'is_transaction': False,
                 'confidence': 0,
                 'reason': 'Not classified as transaction'
             }
         
-        # Run 4 enhanced extractors
-        regex_result = self._enhanced_regex_extractor(message_body)
-        keyword_result = self._enhanced_keyword_extractor(message_body)
-        position_result = self._enhanced_position_extractor(message_body)
-        context_result = self._enhanced_context_extractor(message_body, sender)
+        amount, transaction_type, account_number, confidence, reference_id, extractors, source = extraction
+        result = {
+            'is_transaction': True,
+            'amount': amount,
+            'transaction_type': transaction_type,
+            'account_number': account_number,
+            'confidence': confidence,
+            'extractor_results': [vote.to_dict() for vote in extractors],
+            'reference_id': reference_id,
+            'transaction_fingerprint': self._fingerprint(prepared)
+        }
+        if source == SOURCE_TEMPLATE:
+            result['template_hit'] = True
+        elif source is not None:
+            result['bank_parser'] = source
+        return result
+    
+    def extract_batch(self, bodies: Sequence[str], senders: Optional[Sequence[str]] = None, debug: bool = False) -> Dict:
+        """Extract a list of messages into columns instead of one dict per message.
+        
+        Returns equal-length columns: is_transaction (0/1), amount (NaN when
+        missing), type (code into TRANSACTION_TYPES), confidence, account,
+        reference, fingerprint and source (None for the full vote, 'template' or a
+        bank parser name). Per-extractor results are only kept, as an
+        extractor_results column, when debug is set.
+        """
+        columns = {
+            'is_transaction': array('b'),
+            'amount': array('d'),
+            'type': array('b'),
+            'confidence': array('b'),
+            'account': [],
+            'reference': [],
+            'fingerprint': [],
+            'source': []
+        }
+        if debug:
+            columns['extractor_results'] = []
+        
+        for i, message_body in enumerate(bodies):
+            sender = senders[i] if senders is not None else ''
+            prepared = self.prepare(self._bounded(message_body), sender)
+            extraction = self._extract(prepared)
+            if extraction is None:
+                amount, transaction_type, account_number, confidence, reference_id, extractors, source = NOT_A_TRANSACTION
+                fingerprint = None
+            else:
+                amount, transaction_type, account_number, confidence, reference_id, extractors, source = extraction
+                fingerprint = self._fingerprint(prepared)
+            columns['is_transaction'].append(extraction is not None)
+            columns['amount'].append(MISSING_AMOUNT if amount is None else amount)
+            columns['type'].append(TRANSACTION_TYPE_CODES[transaction_type])
+            columns['confidence'].append(confidence)
+            columns['account'].append(account_number)
+            columns['reference'].append(reference_id)
+            columns['fingerprint'].append(fingerprint)
+            columns['source'].append(source)
+            if debug:
+                columns['extractor_results'].append(extractors)
+        return columns
+    
+    def _bounded(self, message_body: str) -> str:
+        """The message itself, or for messages over the length cap their head cut at a word boundary"""
+        if len(message_body) <= self.max_message_length:
+            return message_body
+        self.truncated_messages += 1
+        head = message_body[:self.max_message_length]
+        # Don't split the token (an amount, a reference) straddling the cap
+        cut = max(head.rfind(' '), head.rfind('\n'))
+        return head[:cut] if cut > 0 else head
+    
+    def _extract(self, prepared: PreparedMessage) -> Optional[Tuple]:
+        """(amount, type, account, confidence, reference, extractor results, source), or None for non-transactions"""
+        if self._classify(prepared) != MessageType.TRANSACTION:
+            return None
         
-        extractors = [regex_result, keyword_result, position_result, context_result]
+        # Known bank templates are parsed by one targeted regex instead of the 4-way vote
+        profile = prepared.profile
+        if profile is not None and profile.parsers:
+            parsed = profile.parse(prepared.text)
+            if parsed is not None:
+                parser, vote, reference_id = parsed
+                return (vote.amount, vote.type, vote.account or 'unknown',
+                        self._apply_validation_rules(prepared, vote.amount, vote.confidence),
+                        reference_id, [vote], parser.name)
+        
+        # Messages matching a trusted template skip the extractors entirely
+        if self.template_cache is not None:
+            template_key, slots = self.template_cache.template(prepared.text, prepared.sender)
+            cached = self.template_cache.lookup(template_key, slots)
+            if cached is not None:
+                return cached + ([], SOURCE_TEMPLATE)
+        
+        # Tokenize once and run the 4 enhanced extractors over the token stream (linear time)
+        scan = prepared.scan
+        if self.fast_consensus:
+            extractors = self._run_fast_consensus({
+                'regex': (self._scan_regex_extractor, (scan,)),
+                'keyword': (self._scan_keyword_extractor, (scan,)),
+                'position': (self._scan_position_extractor, (scan,)),
+                'context': (self._scan_context_extractor, (scan, prepared.sender_lower))
+            })
+        else:
+            extractors = [
+                self._scan_regex_extractor(scan),
+                self._scan_keyword_extractor(scan),
+                self._scan_position_extractor(scan),
+                self._scan_context_extractor(scan, prepared.sender_lower)
+            ]
         
         # Calculate consensus
-        amounts = [r['amount'] for r in extractors if r['amount']]
-        types = [r['type'] for r in extractors if r['type']]
-        accounts = [r['account'] for r in extractors if r['account']]
+        amounts = [r.amount for r in extractors if r.amount]
+        types = [r.type for r in extractors if r.type]
+        accounts = [r.account for r in extractors if r.account]
         
         # Find most common values
         final_amount = self._get_consensus(amounts)
@@ -139,253 +313,225 @@ class EnhancedConfidenceExtractor:
         confidence = self._calculate_confidence(extractors, final_amount, final_type)
         
         # Validation checks
-        confidence = self._apply_validation_rules(message_body, final_amount, confidence)
+        confidence = self._scan_validation_rules(scan, final_amount, confidence)
         
-        return {
-            'is_transaction': True,
-            'amount': final_amount,
-            'transaction_type': final_type,
-            'account_number': final_account or 'unknown',
-            'confidence': confidence,
-            'extractor_results': extractors,
-            'reference_id': self._extract_reference(message_body),
-            'transaction_fingerprint': self.generate_transaction_fingerprint(message_body, sender)
-        }
+        fields = (final_amount, final_type, final_account or 'unknown', confidence, scan.reference())
+        if self.template_cache is not None:
+            self.template_cache.observe(template_key, slots, fields, [vote.amount for vote in extractors])
+        return fields + (extractors, None)
     
-    def _enhanced_regex_extractor(self, message: str) -> Dict:
-        """Enhanced regex using real CSV message patterns"""
-        result = {'amount': None, 'type': None, 'account': None, 'confidence': 0}
+    def _scan_regex_extractor(self, scan) -> ExtractorVote:
+        """Token-stream equivalent of benchmark_latency.reference_regex_vote"""
+        result = ExtractorVote()
         
         # BOB-specific pattern first (highest priority)
-        bob_credit_match = re.search(r'credited with\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+on', message, re.IGNORECASE)
-        if bob_credit_match:
-            result['amount'] = float(bob_credit_match.group(1).replace(',', ''))
-            result['type'] = 'credit'
-            result['confidence'] = 98
+        if scan.credited_with:
+            result.amount = float(scan.credited_with.group(1).replace(',', ''))
+            result.type = 'credit'
+            result.confidence = 98
             return result
         
-        # Other credit patterns
-        credit_patterns = [
-            r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',  # credited with INR 1000.00
-            r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+credited',      # Rs.6000 Credited
-            r'credited.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # credited with Rs.1000
-            r'credited.*?inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # credited with INR 130.00
-            r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+cr\.',          # Rs.100.00 Cr.
-            r'received.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',      # received Rs.500
-            r'deposited.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # deposited Rs.1000
-            r'refund.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # refund Rs.250
-            r'cashback.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # cashback Rs.50
-            r'added.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',        # added Rs.1000
-        ]
-        
-        # Comprehensive debit patterns
-        debit_patterns = [
-            r'rs\.?(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+dr\.',          # Rs.230.00 Dr.
-            r'rs\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+debited',       # Rs 40.00 debited
-            r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+transferred',   # Rs.527 transferred
-            r'debited.*?rs\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # debited Rs 40.00
-            r'withdrawn.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',    # withdrawn Rs.500
-            r'paid.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',        # paid Rs.1000
-            r'purchase.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',    # purchase Rs.250
-            r'charged.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # charged Rs.100
-            r'deducted.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',    # deducted Rs.50
-            r'spent.*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',       # spent Rs.300
-        ]
-        
-        # Try credit patterns
-        for pattern in credit_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                amount = float(match.group(1).replace(',', ''))
-                result['amount'] = amount
-                result['type'] = 'credit'
-                result['confidence'] = 95
-                break
+        # Credit patterns, in the same order as the regex extractor
+        match = self._scan_credited_with_inr(scan)
+        if match is None and scan.amounts:
+            match = (scan.amount_before(('credited',))
+                     or scan.keyword_then_amount(('credited',)))
+        if match is None:
+            match = scan.keyword_then_inr(('credited',))
+        if match is None and scan.amounts:
+            match = (scan.amount_before(('cr.',))
+                     or scan.keyword_then_amount(('received',))
+                     or scan.keyword_then_amount(('deposited',))
+                     or scan.keyword_then_amount(('refund',))
+                     or scan.keyword_then_amount(('cashback',))
+                     or scan.keyword_then_amount(('added',)))
+        if match is not None:
+            result.amount = match[0].value
+            result.type = 'credit'
+            result.confidence = 95
         
         # Try debit patterns if no credit found
-        if not result['amount']:
-            for pattern in debit_patterns:
-                match = re.search(pattern, message, re.IGNORECASE)
-                if match:
-                    amount = float(match.group(1).replace(',', ''))
+        if not result.amount and scan.amounts:
+            debit_patterns = [
+                (scan.amount_before, ('dr.',), UNSPACED_AMOUNT),
+                (scan.amount_before, ('debited',), SPACED_AMOUNT),
+                (scan.amount_before, ('transferred',), ANY_AMOUNT),
+                (scan.keyword_then_amount, ('debited',), SPACED_AMOUNT),
+                (scan.keyword_then_amount, ('withdrawn',), ANY_AMOUNT),
+                (scan.keyword_then_amount, ('paid',), ANY_AMOUNT),
+                (scan.keyword_then_amount, ('purchase',), ANY_AMOUNT),
+                (scan.keyword_then_amount, ('charged',), ANY_AMOUNT),
+                (scan.keyword_then_amount, ('deducted',), ANY_AMOUNT),
+                (scan.keyword_then_amount, ('spent',), ANY_AMOUNT),
+            ]
+            for pattern, words, form in debit_patterns:
+                match = pattern(words, form)
+                if match is not None:
+                    token, start, end = match
                     # Skip if this is a balance amount
-                    if not self._is_balance_amount(message, match.start(), match.end()):
-                        result['amount'] = amount
-                        result['type'] = 'debit'
-                        result['confidence'] = 95
+                    if not self._is_balance_amount(scan, start, end):
+                        result.amount = token.value
+                        result.type = 'debit'
+                        result.confidence = 95
                         break
         
         # Enhanced account extraction
-        account_patterns = [
-            r'a/c[:\s]*\.{3}(\d{4})',           # A/c ...9212
-            r'a/c[:\s]*x+(\d{4})',              # A/C XXXXXX9212
-            r'from\s+a/c[:\s]*x+(\d{4})',       # from A/C XXXXXX9212
-        ]
-        
-        for pattern in account_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                result['account'] = match.group(1)
-                break
-                
+        result.account = scan.dotted_account or scan.masked_account
         return result
     
-    def _enhanced_keyword_extractor(self, message: str) -> Dict:
-        """Enhanced keyword-based extraction"""
-        result = {'amount': None, 'type': None, 'account': None, 'confidence': 0}
-        message_lower = message.lower()
+    def _scan_keyword_extractor(self, scan) -> ExtractorVote:
+        """Token-stream equivalent of benchmark_latency.reference_keyword_vote"""
+        result = ExtractorVote()
         
         # Determine type by keywords with higher accuracy
-        credit_score = sum(1 for word in self.credit_keywords if word in message_lower)
-        debit_score = sum(1 for word in self.debit_keywords if word in message_lower)
+        credit_score = len(self._credit_keyword_set.intersection(scan.positions))
+        debit_score = len(self._debit_keyword_set.intersection(scan.positions))
         
         if credit_score > debit_score:
-            result['type'] = 'credit'
+            result.type = 'credit'
         elif debit_score > credit_score:
-            result['type'] = 'debit'
+            result.type = 'debit'
         
         # BOB-specific pattern first (highest priority)
-        bob_match = re.search(r'credited with\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+on', message, re.IGNORECASE)
-        if bob_match:
-            result['amount'] = float(bob_match.group(1).replace(',', ''))
-            result['confidence'] = 95
+        if scan.credited_with:
+            result.amount = float(scan.credited_with.group(1).replace(',', ''))
+            result.confidence = 95
             return result
         
-        # Other amount extraction patterns
+        # Other amount patterns, in the same order as the keyword extractor
         amount_patterns = [
-            # INR patterns
-            r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',  # credited with INR 1000.00
-            r'debited.*?inr\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)',     # debited INR 500.00
-            
-            # Dr./Cr. patterns
-            r'rs\.?(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+dr\.',          # Rs.230.00 Dr.
-            r'rs\.?(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+cr\.',          # Rs.100.00 Cr.
-            
-            # Main transaction patterns
-            r'rs\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+debited from a/c.*?and credited',  # Main debit
-            r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+(?:credited|debited|transferred|withdrawn|paid|charged|received|deposited)',
-            
-            # Generic patterns
-            r'(?:credited|debited|transferred|withdrawn|paid|charged|received|deposited|dr\.|cr\.|refund|cashback).*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?)',
-            r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{1,2})?).*?(?:credited|debited|transferred|withdrawn|paid|charged|received|deposited|dr\.|cr\.|refund|cashback)',
+            lambda: self._scan_credited_with_inr(scan),
+            lambda: scan.keyword_then_inr(('debited',)),
         ]
+        if scan.amounts:
+            amount_patterns += [
+                lambda: scan.amount_before(('dr.',), UNSPACED_AMOUNT),
+                lambda: scan.amount_before(('cr.',), UNSPACED_AMOUNT),
+                lambda: scan.amount_verb_until(SPACED_AMOUNT, 'debited from a/c', 'and credited'),
+                lambda: scan.amount_before(self.transaction_verbs),
+                lambda: scan.keyword_then_amount(self.amount_context_words),
+                lambda: scan.amount_then_keyword(self.amount_context_words),
+            ]
         
         for pattern in amount_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                amount = float(match.group(1).replace(',', ''))
+            match = pattern()
+            if match is not None:
+                token, start, end = match
                 # Skip if this looks like a balance amount (check for balance keywords nearby)
-                if not self._is_balance_amount(message, match.start(), match.end()):
-                    result['amount'] = amount
-                    result['confidence'] = 80
+                if not self._is_balance_amount(scan, start, end):
+                    result.amount = token.value
+                    result.confidence = 80
                     break
                 
         return result
     
-    def _enhanced_position_extractor(self, message: str) -> Dict:
-        """Enhanced position-based extraction"""
-        result = {'amount': None, 'type': None, 'account': None, 'confidence': 0}
-        
-        # Find all amounts and their positions
-        amounts_with_pos = []
-        for match in re.finditer(r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{2})?)', message, re.IGNORECASE):
-            amounts_with_pos.append((float(match.group(1).replace(',', '')), match.start()))
-        
-        if amounts_with_pos:
-            # Find transaction keywords and their positions
-            transaction_keywords = ['credited', 'debited', 'transferred']
-            keyword_positions = []
-            
-            for keyword in transaction_keywords:
-                for match in re.finditer(keyword, message, re.IGNORECASE):
-                    keyword_positions.append((keyword, match.start()))
+    def _scan_position_extractor(self, scan) -> ExtractorVote:
+        """Token-stream equivalent of benchmark_latency.reference_position_vote"""
+        result = ExtractorVote()
+        
+        if scan.amounts:
+            # Transaction keywords and their positions
+            keyword_positions = [(keyword, pos) for keyword in ('credited', 'debited', 'transferred')
+                                 for pos in scan.positions.get(keyword, ())]
             
             # Find amount closest to transaction keyword
             best_amount = None
             best_distance = float('inf')
             best_type = None
             
-            for amount, amt_pos in amounts_with_pos:
+            for token in scan.amounts:
                 for keyword, kw_pos in keyword_positions:
-                    distance = abs(amt_pos - kw_pos)
+                    distance = abs(token.start - kw_pos)
                     if distance < best_distance and distance < 100:  # Within 100 characters
-                        best_amount = amount
+                        best_amount = token.value_2dp
                         best_distance = distance
                         best_type = 'credit' if keyword == 'credited' else 'debit'
             
             if best_amount:
-                result['amount'] = best_amount
-                result['type'] = best_type
-                result['confidence'] = 75
+                result.amount = best_amount
+                result.type = best_type
+                result.confidence = 75
                 
         return result
     
-    def _enhanced_context_extractor(self, message: str, sender: str) -> Dict:
-        """Enhanced context-based extraction using sender info"""
-        result = {'amount': None, 'type': None, 'account': None, 'confidence': 0}
-        
-        # Bank-specific patterns based on real messages - more specific patterns
-        bank_patterns = {
-            'bob': {
-                'credit': [
-                    r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{2})?)',  # credited with INR 1000.00
-                    r'rs\.?(\d+(?:,\d+)*(?:\.\d{2})?)\s+credited.*?bank of baroda'
-                ],
-                'debit': [
-                    r'rs\s+(\d+(?:,\d+)*(?:\.\d{2})?)\s+debited.*?-bob'
-                ]
-            }
-        }
-        
-        # Check sender for bank identification
-        sender_lower = sender.lower()
-        bank_identified = None
+    def _scan_context_extractor(self, scan, sender_lower: str) -> ExtractorVote:
+        """Token-stream equivalent of benchmark_latency.reference_context_vote"""
+        result = ExtractorVote()
         
+        # Bank-specific patterns, only Bank of Baroda for now
         if 'bob' in sender_lower:
-            bank_identified = 'bob'
-        
-        # Use bank-specific patterns if identified
-        if bank_identified and bank_identified in bank_patterns:
-            patterns = bank_patterns[bank_identified]
-            
-            for trans_type, pattern_list in patterns.items():
-                for pattern in pattern_list:
-                    match = re.search(pattern, message, re.IGNORECASE)
-                    if match:
-                        result['amount'] = float(match.group(1).replace(',', ''))
-                        result['type'] = trans_type
-                        result['confidence'] = 90
-                        break
-                if result['amount']:  # Break outer loop if found
-                    break
+            match = (self._scan_credited_with_inr(scan, two_decimals=True)
+                     or scan.amount_verb_until(UNSPACED_AMOUNT, 'credited', 'bank of baroda', two_decimals=True))
+            if match is not None:
+                result.amount = match[0].value_2dp
+                result.type = 'credit'
+                result.confidence = 90
+            if not result.amount:
+                match = scan.amount_verb_until(SPACED_AMOUNT, 'debited', '-bob', two_decimals=True)
+                if match is not None:
+                    result.amount = match[0].value_2dp
+                    result.type = 'debit'
+                    result.confidence = 90
         
         # Fallback to general context patterns - prioritize transaction amounts
-        if not result['amount']:
-            # Look for transaction amount with specific context
-            transaction_patterns = [
-                r'credited with inr\s+(\d+(?:,\d+)*(?:\.\d{2})?)',  # credited with INR amount
-                r'(?:credited|debited).*?rs\.?\s*(\d+(?:,\d+)*(?:\.\d{2})?)',  # credited/debited Rs amount
-                r'rs\.?\s*(\d+(?:,\d+)*(?:\.\d{2})?).*?(?:credited|debited)',  # Rs amount credited/debited
-            ]
+        if not result.amount:
+            transaction_patterns = [lambda: self._scan_credited_with_inr(scan, two_decimals=True)]
+            if scan.amounts:
+                transaction_patterns += [
+                    lambda: scan.keyword_then_amount(('credited', 'debited'), two_decimals=True),
+                    lambda: scan.amount_then_keyword(('credited', 'debited'), two_decimals=True),
+                ]
             
             for pattern in transaction_patterns:
-                match = re.search(pattern, message, re.IGNORECASE)
-                if match:
-                    amount = float(match.group(1).replace(',', ''))
+                match = pattern()
+                if match is not None:
+                    token, start, end = match
                     # Skip if this looks like a balance amount
-                    if not self._is_balance_amount(message, match.start(), match.end()):
-                        result['amount'] = amount
+                    if not self._is_balance_amount(scan, start, end):
+                        result.amount = token.value_2dp
                         
-                        if 'credited' in message.lower():
-                            result['type'] = 'credit'
-                        elif any(word in message.lower() for word in ['debited', 'transferred']):
-                            result['type'] = 'debit'
+                        if scan.has('credited'):
+                            result.type = 'credit'
+                        elif scan.has('debited') or scan.has('transferred'):
+                            result.type = 'debit'
                         
-                        result['confidence'] = 85
+                        result.confidence = 85
                         break
                 
         return result
     
+    def _scan_credited_with_inr(self, scan, two_decimals: bool = False):
+        """`credited with inr\\s+<amount>` as a pattern helper triple"""
+        token = scan.credited_with_inr
+        if token is None:
+            return None
+        return token, token.start, token.end_2dp if two_decimals else token.end
+    
+    def _scan_validation_rules(self, scan, amount: float, confidence: int) -> int:
+        """Token-stream equivalent of _apply_validation_rules"""
+        if not amount:
+            return 0
+        
+        # Amount range validation (more realistic)
+        if amount < 0.01 or amount > 10000000:  # 1 paisa to 1 crore
+            confidence -= 40
+        elif amount < 1 or amount > 1000000:    # Less than 1 rupee or more than 10 lakh
+            confidence -= 20
+        
+        # Bank context validation
+        if self._bank_indicator_set.isdisjoint(scan.positions):
+            confidence -= 30
+        
+        # Message format validation
+        if len(scan.text) < 30:  # Too short for typical bank SMS
+            confidence -= 25
+        
+        # Reference ID presence (good indicator)
+        if scan.has_reference():
+            confidence += 10
+        
+        return max(0, min(100, confidence))
+    
     def _get_consensus(self, values: List) -> Optional[str]:
         """Get most common value from extractors with smart prioritization"""
         if not values:
@@ -412,22 +558,25 @@ class EnhancedConfidenceExtractor:
         # Otherwise return the most common
         return top_values[0]
     
-    def _calculate_confidence(self, extractors: List[Dict], final_amount: float, final_type: str) -> int:
+    def _calculate_confidence(self, extractors: List[ExtractorVote], final_amount: float, final_type: str) -> int:
         """Enhanced confidence calculation"""
         agreements = 0
-        total_extractors = len([e for e in extractors if e['amount']])
+        total_extractors = len([e for e in extractors if e.amount])
         
         if total_extractors == 0:
             return 0
         
         # Count agreements on amount (with tolerance for floating point)
         for extractor in extractors:
-            if extractor['amount'] and abs(extractor['amount'] - final_amount) < 0.01:
+            if extractor.amount and abs(extractor.amount - final_amount) < 0.01:
                 agreements += 1
         
         # Calculate base confidence
-        agreement_ratio = agreements / total_extractors
-        
+        return self._agreement_confidence(agreements / total_extractors)
+    
+    @staticmethod
+    def _agreement_confidence(agreement_ratio: float) -> int:
+        """Base confidence for the share of extractors agreeing on the amount"""
         if agreement_ratio >= 0.75:  # 3+ extractors agree
             return 95
         elif agreement_ratio >= 0.5:  # 2+ extractors agree
@@ -435,7 +584,62 @@ class EnhancedConfidenceExtractor:
         else:  # Low agreement
             return 50
     
-    def _apply_validation_rules(self, message: str, amount: float, confidence: int) -> int:
+    def _run_fast_consensus(self, runners: Dict[str, Tuple[Callable[..., ExtractorVote], Tuple]]) -> List[ExtractorVote]:
+        """Run extractors cheapest first until the rest cannot change the vote.
+        
+        Returns the results that were computed, in voting order. Skipping only
+        happens when amount, type and account consensus and the agreement
+        confidence are settled whatever the skipped extractors would return, so
+        the extraction is identical to the full vote apart from extractor_results.
+        """
+        results = {}
+        remaining = list(FAST_CONSENSUS_ORDER)
+        while remaining:
+            name = remaining.pop(0)
+            extractor, args = runners[name]
+            results[name] = extractor(*args)
+            # A value needs more votes than are still open to be settled
+            if remaining and len(results) > len(remaining) and self._consensus_settled(list(results.values()), remaining):
+                break
+        
+        self.consensus_stats['messages'] += 1
+        for name in remaining:
+            self.consensus_stats['skipped'][name] += 1
+        return [results[name] for name in EXTRACTOR_ORDER if name in results]
+    
+    def _consensus_settled(self, results: List[ExtractorVote], remaining: List[str]) -> bool:
+        """True when no outcome of the remaining extractors can change the consensus or its confidence"""
+        open_votes = len(remaining)
+        amounts = [r.amount for r in results if r.amount]
+        leader = self._settled_leader(amounts, open_votes)
+        if leader is None:
+            return False
+        if self._settled_leader([r.type for r in results if r.type], open_votes) is None:
+            return False
+        account_votes = sum(1 for name in remaining if name in ACCOUNT_EXTRACTORS)
+        accounts = [r.account for r in results if r.account]
+        if (accounts or account_votes) and self._settled_leader(accounts, account_votes) is None:
+            return False
+        
+        # Every remaining extractor may disagree, agree or report no amount at all
+        agreements = sum(1 for amount in amounts if abs(amount - leader) < 0.01)
+        lowest = self._agreement_confidence(agreements / (len(amounts) + open_votes))
+        highest = self._agreement_confidence((agreements + open_votes) / (len(amounts) + open_votes))
+        return lowest == highest
+    
+    @staticmethod
+    def _settled_leader(values: List, open_votes: int):
+        """The most common value if it stays the unique winner whatever the open votes are, else None"""
+        counts = {}
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        if not counts:
+            return None
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0
+        return ranked[0][0] if ranked[0][1] > runner_up + open_votes else None
+    
+    def _apply_validation_rules(self, prepared: PreparedMessage, amount: float, confidence: int) -> int:
         """Enhanced validation rules"""
         if not amount:
             return 0
@@ -447,46 +651,24 @@ class EnhancedConfidenceExtractor:
             confidence -= 20
         
         # Bank context validation
-        bank_indicators = ['bank', 'upi', 'neft', 'rtgs', 'atm', 'a/c', '-bob', 'icici', 'hdfc', 'sbi']
-        if not any(indicator in message.lower() for indicator in bank_indicators):
+        if not any(indicator in prepared.lower for indicator in self.bank_indicators):
             confidence -= 30
         
         # Message format validation
-        if len(message) < 30:  # Too short for typical bank SMS
+        if len(prepared.text) < 30:  # Too short for typical bank SMS
             confidence -= 25
         
         # Reference ID presence (good indicator)
-        if re.search(r'ref[:\s]*\w+|upi[:/]\w+', message, re.IGNORECASE):
+        if REFERENCE_PRESENCE_PATTERN.search(prepared.text):
             confidence += 10
         
         return max(0, min(100, confidence))
     
-    def _extract_reference(self, message: str) -> Optional[str]:
-        """Enhanced reference ID extraction"""
-        patterns = [
-            r'upi ref[:\s]*no[:\s]*(\w+)',     # UPI Ref No 556899569329
-            r'upi ref[:\s]*(\w+)',             # UPI Ref:538074046613
-            r'ref[:\s]*(\w+)',                 # Ref:553430571659
-            r'upi[:/](\w+)',                   # UPI/453521403170
-            r'thru upi[:/](\w+)',              # thru UPI/424360960073
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
-    
-    def _is_balance_amount(self, message: str, start_pos: int, end_pos: int) -> bool:
+    def _is_balance_amount(self, scan, start_pos: int, end_pos: int) -> bool:
         """Check if the amount at given position is likely a balance amount"""
-        # Extract text around the amount (50 characters before and after)
+        # Window of 50 characters before and after the amount
         context_start = max(0, start_pos - 50)
-        context_end = min(len(message), end_pos + 50)
-        context = message[context_start:context_end].lower()
-        
-        # Balance indicators that appear close to amounts
-        balance_keywords = ['avlbal', 'avl bal', 'available bal', 'total bal', 'current bal', 'remaining bal', 'wallet bal', 'closing bal', 'bal:', 'balance']
+        context_end = min(len(scan.lower), end_pos + 50)
         
-        # Check if any balance keyword is very close to the amount (within 50 chars)
-        return any(keyword in context for keyword in balance_keywords)
\ No newline at end of file
+        # Any balance keyword lying entirely inside it, by bisecting the precomputed keyword spans
+        return scan.near_balance(context_start, context_end)
\ No newline at end of file
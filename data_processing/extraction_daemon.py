@@ -0,0 +1,132 @@
+import json
+import os
+import sys
+import time
+import threading
+import socketserver
+from contextlib import redirect_stdout
+from multiprocessing.pool import Pool
+from typing import Dict, Optional, TextIO
+from transaction_extractor import TransactionExtractor
+
+class ExtractionDaemon:
+    """Keeps one warm TransactionExtractor resident and runs JSON-line jobs against it.
+
+    A job is one JSON object per line, e.g. {"id": "1", "limit": 500}; optional
+    keys are workers, chunk_size, pipeline and claim (on unless a job sets it false,
+    so the daemon and manual runs split the backlog). {"command": "ping"} checks that the
+    daemon is alive. Each job gets exactly one JSON reply line carrying its id.
+    Extraction logs go to stderr so stdout only carries replies. Jobs with more
+    than one worker share a process pool that lives until close().
+    """
+
+    def __init__(self, api_base_url: str, default_workers: int = 1, default_chunk_size: int = None, default_pipeline: bool = False, default_claim: bool = True,
+                 fast_consensus: bool = False, merchant_memo_path: str = None):
+        # Built with stdout redirected too, so loading messages never reach the reply channel
+        with redirect_stdout(sys.stderr):
+            self.extractor = TransactionExtractor(api_base_url, fast_consensus=fast_consensus,
+                                                  merchant_memo_path=merchant_memo_path)
+        self.default_workers = default_workers
+        self.default_chunk_size = default_chunk_size
+        self.default_pipeline = default_pipeline
+        self.default_claim = default_claim
+        # One job at a time against the shared extractor
+        self._lock = threading.Lock()
+        # Forked on the first multi-worker job and kept, so later jobs skip starting workers
+        self._pool: Optional[Pool] = None
+        self._pool_workers = 0
+
+    def handle(self, line: str) -> Dict:
+        """Run one job line and return its reply"""
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            return {'id': None, 'ok': False, 'error': f"Invalid job: {e}"}
+        if not isinstance(job, dict):
+            return {'id': None, 'ok': False, 'error': 'Invalid job: expected a JSON object'}
+
+        job_id = job.get('id')
+        if job.get('command') == 'ping':
+            return {'id': job_id, 'ok': True, 'pong': True}
+
+        started = time.time()
+        try:
+            with self._lock, redirect_stdout(sys.stderr):
+                workers = job.get('workers', self.default_workers)
+                summary = self.extractor.run(
+                    job.get('limit'),
+                    workers,
+                    job.get('chunk_size', self.default_chunk_size),
+                    job.get('pipeline', self.default_pipeline),
+                    claim=job.get('claim', self.default_claim),
+                    pool=self._pool_for(workers)
+                )
+                if summary['latest_balance']:
+                    self.extractor.update_user_balance([], summary['latest_balance'])
+        except Exception as e:
+            return {'id': job_id, 'ok': False, 'error': str(e)}
+
+        return {
+            'id': job_id,
+            'ok': summary['saved'] and not summary['fetch_error'],
+            'processed': summary['processed'],
+            'transactions': summary['transactions'],
+            'confidence_stats': summary['confidence_stats'],
+            'template_cache': summary['template_cache'],
+            'error': summary['fetch_error'] or (None if summary['saved'] else 'Failed to save transactions'),
+            'elapsed_ms': round((time.time() - started) * 1000, 1)
+        }
+
+    def _pool_for(self, workers: int) -> Optional[Pool]:
+        """The daemon's pool of workers processes, replacing one of another size"""
+        if workers <= 1:
+            return None
+        if self._pool_workers != workers:
+            self.close()
+            self._pool = self.extractor.create_pool(workers)
+            self._pool_workers = workers
+        return self._pool
+
+    def close(self):
+        """Stop the worker pool, if one was started"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._pool_workers = 0
+
+    def serve_lines(self, reader: TextIO, writer: TextIO):
+        """Answer jobs line by line until the reader is exhausted"""
+        for line in reader:
+            if not line.strip():
+                continue
+            writer.write(json.dumps(self.handle(line)) + '\n')
+            writer.flush()
+
+    def serve_stdin(self):
+        print("Extraction daemon ready on stdin", file=sys.stderr)
+        self.serve_lines(sys.stdin, sys.stdout)
+
+    def serve_socket(self, path: str):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    line = raw.decode('utf-8')
+                    if not line.strip():
+                        continue
+                    self.wfile.write((json.dumps(daemon.handle(line)) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        print(f"Extraction daemon listening on {path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if os.path.exists(path):
+                os.unlink(path)
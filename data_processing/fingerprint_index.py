@@ -0,0 +1,93 @@
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class FingerprintIndex:
+    """Persistent set of user transaction fingerprints with a retention window.
+
+    Fingerprints live in an SQLite table keyed by the user fingerprint, fronted by
+    an in-memory Bloom filter so most lookups for unseen fingerprints never touch
+    the database. Entries older than retention_days are ignored and pruned.
+    """
+
+    def __init__(self, path: str, retention_days: int = 90, capacity: int = 1000000):
+        self.path = path
+        self.retention_seconds = retention_days * 86400
+        self.bloom = BloomFilter(capacity)
+        self._lock = threading.Lock()
+        self._last_rowid = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints (user_fingerprint TEXT PRIMARY KEY, seen_at REAL NOT NULL)'
+        )
+        self.prune()
+        self.refresh()
+
+    def _cutoff(self) -> float:
+        return time.time() - self.retention_seconds
+
+    def prune(self) -> int:
+        """Delete fingerprints older than the retention window"""
+        with self._lock:
+            deleted = self.conn.execute('DELETE FROM fingerprints WHERE seen_at < ?', (self._cutoff(),)).rowcount
+            self.conn.commit()
+        return deleted
+
+    def refresh(self):
+        """Load fingerprints written since the last refresh (also by other processes) into the Bloom filter"""
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT rowid, user_fingerprint FROM fingerprints WHERE rowid > ? ORDER BY rowid', (self._last_rowid,)
+            ).fetchall()
+        for rowid, key in rows:
+            self.bloom.add(key)
+            self._last_rowid = rowid
+
+    def __contains__(self, key: str) -> bool:
+        if key not in self.bloom:
+            return False
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT 1 FROM fingerprints WHERE user_fingerprint = ? AND seen_at >= ?', (key, self._cutoff())
+            ).fetchone()
+        return row is not None
+
+    def add_many(self, keys: Iterable[str]):
+        """Record fingerprints of saved transactions"""
+        now = time.time()
+        rows = [(key, now) for key in keys]
+        if not rows:
+            return
+        with self._lock:
+            self.conn.executemany('INSERT OR REPLACE INTO fingerprints (user_fingerprint, seen_at) VALUES (?, ?)', rows)
+            self.conn.commit()
+        for key, _ in rows:
+            self.bloom.add(key)
+
+    def close(self):
+        self.conn.close()
@@ -1,30 +1,17 @@
-import psycopg2
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from db_pool import DatabasePool
 
 class InsightsProcessor:
-    def __init__(self):
-        self.db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'database': os.getenv('DB_NAME', 'money_mate'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD', ''),
-            'port': os.getenv('DB_PORT', '5432')
-        }
-    
-    def get_db_connection(self):
-        return psycopg2.connect(**self.db_config)
+    def __init__(self, db: DatabasePool = None):
+        # Every insight query and write borrows from one pool instead of connecting per call
+        self.db = db or DatabasePool()
+        self.db_config = self.db.db_config
     
     def get_user_transactions(self, user_id: int, days: int = 30) -> List[Dict]:
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
         query = """
         SELECT transaction_date, amount, transaction_type, category, description, reference_id
         FROM transactions 
@@ -33,14 +20,13 @@ class InsightsProcessor:
         """
         
         start_date = datetime.now() - timedelta(days=days)
-        cursor.execute(query, (user_id, start_date))
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (user_id, start_date))
+                rows = cursor.fetchall()
         
         columns = ['transaction_date', 'amount', 'transaction_type', 'category', 'description', 'reference_id']
-        transactions = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        cursor.close()
-        conn.close()
-        return transactions
+        return [dict(zip(columns, row)) for row in rows]
     
     def analyze_suspicious_timing(self, transactions: List[Dict]) -> Dict:
         late_night_count = 0
@@ -187,9 +173,6 @@ class InsightsProcessor:
         }
     
     def save_insights_to_db(self, user_id: int, insights_data: Dict):
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
         today = datetime.now().date()
         
         # Upsert insights
@@ -201,56 +184,74 @@ class InsightsProcessor:
             data_value = EXCLUDED.data_value
         """
         
-        cursor.execute(query, (
-            user_id,
-            'detective_mode',
-            json.dumps(insights_data), 
-            datetime.now()
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (
+                    user_id,
+                    'detective_mode',
+                    json.dumps(insights_data), 
+                    datetime.now()
+                ))
+            conn.commit()
+    
+    def process_user(self, user_id) -> bool:
+        try:
+            insights = self.process_user_insights(user_id)
+            self.save_insights_to_db(user_id, insights)
+            print(f"Processed insights for user {user_id}")
+            return True
+        except Exception as e:
+            print(f"Error processing user {user_id}: {e}")
+            return False
     
-    def process_all_users(self):
+    def process_all_users(self, workers: int = 1):
         print(f"Starting insights processing at {datetime.now()}")
         
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        
         # Get all active users
-        cursor.execute("SELECT DISTINCT user_id FROM transactions")
-        user_ids = [row[0] for row in cursor.fetchall()]
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT DISTINCT user_id FROM transactions")
+                user_ids = [row[0] for row in cursor.fetchall()]
         
-        cursor.close()
-        conn.close()
-        
-        for user_id in user_ids:
-            try:
-                insights = self.process_user_insights(user_id)
-                self.save_insights_to_db(user_id, insights)
-                print(f"Processed insights for user {user_id}")
-            except Exception as e:
-                print(f"Error processing user {user_id}: {e}")
+        if workers <= 1:
+            for user_id in user_ids:
+                self.process_user(user_id)
+        else:
+            # Each worker holds one pooled connection at a time
+            with ThreadPoolExecutor(workers) as executor:
+                list(executor.map(self.process_user, user_ids))
         
         print(f"Completed insights processing at {datetime.now()}")
+        self.print_db_stats()
+    
+    def print_db_stats(self):
+        stats = self.db.stats()
+        print(f"Database pool: {stats['connections_opened']} connections opened "
+              f"(avg {stats['connect_ms_avg']}ms, max {stats['connect_ms_max']}ms to connect), "
+              f"{stats['checkouts']} checkouts, {stats['wait_ms_total']}ms waiting for a connection")
 
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser()
     parser.add_argument('--user', type=int, help='Process insights for specific user')
+    parser.add_argument('--workers', type=int, default=1, help='Users processed concurrently (default: 1)')
+    parser.add_argument('--pool-size', type=int, default=None, help='Maximum pooled database connections (default: DB_POOL_MAX or 4)')
     args = parser.parse_args()
     
-    processor = InsightsProcessor()
+    # Keep one connection per worker open between users
+    processor = InsightsProcessor(DatabasePool(min_connections=args.workers, max_connections=args.pool_size))
     
-    if args.user:
-        try:
-            insights = processor.process_user_insights(args.user)
-            processor.save_insights_to_db(args.user, insights)
-            print(f"Processed insights for user {args.user}")
-        except Exception as e:
-            print(f"Error processing user {args.user}: {e}")
-            sys.exit(1)
-    else:
-        processor.process_all_users()
\ No newline at end of file
+    try:
+        if args.user:
+            try:
+                insights = processor.process_user_insights(args.user)
+                processor.save_insights_to_db(args.user, insights)
+                print(f"Processed insights for user {args.user}")
+            except Exception as e:
+                print(f"Error processing user {args.user}: {e}")
+                sys.exit(1)
+        else:
+            processor.process_all_users(args.workers)
+    finally:
+        processor.db.close()
\ No newline at end of file
@@ -0,0 +1,97 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from transaction_extractor import TransactionExtractor
+from rule_pack import current_rule_pack
+
+class JobQueue:
+    """Runs extraction jobs on a bounded pool of background threads and tracks their progress.
+
+    Each pool thread keeps its own TransactionExtractor, so concurrent jobs never
+    share per-run state. A thread rebuilds it on the current rule pack between
+    jobs, so a hot-reloaded pack never changes a run that is already going. Submissions beyond max_pending queued or running jobs are
+    refused instead of piling up.
+    """
+
+    def __init__(self, api_base_url: str, max_workers: int = 2, max_pending: int = 20, max_finished: int = 100):
+        self.api_base_url = api_base_url
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extraction-job')
+        self._local = threading.local()
+        self._jobs: Dict[str, Dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, limit: int = None, **options) -> Optional[Dict]:
+        """Queue a run and return its job record, or None when the queue is full"""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                return None
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'limit': limit,
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'processed': 0,
+                'transactions': 0,
+                'messages_per_second': 0.0,
+                'result': None,
+                'error': None
+            }
+            self._prune()
+            snapshot = dict(self._jobs[job_id])
+
+        self._executor.submit(self._run, job_id, limit, options)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a snapshot of a job, or None for unknown ids"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _extractor(self) -> TransactionExtractor:
+        extractor = getattr(self._local, 'extractor', None)
+        rule_pack = current_rule_pack()
+        if extractor is None or extractor.rule_pack is not rule_pack:
+            extractor = self._local.extractor = TransactionExtractor(self.api_base_url, rule_pack=rule_pack)
+        return extractor
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, limit: Optional[int], options: Dict):
+        started = time.time()
+        self._update(job_id, status='running', started_at=started)
+
+        def progress(summary: Dict):
+            elapsed = max(time.time() - started, 1e-6)
+            self._update(job_id, processed=summary['processed'], transactions=summary['transactions'],
+                         messages_per_second=round(summary['processed'] / elapsed, 1))
+
+        try:
+            summary = self._extractor().run(limit, progress=progress, **options)
+        except Exception as e:
+            print(f"Extraction job {job_id} failed: {e}")
+            self._update(job_id, status='failed', finished_at=time.time(), error=str(e))
+            return
+
+        progress(summary)
+        error = summary['fetch_error'] or (None if summary['saved'] else 'Failed to save transactions')
+        result = {key: summary[key] for key in ('processed', 'transactions', 'saved', 'confidence_stats', 'template_cache')}
+        self._update(job_id, status='failed' if error else 'completed', finished_at=time.time(), result=result, error=error)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished"""
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in ('completed', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
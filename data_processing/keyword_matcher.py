@@ -0,0 +1,63 @@
+import re
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+class KeywordMatcher:
+    """Single-pass multi-pattern matcher over labelled keyword sets.
+
+    All keywords are folded into one trie, compiled into a single regex that
+    reports the longest keyword starting at every position of the text. Every
+    shorter keyword starting at the same position is a prefix of that longest
+    one, so one scan is enough to recover every keyword (and label) that
+    occurs anywhere in the text, exactly like ``keyword in text`` would.
+    """
+
+    def __init__(self, keyword_sets: Dict[str, List[str]]):
+        self.keyword_sets = {label: list(keywords) for label, keywords in keyword_sets.items()}
+
+        labels_by_keyword: Dict[str, Set[str]] = {}
+        for label, keywords in self.keyword_sets.items():
+            for keyword in keywords:
+                if keyword:
+                    labels_by_keyword.setdefault(keyword, set()).add(label)
+
+        # Longest match at a position -> every keyword that also starts there
+        self._prefix_keywords: Dict[str, FrozenSet[str]] = {}
+        self._prefix_labels: Dict[str, FrozenSet[str]] = {}
+        for keyword in labels_by_keyword:
+            prefixes = frozenset(keyword[:i] for i in range(1, len(keyword) + 1) if keyword[:i] in labels_by_keyword)
+            self._prefix_keywords[keyword] = prefixes
+            self._prefix_labels[keyword] = frozenset(label for prefix in prefixes for label in labels_by_keyword[prefix])
+
+        self._pattern = re.compile('(?=(' + self._build_trie_pattern(labels_by_keyword) + '))') if labels_by_keyword else None
+
+    @staticmethod
+    def _build_trie_pattern(keywords) -> str:
+        """Compile keywords into a trie-shaped regex that prefers the longest match"""
+        trie: Dict = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+        def build(node: Dict) -> str:
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            return '(?:' + body + ')?' if '' in node else body
+
+        return build(trie)
+
+    def scan(self, text: str) -> List[Tuple[int, FrozenSet[str]]]:
+        """Return (position, keywords starting there) for every position with a match"""
+        if self._pattern is None:
+            return []
+        prefix_keywords = self._prefix_keywords
+        return [(match.start(), prefix_keywords[match.group(1)]) for match in self._pattern.finditer(text)]
+
+    def match(self, text: str) -> Set[str]:
+        """Return the labels of every keyword set with at least one keyword in text"""
+        if self._pattern is None:
+            return set()
+        return set().union(*map(self._prefix_labels.__getitem__, set(self._pattern.findall(text))))
@@ -0,0 +1,164 @@
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# A VPA around its '@' (rsp9974-1@okicici). Anchoring on the '@' instead of trying
+# every position of the text costs a find per '@'; local parts are short, so only
+# a bounded window before it is searched.
+VPA_LOCAL_PART = re.compile(r'[\w.\-]+\Z')
+VPA_DOMAIN = re.compile(r'[\w.\-]+')
+VPA_LOCAL_WINDOW = 64
+# Payment aggregators' shared QR and collect VPAs stand for many merchants, so they
+# never key the memo (paytmqr281005050101@paytm, bharatpe09876@yesbankltd, q123456@ybl)
+AGGREGATOR_VPA_PATTERN = re.compile(
+    r'(?:paytmqr|bharatpe|gpay-|q\d|razorpay|rzp|cf\.|cashfree|payu|billdesk|pinelabs|ezetap|mswipe|phonepe|'
+    r'paytm-|upiqr|qr\d)'
+)
+# Payee or payer named after "by"/"to" when the message carries no VPA
+# ("... thru UPI/511857530160 by atodariyadharme.", "paid to swiggy"). The word
+# boundary before by/to is checked by hand: a leading \b stops the regex engine
+# from skipping ahead to the next 'b'/'t'.
+NAMED_MERCHANT_PATTERN = re.compile(r'(?:by|to)\s+(?:vpa\s+)?([a-z][\w.\-]*)')
+# Words that follow "by"/"to" in bank templates without naming anyone
+NOT_MERCHANTS = frozenset([
+    'your', 'you', 'the', 'account', 'acct', 'a/c', 'upi', 'vpa', 'card', 'mobile', 'self', 'bank', 'ref',
+    'neft', 'imps', 'rtgs', 'inr', 'credited', 'debited', 'paid', 'transferred', 'received', 'wallet',
+    'beneficiary', 'merchant',
+])
+
+def merchant_key(description: str) -> Optional[str]:
+    """The VPA, or failing that the name after "by"/"to", that identifies who a transaction was with.
+
+    Aggregator VPAs are skipped: the merchant behind them differs from payment to payment.
+    """
+    lower = description.lower()
+    at = lower.find('@')
+    while at != -1:
+        local = VPA_LOCAL_PART.search(lower, max(0, at - VPA_LOCAL_WINDOW), at)
+        domain = VPA_DOMAIN.match(lower, at + 1)
+        if local and domain and not AGGREGATOR_VPA_PATTERN.match(lower, local.start()):
+            return lower[local.start():domain.end()]
+        at = lower.find('@', at + 1)
+    match = NAMED_MERCHANT_PATTERN.search(lower)
+    while match:
+        start = match.start()
+        if not start or not (lower[start - 1].isalnum() or lower[start - 1] == '_'):
+            name = match.group(1).rstrip('.-')
+            # A name running into '@' is a VPA's local part, already accepted or skipped above
+            if len(name) >= 3 and name not in NOT_MERCHANTS and lower[match.end(1):match.end(1) + 1] != '@':
+                return name
+        match = NAMED_MERCHANT_PATTERN.search(lower, start + 1)
+    return None
+
+MERCHANT_MEMO_SIZE = 4096
+
+class MerchantMemo:
+    """Merchant key -> category memo consulted before the keyword scan.
+
+    A bounded LRU, optionally backed by an SQLite table shared across runs and
+    processes. Every entry is tagged with a digest of the category rules that
+    produced it; entries made under other rules are purged on open and never
+    returned, so changing the categories invalidates the memo.
+    """
+
+    FLUSH_EVERY = 64
+
+    def __init__(self, rules_digest: str, path: Optional[str] = None, max_merchants: int = MERCHANT_MEMO_SIZE):
+        self.rules_digest = rules_digest
+        self.path = path
+        self.max_merchants = max_merchants
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+        self._pending = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = None
+        # Whether the table holds more than the LRU preloaded, so misses must check it
+        self._partial = False
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS merchant_categories (merchant TEXT PRIMARY KEY, category TEXT NOT NULL, '
+                'rules_digest TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+            self.conn.execute('DELETE FROM merchant_categories WHERE rules_digest != ?', (rules_digest,))
+            self.conn.commit()
+            rows = self.conn.execute(
+                'SELECT merchant, category FROM merchant_categories WHERE rules_digest = ? ORDER BY updated_at DESC LIMIT ?',
+                (rules_digest, max_merchants + 1)
+            ).fetchall()
+            self._partial = len(rows) > max_merchants
+            # Oldest first, so the most recently used end up at the LRU's fresh end
+            for merchant, category in reversed(rows[:max_merchants]):
+                self._entries[merchant] = category
+
+    def get(self, merchant: str) -> Optional[str]:
+        """Memoised category of a merchant, or None"""
+        with self._lock:
+            category = self._entries.get(merchant)
+            if category is not None:
+                self._entries.move_to_end(merchant)
+                self.hits += 1
+                return category
+            if self._partial:
+                row = self.conn.execute(
+                    'SELECT category FROM merchant_categories WHERE merchant = ? AND rules_digest = ?',
+                    (merchant, self.rules_digest)
+                ).fetchone()
+                if row is not None:
+                    self._remember(merchant, row[0])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, merchant: str, category: str):
+        with self._lock:
+            self._remember(merchant, category)
+            if self.conn is not None:
+                self._pending.append((merchant, category, self.rules_digest, time.time()))
+                if len(self._pending) >= self.FLUSH_EVERY:
+                    self._flush()
+
+    def _remember(self, merchant: str, category: str):
+        self._entries[merchant] = category
+        self._entries.move_to_end(merchant)
+        if len(self._entries) > self.max_merchants:
+            self._entries.popitem(last=False)
+            # Evicted entries stay in the table
+            self._partial = self.conn is not None
+
+    def flush(self):
+        """Write memoised categories not yet in the table"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self.conn is None or not self._pending:
+            return
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO merchant_categories (merchant, category, rules_digest, updated_at) VALUES (?, ?, ?, ?)',
+            self._pending
+        )
+        self.conn.commit()
+        self._pending = []
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            'merchants': len(self._entries)
+        }
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,327 @@
+import re
+from bisect import bisect_left
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from keyword_matcher import KeywordMatcher
+
+# Characters that re.IGNORECASE folds to an ASCII letter but str.lower() does not
+# (U+0130 even lowers to two characters). They are folded one for one before
+# lowering, so offsets are kept and every message takes the token path.
+CASE_FOLD_HAZARDS = re.compile('[\u0130\u0131\u017f]')
+CASE_FOLD = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+
+AMOUNT_TOKEN_PATTERN = re.compile(r'rs(\.?)(\s*)(\d+(?:,\d+)*)(\.\d{1,2})?(\s*)')
+INR_TOKEN_PATTERN = re.compile(r'inr()(\s+)(\d+(?:,\d+)*)(\.\d{1,2})?(\s*)')
+CREDITED_WITH_PATTERN = re.compile(r'credited with\s+(\d+(?:,\d+)*(?:\.\d{1,2})?)\s+on')
+CREDITED_WITH_INR_PATTERN = re.compile(r'credited with inr()(\s+)(\d+(?:,\d+)*)(\.\d{1,2})?(\s*)')
+ACCOUNT_TOKEN_PATTERN = re.compile(r'a/c[:\s]*(?:\.{3}(\d{4})|x+(\d{4}))')
+REFERENCE_PATTERNS = [
+    ('upi ref', re.compile(r'upi ref[:\s]*no[:\s]*(\w+)')),   # UPI Ref No 556899569329
+    ('upi ref', re.compile(r'upi ref[:\s]*(\w+)')),           # UPI Ref:538074046613
+    ('ref', re.compile(r'ref[:\s]*(\w+)')),                   # Ref:553430571659
+    ('upi', re.compile(r'upi[:/](\w+)')),                     # UPI/453521403170
+]
+
+# Literal anchors of every extraction pattern; each one becomes a token
+TOKEN_WORDS = [
+    'rs', 'inr', 'a/c', 'upi', 'ref', 'upi ref', '\n',
+    'credited', 'debited', 'transferred', 'withdrawn', 'paid', 'charged', 'received',
+    'deposited', 'dr.', 'cr.', 'refund', 'cashback', 'purchase', 'deducted', 'spent', 'added',
+    'credited with', 'debited from a/c', 'and credited', 'bank of baroda', '-bob',
+]
+
+# Amount forms used by the extraction patterns
+ANY_AMOUNT = 'any'            # rs\.?\s*<amount>
+UNSPACED_AMOUNT = 'unspaced'  # rs\.?<amount>
+SPACED_AMOUNT = 'spaced'      # rs\s+<amount>
+
+class AmountToken:
+    """An amount match with both the 1-2 and exactly-2 decimal readings.
+
+    Built from a match whose groups are (dot, spaces, integer, fraction,
+    trailing spaces), so `rs` amounts, `inr` amounts and anchored
+    `credited with inr` matches all share one representation.
+    """
+
+    def __init__(self, match):
+        dot, space, integer, fraction, trailing = match.groups()
+        self.start = match.start()
+        self.has_dot = bool(dot)
+        self.has_space = bool(space)
+        integer = integer.replace(',', '')
+        self.end = match.start(5)
+        # Where a word following the amount (after at least one space) would start
+        self.follow = match.end() if trailing else -1
+        if fraction is None:
+            self.value = self.value_2dp = float(integer)
+            self.end_2dp, self.follow_2dp = self.end, self.follow
+        elif len(fraction) == 3:
+            self.value = self.value_2dp = float(integer + fraction)
+            self.end_2dp, self.follow_2dp = self.end, self.follow
+        else:
+            # A single decimal digit: the two-decimal reading stops before the dot
+            self.value = float(integer + fraction)
+            self.value_2dp = float(integer)
+            self.end_2dp, self.follow_2dp = match.end(3), -1
+
+class ScannedMessage:
+    """Token stream for one message, produced by a single scan.
+
+    Keywords are indexed both by word (`positions`) and by start offset
+    (`words_at`); amount, account and reference tokens are parsed only at
+    their anchor offsets. The pattern helpers evaluate the extractors'
+    regexes over these tokens and return (amount token, match start, match
+    end), or None where the regex would not match.
+    """
+
+    def __init__(self, text: str, lower: str, tokens: List[Tuple[int, FrozenSet[str]]], balance_keywords: List[str]):
+        self.text = text
+        self.lower = lower
+        self.words_at = dict(tokens)
+        positions: Dict[str, List[int]] = {}
+        for start, words in tokens:
+            for word in words:
+                if word in positions:
+                    positions[word].append(start)
+                else:
+                    positions[word] = [start]
+        self.positions = positions
+        self.newlines = positions.get('\n', ())
+        self._occurrences: Dict[tuple, List[Tuple[int, int, int]]] = {}
+
+        amounts = [AmountToken(m) for m in
+                   (AMOUNT_TOKEN_PATTERN.match(lower, p) for p in positions.get('rs', ())) if m]
+        self.amounts = amounts
+        self._amounts = {ANY_AMOUNT: (amounts, [token.start for token in amounts])}
+        if amounts:
+            unspaced = [token for token in amounts if not token.has_space]
+            spaced = [token for token in amounts if token.has_space and not token.has_dot]
+            self._amounts[UNSPACED_AMOUNT] = (unspaced, [token.start for token in unspaced])
+            self._amounts[SPACED_AMOUNT] = (spaced, [token.start for token in spaced])
+        else:
+            self._amounts[UNSPACED_AMOUNT] = self._amounts[SPACED_AMOUNT] = self._amounts[ANY_AMOUNT]
+        self.inr_amounts = [AmountToken(m) for m in
+                            (INR_TOKEN_PATTERN.match(lower, p) for p in positions.get('inr', ())) if m]
+        self.inr_starts = [token.start for token in self.inr_amounts]
+
+        self.credited_with = None
+        self.credited_with_inr = None
+        if 'credited with' in positions:
+            self.credited_with = self._first_anchored(CREDITED_WITH_PATTERN, 'credited with')
+            credited_with_inr = self._first_anchored(CREDITED_WITH_INR_PATTERN, 'credited with')
+            if credited_with_inr:
+                self.credited_with_inr = AmountToken(credited_with_inr)
+
+        self.dotted_account = None
+        self.masked_account = None
+        for p in positions.get('a/c', ()):
+            account = ACCOUNT_TOKEN_PATTERN.match(lower, p)
+            if account:
+                if account.group(1) and self.dotted_account is None:
+                    self.dotted_account = account.group(1)
+                elif account.group(2) and self.masked_account is None:
+                    self.masked_account = account.group(2)
+
+        # Balance keyword intervals, sorted by start
+        self.balance_spans = sorted((p, p + len(word)) for word in balance_keywords for p in positions.get(word, ()))
+        self.balance_starts = [span[0] for span in self.balance_spans]
+
+    def _first_anchored(self, pattern, anchor: str):
+        """Leftmost match of a pattern that starts with a literal anchor"""
+        for p in self.positions.get(anchor, ()):
+            match = pattern.match(self.lower, p)
+            if match:
+                return match
+        return None
+
+    def has(self, word: str) -> bool:
+        return word in self.positions
+
+    def single_line(self, start: int, end: int) -> bool:
+        """True when no newline lies in [start, end), i.e. `.*?` can span it"""
+        newlines = self.newlines
+        if not newlines:
+            return True
+        i = bisect_left(newlines, start)
+        return i == len(newlines) or newlines[i] >= end
+
+    def occurrences(self, words: Tuple[str, ...]) -> List[Tuple[int, int, int]]:
+        """(start, alternative index, end) of every occurrence, in regex search order"""
+        found = self._occurrences.get(words)
+        if found is None:
+            found = []
+            for index, word in enumerate(words):
+                for p in self.positions.get(word, ()):
+                    found.append((p, index, p + len(word)))
+            found.sort()
+            self._occurrences[words] = found
+        return found
+
+    # The pattern helpers below return (amount token, match start, match end)
+
+    def amount_before(self, words: Tuple[str, ...], form: str = ANY_AMOUNT, two_decimals: bool = False):
+        """`<amount>\\s+(?:words)`: first amount of the form followed by one of words"""
+        words_at = self.words_at
+        for token in self._amounts[form][0]:
+            follow = token.follow_2dp if two_decimals else token.follow
+            found = words_at.get(follow)
+            if found:
+                for word in words:
+                    if word in found:
+                        return token, token.start, follow + len(word)
+        return None
+
+    def keyword_then_amount(self, words: Tuple[str, ...], form: str = ANY_AMOUNT, two_decimals: bool = False):
+        """`(?:words).*?<amount>`: leftmost keyword with an amount of the form after it on the same line"""
+        tokens, starts = self._amounts[form]
+        if not tokens:
+            return None
+        for start, _, end in self.occurrences(words):
+            i = bisect_left(starts, end)
+            if i < len(starts) and self.single_line(end, starts[i]):
+                token = tokens[i]
+                return token, start, token.end_2dp if two_decimals else token.end
+        return None
+
+    def keyword_then_inr(self, words: Tuple[str, ...]):
+        """`(?:words).*?inr\\s+<amount>` over INR tokens"""
+        starts = self.inr_starts
+        if not starts:
+            return None
+        for start, _, end in self.occurrences(words):
+            i = bisect_left(starts, end)
+            if i < len(starts) and self.single_line(end, starts[i]):
+                return self.inr_amounts[i], start, self.inr_amounts[i].end
+        return None
+
+    def amount_then_keyword(self, words: Tuple[str, ...], form: str = ANY_AMOUNT, two_decimals: bool = False):
+        """`<amount>.*?(?:words)`: leftmost amount of the form with a keyword after it on the same line"""
+        tokens = self._amounts[form][0]
+        if not tokens:
+            return None
+        occurrences = self.occurrences(words)
+        if not occurrences:
+            return None
+        starts = [o[0] for o in occurrences]
+        for token in tokens:
+            end = token.end_2dp if two_decimals else token.end
+            i = bisect_left(starts, end)
+            if i < len(starts) and self.single_line(end, starts[i]):
+                return token, token.start, occurrences[i][2]
+        return None
+
+    def amount_verb_until(self, form: str, verb: str, marker: str, two_decimals: bool = False):
+        """`<amount>\\s+<verb>.*?<marker>`"""
+        if marker not in self.positions:
+            return None
+        words_at = self.words_at
+        for token in self._amounts[form][0]:
+            follow = token.follow_2dp if two_decimals else token.follow
+            found = words_at.get(follow)
+            if found and verb in found:
+                end = self.next_on_line(marker, follow + len(verb))
+                if end is not None:
+                    return token, token.start, end
+        return None
+
+    def next_on_line(self, word: str, pos: int) -> Optional[int]:
+        """End of the first occurrence of word at or after pos, if still on the same line"""
+        starts = self.positions.get(word, ())
+        i = bisect_left(starts, pos)
+        if i < len(starts) and self.single_line(pos, starts[i]):
+            return starts[i] + len(word)
+        return None
+
+    def near_balance(self, start: int, end: int) -> bool:
+        """True when a balance keyword lies entirely inside [start, end)"""
+        starts = self.balance_starts
+        if not starts:
+            return False
+        spans = self.balance_spans
+        i = bisect_left(starts, start)
+        while i < len(spans) and spans[i][0] < end:
+            if spans[i][1] <= end:
+                return True
+            i += 1
+        return False
+
+    def reference(self) -> Optional[str]:
+        for anchor, pattern in REFERENCE_PATTERNS:
+            for p in self.positions.get(anchor, ()):
+                match = pattern.match(self.lower, p)
+                if match:
+                    # Slice the original text so the reference keeps its case
+                    return self.text[match.start(1):match.end(1)]
+        return None
+
+    def has_reference(self) -> bool:
+        """True when `ref[:\\s]*\\w+|upi[:/]\\w+` matches anywhere"""
+        for anchor, pattern in REFERENCE_PATTERNS[2:]:
+            for p in self.positions.get(anchor, ()):
+                if pattern.match(self.lower, p):
+                    return True
+        return False
+
+def fold_lower(text: str) -> str:
+    """Lowercase text the way re.IGNORECASE sees it, keeping every offset"""
+    if CASE_FOLD_HAZARDS.search(text):
+        text = text.translate(CASE_FOLD)
+    return text.lower()
+
+class PreparedMessage:
+    """A message normalised once and shared by classification, fingerprinting and extraction.
+
+    Holds the original text, its plain lowercase for classification and the
+    fingerprint, its fold_lower() form for the token stream, and the lowercased
+    sender; the sender's bank profile and keyword classes are filled in by
+    whoever resolves them. The token stream is only built when an extractor first asks for it,
+    so messages rejected by classification never pay for it.
+    """
+
+    __slots__ = ('text', 'lower', 'folded', 'sender', 'sender_lower', 'profile', 'sender_classes', '_scanner', '_scan')
+
+    def __init__(self, scanner: 'MessageScanner', text: str, sender: str = ''):
+        self.text = text
+        # Classification keeps str.lower() so MessageType is unchanged for
+        # messages with case-fold hazards; only extraction offsets need folding
+        self.lower = text.lower()
+        self.folded = text.translate(CASE_FOLD).lower() if CASE_FOLD_HAZARDS.search(text) else self.lower
+        self.sender = sender
+        self.sender_lower = sender.lower()
+        self.profile = None
+        self.sender_classes: FrozenSet[str] = frozenset()
+        self._scanner = scanner
+        self._scan: Optional[ScannedMessage] = None
+
+    @property
+    def scan(self) -> ScannedMessage:
+        """Token stream over the folded text, with amount tokens and balance keyword spans"""
+        if self._scan is None:
+            self._scan = self._scanner.scan_lowered(self.text, self.folded)
+        return self._scan
+
+class MessageScanner:
+    """Tokenizes a message in one pass over its lowercased text"""
+
+    def __init__(self, keywords: List[str], balance_keywords: List[str]):
+        self.balance_keywords = list(balance_keywords)
+        words = list(dict.fromkeys(TOKEN_WORDS + list(keywords) + self.balance_keywords))
+        self._matcher = KeywordMatcher({'token': words})
+        self._longest_word = max(len(word) for word in words)
+
+    def prepare(self, message: str, sender: str = '') -> PreparedMessage:
+        return PreparedMessage(self, message, sender)
+
+    def scan_lowered(self, message: str, lower: str) -> ScannedMessage:
+        """Token stream of a message whose fold_lower() text is already known"""
+        return ScannedMessage(message, lower, self._matcher.scan(lower), self.balance_keywords)
+
+    def words_overlapping(self, lower: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """(start, end) of every token word occurrence in lower that overlaps lower[start:end]"""
+        offset = max(0, start - self._longest_word + 1)
+        spans = []
+        for position, words in self._matcher.scan(lower[offset:end + self._longest_word - 1]):
+            for word in words:
+                word_start = offset + position
+                if word_start < end and word_start + len(word) > start:
+                    spans.append((word_start, word_start + len(word)))
+        return spans
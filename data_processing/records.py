@@ -0,0 +1,54 @@
+from typing import Dict, Optional
+
+class ExtractorVote:
+    """One extractor's reading of a message: amount, type and account with its confidence"""
+
+    __slots__ = ('amount', 'type', 'account', 'confidence')
+
+    def __init__(self, amount: Optional[float] = None, transaction_type: Optional[str] = None,
+                 account: Optional[str] = None, confidence: int = 0):
+        self.amount = amount
+        self.type = transaction_type
+        self.account = account
+        self.confidence = confidence
+
+    def to_dict(self) -> Dict:
+        return {'amount': self.amount, 'type': self.type, 'account': self.account, 'confidence': self.confidence}
+
+    def __repr__(self) -> str:
+        return f"ExtractorVote({self.to_dict()})"
+
+class TransactionPayload:
+    """A transaction ready for the bulk-create endpoint; becomes JSON only when it is sent"""
+
+    __slots__ = ('user_id', 'source_message_id', 'account_number', 'transaction_type', 'category', 'amount',
+                 'currency', 'transaction_date', 'description', 'reference_id')
+
+    def __init__(self, user_id: str, source_message_id: str, account_number: str, transaction_type: str,
+                 category: str, amount: float, transaction_date: str, description: str,
+                 reference_id: Optional[str] = None, currency: str = 'INR'):
+        self.user_id = user_id
+        self.source_message_id = source_message_id
+        self.account_number = account_number
+        self.transaction_type = transaction_type
+        self.category = category
+        self.amount = amount
+        self.currency = currency
+        self.transaction_date = transaction_date
+        self.description = description
+        self.reference_id = reference_id
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TransactionPayload) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"TransactionPayload({self.to_dict()})"
+
+def to_json(record):
+    """json.dumps default hook for the record types"""
+    if isinstance(record, (ExtractorVote, TransactionPayload)):
+        return record.to_dict()
+    raise TypeError(f"Object of type {type(record).__name__} is not JSON serializable")
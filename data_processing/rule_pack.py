@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import pickle
+import hashlib
+import threading
+from typing import Dict, List, Optional
+import keyword_matcher
+import message_scanner
+from keyword_matcher import KeywordMatcher
+from message_scanner import MessageScanner
+
+RULE_PACK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rule_pack.json')
+
+# Bump when RulePack's compiled layout changes so stale cache files are rebuilt
+CACHE_FORMAT = 2
+
+def _code_digest() -> str:
+    """Digest of the modules whose objects a cached pack pickles.
+
+    A pickle restores attributes, not __init__, so a cache written before an edit
+    to TOKEN_WORDS or to the matcher layout would otherwise be reused as is.
+    """
+    code = hashlib.sha256()
+    for module_path in (__file__, keyword_matcher.__file__, message_scanner.__file__):
+        with open(module_path, 'rb') as f:
+            code.update(f.read())
+    return code.hexdigest()
+
+CODE_DIGEST = _code_digest()
+
+class RulePack:
+    """Keyword lists and category rules of one rule pack version, compiled once.
+
+    Everything the classifier, extractors and categorizers match against lives in
+    a versioned JSON pack. Loading it builds the keyword matchers and the message
+    scanner; extractors share the pack instead of rebuilding them, and a pool
+    forked after loading inherits it copy-on-write.
+    """
+
+    def __init__(self, rules: Dict, digest: str = ''):
+        self.version = str(rules['version'])
+        self.digest = digest
+
+        classification = rules['classification']
+        self.credit_keywords: List[str] = classification['credit_keywords']
+        self.debit_keywords: List[str] = classification['debit_keywords']
+        self.bank_keywords: List[str] = classification['bank_keywords']
+        self.bank_senders: List[str] = classification['bank_senders']
+        self.telecom_senders: List[str] = classification['telecom_senders']
+        self.promotional_senders: List[str] = classification['promotional_senders']
+        self.spam_indicators: List[str] = classification['spam_indicators']
+        self.security_keywords: List[str] = classification['security_keywords']
+        self.otp_keywords: List[str] = classification['otp_keywords']
+        self.telecom_indicators: List[str] = classification['telecom_indicators']
+        self.promotional_keywords: List[str] = classification['promotional_keywords']
+
+        extraction = rules['extraction']
+        self.balance_keywords: List[str] = extraction['balance_keywords']
+        self.bank_indicators: List[str] = extraction['bank_indicators']
+        self.transaction_verbs = tuple(extraction['transaction_verbs'])
+        self.amount_context_words = self.transaction_verbs + tuple(extraction['amount_context_words'])
+
+        # Category -> keywords, in priority order (first matching category wins)
+        self.categories: Dict[str, List[str]] = rules['categories']
+        self.description_categories: Dict[str, List[str]] = rules['description_categories']
+
+        # Compiled once: classification scans body and sender once each, extraction tokenizes once
+        self.body_matcher = KeywordMatcher({
+            'spam': self.spam_indicators,
+            'credit': self.credit_keywords,
+            'debit': self.debit_keywords,
+            'bank': self.bank_keywords,
+            'security': self.security_keywords,
+            'otp': self.otp_keywords,
+            'telecom': self.telecom_indicators,
+            'promotional': self.promotional_keywords,
+        })
+        self.sender_matcher = KeywordMatcher({
+            'promotional_sender': self.promotional_senders,
+            'bank_sender': self.bank_senders,
+            'telecom_sender': self.telecom_senders,
+        })
+        # The amount-context extractors look their words up in the token stream
+        self.scanner = MessageScanner(self.credit_keywords + self.debit_keywords + self.bank_indicators +
+                                      list(self.amount_context_words), self.balance_keywords)
+        # One automaton per category set, labelled by category, for single-pass categorization
+        self.category_matchers = {
+            'categories': KeywordMatcher(self.categories),
+            'description_categories': KeywordMatcher(self.description_categories),
+        }
+
+    def __repr__(self) -> str:
+        return f"RulePack(version={self.version!r})"
+
+def load_rule_pack(path: str = RULE_PACK_PATH, cache_path: Optional[str] = None) -> RulePack:
+    """Load and compile a rule pack, reusing a cache file written for the same pack.
+
+    The cache holds the compiled pack keyed by a digest of the JSON and of the
+    code that compiles it, so an edited pack or matcher is recompiled even when
+    no version was bumped. Unpickling skips the
+    trie and prefix-table construction; only the flattened regexes are rebuilt.
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+
+    # Cache diagnostics go to stderr: callers such as categorize_transaction.py reply with JSON on stdout
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cache_format, cached_code, cached_digest, pack = pickle.load(f)
+            if cache_format == CACHE_FORMAT and cached_code == CODE_DIGEST and cached_digest == digest:
+                return pack
+        except Exception as e:
+            print(f"Ignoring unreadable rule pack cache {cache_path}: {str(e)}", file=sys.stderr)
+
+    pack = RulePack(json.loads(source), digest)
+    if cache_path:
+        try:
+            # Written aside and renamed so concurrent loaders never read half a file
+            partial = f"{cache_path}.{os.getpid()}.tmp"
+            with open(partial, 'wb') as f:
+                pickle.dump((CACHE_FORMAT, CODE_DIGEST, digest, pack), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(partial, cache_path)
+        except OSError as e:
+            print(f"Could not write rule pack cache {cache_path}: {str(e)}", file=sys.stderr)
+    return pack
+
+# Process-wide pack that new extractors and categorizers pick up
+_current_pack: Optional[RulePack] = None
+_pack_lock = threading.Lock()
+
+def current_rule_pack() -> RulePack:
+    """The installed rule pack, loading the bundled one on first use"""
+    global _current_pack
+    pack = _current_pack
+    if pack is None:
+        with _pack_lock:
+            if _current_pack is None:
+                _current_pack = load_rule_pack(RULE_PACK_PATH, RULE_PACK_PATH + '.cache')
+            pack = _current_pack
+    return pack
+
+def install_rule_pack(pack: RulePack) -> RulePack:
+    """Make a compiled pack current; holders of the previous pack keep using it"""
+    global _current_pack
+    with _pack_lock:
+        previous = _current_pack
+        _current_pack = pack
+    return previous
+
+def reload_rule_pack(path: str = RULE_PACK_PATH) -> RulePack:
+    """Compile a pack from disk and install it, for hot reloads"""
+    pack = load_rule_pack(path, path + '.cache')
+    install_rule_pack(pack)
+    return pack
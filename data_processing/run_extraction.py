@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Transaction Extraction Runner
-Usage: python run_extraction.py [--limit NUMBER]
+Usage: python run_extraction.py [--limit NUMBER] [--workers NUMBER] [--chunk-size NUMBER] [--pipeline] [--no-claim] [--fast-consensus]
+       python run_extraction.py --daemon [--socket PATH] [--workers NUMBER] [--fast-consensus] [--merchant-memo PATH]
 """
 
 import argparse
@@ -10,14 +11,38 @@ from transaction_extractor import TransactionExtractor
 def main():
     parser = argparse.ArgumentParser(description='Process transaction messages')
     parser.add_argument('--limit', type=int, default=None, help='Number of messages to process (default: all)')
+    parser.add_argument('--chunk-size', type=int, default=None, help='Messages fetched and saved per chunk (default: 500)')
+    parser.add_argument('--pipeline', action='store_true', help='Overlap fetching, extraction and saving of consecutive chunks')
+    # Claiming is the default so a manual run and the backend's daemon never extract the same messages
+    parser.add_argument('--claim', dest='claim', action='store_true', default=True, help='Claim messages under a lease so concurrent runs split the backlog (default)')
+    parser.add_argument('--no-claim', dest='claim', action='store_false', help='Fetch without claiming, e.g. against a backend without the claim routes')
+    parser.add_argument('--fast-consensus', action='store_true', help='Stop voting once the remaining extractors cannot change the result')
+    parser.add_argument('--merchant-memo', default=None, help='Opt in to memoising categories per merchant, kept in this SQLite file across runs')
+    parser.add_argument('--workers', type=int, default=1, help='Extraction worker processes (default: 1, no pool)')
+    parser.add_argument('--daemon', action='store_true', help='Stay resident and run JSON-line jobs from stdin (or --socket)')
+    parser.add_argument('--socket', default=None, help='Unix socket path to serve daemon jobs on instead of stdin')
     args = parser.parse_args()
     
     # Configure your API base URL here
     API_BASE_URL = "http://localhost:5000/api"
     
+    if args.daemon:
+        from extraction_daemon import ExtractionDaemon
+        daemon = ExtractionDaemon(API_BASE_URL, args.workers, args.chunk_size, args.pipeline, args.claim,
+                                  fast_consensus=args.fast_consensus, merchant_memo_path=args.merchant_memo)
+        try:
+            if args.socket:
+                daemon.serve_socket(args.socket)
+            else:
+                daemon.serve_stdin()
+        finally:
+            daemon.close()
+        return
+    
     print(f"Starting transaction extraction with limit: {args.limit}...")
-    extractor = TransactionExtractor(API_BASE_URL)
-    extractor.process_messages(args.limit)
+    extractor = TransactionExtractor(API_BASE_URL, fast_consensus=args.fast_consensus,
+                                     merchant_memo_path=args.merchant_memo)
+    extractor.process_messages(args.limit, args.workers, args.chunk_size, args.pipeline, args.claim)
     print("Extraction completed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from message_scanner import MessageScanner, fold_lower
+
+# Variable spans: digits and VPAs are masked one character for one, so the template
+# keeps every offset the extractors' distance rules (balance window, keyword
+# distance) depend on. A VPA match can only start where a run of VPA characters
+# starts, and the lookbehind says so: without it every position of a long run is
+# retried, which is quadratic.
+VPA_PATTERN = re.compile(r'(?<![\w.\-])[\w.\-]+@[\w.\-]+')
+NUMBER_PATTERN = re.compile(r'\d+(?:[,.]\d+)*')
+DIGIT_MASK = str.maketrans('0123456789', '##########')
+# Letters of a VPA that no extractor keyword covers; digits become '#' and
+# punctuation stays, since the extraction patterns read both after an anchor
+VPA_LETTER = '*'
+
+def _number(slot: str) -> Optional[float]:
+    try:
+        return float(slot.replace(',', ''))
+    except ValueError:
+        return None
+
+def _amount_range(amount) -> int:
+    """Validation bucket of an amount; a template only covers one bucket"""
+    if not amount:
+        return 0
+    if amount < 0.01 or amount > 10000000:
+        return 1
+    if amount < 1 or amount > 1000000:
+        return 2
+    return 3
+
+def _vote_signature(votes: Sequence[Optional[float]]) -> Tuple:
+    """Which votes name the same amount and how those amounts rank.
+
+    The consensus amount and the agreement behind the confidence depend on the
+    vote values through nothing else, so messages of a template with the same
+    signature get the same outcome from the vote. Votes without an amount are None.
+    """
+    groups: Dict[float, int] = {}
+    partition = tuple(groups.setdefault(vote, len(groups)) if vote else None for vote in votes)
+    amounts = list(groups)
+    return partition, tuple(sorted(range(len(amounts)), key=amounts.__getitem__))
+
+class TemplateCache:
+    """Learns SMS templates and fills their slots without running the extractors.
+
+    A template key is the sender plus the message with digits and VPAs masked
+    one character for one (keywords inside a VPA are kept when a scanner is
+    given); the numbers are the template's slots. The first high-confidence
+    extraction records which slots hold the amount, account and reference. The
+    template is trusted once `confirmations` later full extractions agree with
+    that layout; any disagreement retires it for good. The slots each extractor
+    voted for are recorded too: a message is only served from the template when
+    its digits give those votes the same _vote_signature(), since otherwise the
+    vote could settle on another amount or confidence. One cache may be shared by
+    threads (api_server's request extractor), so the LRU is only touched under a lock.
+    """
+
+    def __init__(self, max_templates: int = 256, confirmations: int = 1, min_confidence: int = 80,
+                 scanner: Optional[MessageScanner] = None):
+        self.max_templates = max_templates
+        # Keywords inside a VPA ("refund.shop@ybl") reach the extractors, so they stay in the key
+        self.scanner = scanner
+        self.confirmations = confirmations
+        self.min_confidence = min_confidence
+        self._templates: 'OrderedDict[Tuple[str, str], Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def template(self, message: str, sender: str) -> Tuple[Tuple[str, str], List[str]]:
+        """Return (template key, slots) for a message"""
+        parts = []
+        last = 0
+        lower = None
+        for match in VPA_PATTERN.finditer(message):
+            start, end = match.span()
+            kept = set()
+            if self.scanner is not None:
+                lower = lower if lower is not None else fold_lower(message)
+                for word_start, word_end in self.scanner.words_overlapping(lower, start, end):
+                    kept.update(range(max(word_start, start), min(word_end, end)))
+            parts.append(message[last:start])
+            parts.append(''.join(char if i in kept or not char.isalpha() else VPA_LETTER
+                                 for i, char in enumerate(match.group(), start)).translate(DIGIT_MASK))
+            last = end
+        parts.append(message[last:])
+        masked = ''.join(parts)
+        # VPA digits are already masked, so only the message's own numbers become slots
+        return (sender.lower(), masked.translate(DIGIT_MASK)), NUMBER_PATTERN.findall(masked)
+
+    def lookup(self, key: Tuple[str, str], slots: List[str]) -> Optional[Tuple]:
+        """Fill a trusted template's slots into (amount, type, account, confidence, reference), or return None on a miss"""
+        with self._lock:
+            return self._lookup(key, slots)
+
+    def _lookup(self, key: Tuple[str, str], slots: List[str]) -> Optional[Tuple]:
+        entry = self._templates.get(key)
+        if entry is None or not entry['usable'] or entry['confirmed'] < self.confirmations:
+            self.misses += 1
+            return None
+
+        amount = _number(slots[entry['amount'][0]])
+        if _amount_range(amount) != entry['range']:
+            self.misses += 1
+            return None
+        votes = [_number(slots[vote[0]]) if vote is not None else None for vote in entry['votes']]
+        if _vote_signature(votes) != entry['signature']:
+            self.misses += 1
+            return None
+
+        self._templates.move_to_end(key)
+        self.hits += 1
+        return (amount, entry['type'],
+                slots[entry['account'][0]] if entry['account'] is not None else 'unknown',
+                entry['confidence'],
+                slots[entry['reference'][0]] if entry['reference'] is not None else None)
+
+    def observe(self, key: Tuple[str, str], slots: List[str], fields: Tuple, votes: Sequence[Optional[float]]):
+        """Learn from, confirm or retire a template using a full extraction's
+        (amount, type, account, confidence, reference) and the amount of every extractor vote"""
+        with self._lock:
+            self._observe(key, slots, fields, votes)
+
+    def _observe(self, key: Tuple[str, str], slots: List[str], fields: Tuple, votes: Sequence[Optional[float]]):
+        entry = self._templates.get(key)
+        if entry is not None and not entry['usable']:
+            return
+
+        layout = self._layout(slots, fields, votes)
+        if layout is None:
+            if entry is not None:
+                entry['usable'] = False
+            elif fields[3] >= self.min_confidence:
+                # High confidence but not expressible in slots: remember not to retry
+                self._store(key, {'usable': False})
+            return
+
+        if entry is None:
+            layout['confirmed'] = 0
+            self._store(key, layout)
+            return
+        # Digits that voted differently neither confirm nor contradict the layout
+        if entry['signature'] != layout['signature']:
+            return
+
+        for field in ('type', 'confidence', 'range', 'slot_count'):
+            if entry[field] != layout[field]:
+                entry['usable'] = False
+                return
+        for field in ('amount', 'account', 'reference'):
+            if (entry[field] is None) != (layout[field] is None):
+                entry['usable'] = False
+                return
+            if entry[field] is not None:
+                entry[field] = [slot for slot in entry[field] if slot in layout[field]]
+                if not entry[field]:
+                    entry['usable'] = False
+                    return
+        for i, vote in enumerate(entry['votes']):
+            if vote is not None:
+                entry['votes'][i] = [slot for slot in vote if slot in layout['votes'][i]]
+                if not entry['votes'][i]:
+                    entry['usable'] = False
+                    return
+        entry['confirmed'] += 1
+
+    def _layout(self, slots: List[str], fields: Tuple, votes: Sequence[Optional[float]]) -> Optional[Dict]:
+        """Slot positions of the extracted fields and votes, or None when they cannot be expressed in slots"""
+        amount, transaction_type, account_number, confidence, reference_id = fields
+        if confidence < self.min_confidence:
+            return None
+
+        vote_slots = []
+        for vote in votes:
+            if vote is None:
+                vote_slots.append(None)
+                continue
+            vote_slots.append([i for i, slot in enumerate(slots) if vote and _number(slot) == vote])
+            if not vote_slots[-1]:
+                return None
+        voted = {i for vote in vote_slots if vote is not None for i in vote}
+        amount_slots = [i for i, slot in enumerate(slots) if i in voted and _number(slot) == amount]
+        if not amount_slots:
+            return None
+
+        layout = {
+            'usable': True,
+            'type': transaction_type,
+            'confidence': confidence,
+            'range': _amount_range(amount),
+            'slot_count': len(slots),
+            'amount': amount_slots,
+            'votes': vote_slots,
+            'signature': _vote_signature(votes),
+            'account': None,
+            'reference': None
+        }
+        for field, value in (('account', account_number), ('reference', reference_id)):
+            if value is None or (field == 'account' and value == 'unknown'):
+                continue
+            layout[field] = [i for i, slot in enumerate(slots) if slot == value]
+            if not layout[field]:
+                return None
+        return layout
+
+    def _store(self, key: Tuple[str, str], entry: Dict):
+        self._templates[key] = entry
+        self._templates.move_to_end(key)
+        while len(self._templates) > self.max_templates:
+            self._templates.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+                'templates': len(self._templates),
+                'trusted_templates': sum(1 for entry in self._templates.values()
+                                         if entry['usable'] and entry['confirmed'] >= self.confirmations)
+            }
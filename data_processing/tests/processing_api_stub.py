@@ -0,0 +1,146 @@
+import gzip
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+class ProcessingApiStub:
+    """In-memory stand-in of the backend's processing routes, served on a local port.
+
+    Mirrors BackEnd/src/routes/processingRoutes.ts for the calls the extractor
+    makes: unprocessed pages, claim, release, bulk-create and the balance
+    update. Messages are kept in id order; a message is claimable while it is
+    unprocessed and its lease is missing or expired. Like the backend, a save
+    skips transactions whose source message already has one. Saves after the
+    first fail_after succeed answer 500, and the first lost_replies saves commit
+    but answer 502 as if the response was lost, to exercise the extractor's
+    failure paths.
+    """
+
+    def __init__(self, messages: List[Dict], fail_after: Optional[int] = None, lost_replies: int = 0):
+        self.messages = {m['id']: dict(m, processed=False, claimed_by=None, claim_expires_at=None) for m in messages}
+        self.fail_after = fail_after
+        self.lost_replies = lost_replies
+        self.saves = 0
+        self.saved_twice: List[str] = []
+        self.transactions: List[Dict] = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/api"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def claimed(self) -> List[str]:
+        """Ids of unprocessed messages still held by a live lease"""
+        now = time.time()
+        return [m['id'] for m in self.messages.values()
+                if not m['processed'] and m['claimed_by'] and m['claim_expires_at'] > now]
+
+    def _available(self, message: Dict, now: float) -> bool:
+        return not message['processed'] and (message['claim_expires_at'] is None or message['claim_expires_at'] < now)
+
+    def _unprocessed(self, limit: Optional[int], after: Optional[str]) -> Dict:
+        now = time.time()
+        with self.lock:
+            page = [dict(m) for message_id, m in sorted(self.messages.items())
+                    if self._available(m, now) and (after is None or message_id > after)]
+        return {'messages': page[:limit] if limit else page}
+
+    def _claim(self, body: Dict) -> Dict:
+        lease_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            page = [m for _, m in sorted(self.messages.items()) if self._available(m, now)][:int(body.get('limit') or 500)]
+            for message in page:
+                message['claimed_by'] = lease_id
+                message['claim_expires_at'] = now + int(body.get('leaseSeconds') or 300)
+            return {'leaseId': lease_id, 'messages': [dict(m) for m in page]}
+
+    def _release(self, body: Dict) -> Dict:
+        message_ids = body.get('messageIds')
+        released = 0
+        with self.lock:
+            for message in self.messages.values():
+                if message['claimed_by'] != body['leaseId'] or message['processed']:
+                    continue
+                if message_ids and message['id'] not in message_ids:
+                    continue
+                message['claimed_by'] = None
+                message['claim_expires_at'] = None
+                released += 1
+        return {'success': True, 'released': released}
+
+    def _bulk_create(self, body: Dict) -> Optional[Dict]:
+        with self.lock:
+            if self.fail_after is not None and self.saves >= self.fail_after:
+                return None
+            self.saves += 1
+            for message_id in body.get('processedMessageIds') or []:
+                message = self.messages[message_id]
+                if message['processed']:
+                    self.saved_twice.append(message_id)
+                message['processed'] = True
+            saved = {t['source_message_id'] for t in self.transactions}
+            self.transactions.extend(t for t in body.get('transactions') or [] if t['source_message_id'] not in saved)
+            if self.lost_replies:
+                self.lost_replies -= 1
+                return {'lost': True}
+        return {'success': True}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, payload: Dict):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != '/api/processing/messages/unprocessed':
+                    return self._reply(404, {'error': 'Not found'})
+                query = parse_qs(url.query)
+                limit = int(query['limit'][0]) if 'limit' in query else None
+                self._reply(200, stub._unprocessed(limit, query.get('after', [None])[0]))
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    data = gzip.decompress(data)
+                body = json.loads(data or b'{}')
+                path = urlparse(self.path).path
+                if path == '/api/processing/messages/claim':
+                    self._reply(200, stub._claim(body))
+                elif path == '/api/processing/messages/release':
+                    self._reply(200, stub._release(body))
+                elif path == '/api/processing/transactions/bulk-create':
+                    reply = stub._bulk_create(body)
+                    if reply is None:
+                        self._reply(500, {'error': 'Failed to create transactions'})
+                    elif reply.get('lost'):
+                        self._reply(502, {'error': 'Bad gateway'})
+                    else:
+                        self._reply(200, reply)
+                elif path == '/api/user/update-balance':
+                    self._reply(200, {'success': True})
+                else:
+                    self._reply(404, {'error': 'Not found'})
+
+        return Handler
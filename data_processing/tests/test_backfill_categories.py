@@ -0,0 +1,143 @@
+import os
+import uuid
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+import psycopg2.extras
+from backfill_categories import CategoryBackfill
+from db_pool import db_config_from_env
+from transaction_categorizer import TransactionCategorizer
+
+ROWS = [
+    ('00000000-0000-0000-0000-000000000001', 'Rs 250 paid to zomato@okicici', 'Transfer'),
+    ('00000000-0000-0000-0000-000000000002', 'Rs 90 paid to uber@okicici', 'Transport & Travel'),
+    ('00000000-0000-0000-0000-000000000003', None, 'Income'),
+    ('00000000-0000-0000-0000-000000000004', 'Rs 500 recharge of airtel mobile', None),
+]
+
+class FakeCursor:
+    """Server-side cursor stand-in that serves rows in primary-key order"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.itersize = None
+        self.query = None
+
+    def execute(self, query, params=None):
+        self.query = (query, params)
+        if params:
+            self.rows = [row for row in self.rows if row[0] > params[0]]
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, rows=()):
+        self.rows = rows
+        self.writes = 0
+
+    def set_session(self, **kwargs):
+        pass
+
+    def cursor(self, name=None):
+        if name is None:
+            self.writes += 1
+        return FakeCursor(self.rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_dry_run_counts_changes_without_writing(tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    backfill = CategoryBackfill(batch_size=3, dry_run=True, state_path=state_path)
+    connections = [FakeConnection(ROWS), FakeConnection()]
+    backfill.get_db_connection = lambda: connections.pop(0)
+    reader, writer = connections
+
+    summary = backfill.run()
+
+    # zomato and airtel change; uber already matches and the row without a description is kept
+    assert summary['scanned'] == 4
+    assert summary['changed'] == 2
+    assert summary['updated'] == 0
+    assert summary['batches'] == 2
+    assert summary['last_id'] == ROWS[-1][0]
+    assert writer.writes == 0
+    assert not os.path.exists(state_path)
+
+def test_categories_do_not_depend_on_row_order():
+    rows = [
+        ('00000000-0000-0000-0000-000000000001', 'Rs 300 paid to rameshk@okicici for pizza', None),
+        ('00000000-0000-0000-0000-000000000002', 'Rs 200 paid to rameshk@okicici for movie tickets', None),
+    ]
+    backfill = CategoryBackfill(dry_run=True, state_path=None)
+    in_order = dict(backfill.changed_categories(rows))
+    reversed_order = dict(backfill.changed_categories(rows[::-1]))
+    assert in_order == reversed_order
+    assert in_order[rows[0][0]] != in_order[rows[1][0]]
+
+@pytest.fixture
+def database():
+    """A scratch schema in the database named by TEST_DB_NAME (other settings from DB_*)"""
+    if not os.getenv('TEST_DB_NAME'):
+        pytest.skip('TEST_DB_NAME is not set')
+    schema = f"backfill_test_{uuid.uuid4().hex[:8]}"
+    config = dict(db_config_from_env(), database=os.getenv('TEST_DB_NAME'))
+    conn = psycopg2.connect(**config)
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+        cursor.execute(
+            f"CREATE TABLE {schema}.transactions (id uuid PRIMARY KEY, description text, category varchar(50), "
+            f"updated_at timestamptz NOT NULL DEFAULT now())"
+        )
+    conn.commit()
+    try:
+        yield conn, dict(config, options=f"-c search_path={schema}"), schema
+    finally:
+        conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+def test_backfill_against_postgres(database, tmp_path):
+    conn, config, schema = database
+    rows = [(str(uuid.UUID(int=i + 1)), f"Rs {i} paid to {merchant}@okicici", 'Transfer')
+            for i, merchant in enumerate(['zomato', 'uber', 'netflix', 'apollo'] * 25)]
+    rows.append((str(uuid.UUID(int=1000)), None, 'Income'))
+    with conn.cursor() as cursor:
+        psycopg2.extras.execute_values(
+            cursor, f"INSERT INTO {schema}.transactions (id, description, category) VALUES %s", rows)
+    conn.commit()
+    state_path = str(tmp_path / 'state.json')
+
+    dry_run = CategoryBackfill(batch_size=30, dry_run=True, state_path=state_path)
+    dry_run.db_config = config
+    assert dry_run.run()['changed'] == 100
+    assert not os.path.exists(state_path)
+
+    backfill = CategoryBackfill(batch_size=30, rows_per_second=100000, state_path=state_path)
+    backfill.db_config = config
+    summary = backfill.run()
+    assert summary['updated'] == 100
+    assert backfill.load_watermark() == rows[-1][0]
+
+    categorizer = TransactionCategorizer()
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT description, category FROM {schema}.transactions")
+        stored = cursor.fetchall()
+    conn.commit()
+    assert all(category == (categorizer.categorize(description) if description else 'Income')
+               for description, category in stored)
+
+    # Resuming past the last committed id finds nothing left to do
+    resumed = CategoryBackfill(state_path=state_path)
+    resumed.db_config = config
+    assert resumed.run(resumed.load_watermark())['scanned'] == 0
@@ -0,0 +1,14 @@
+from enhanced_confidence_extractor import EnhancedConfidenceExtractor, MessageType
+
+def test_case_fold_hazards_classify_like_str_lower():
+    extractor = EnhancedConfidenceExtractor()
+    # 'debıted' only matches 'debited' once folded; the classifier never folded
+    assert extractor.classify_message("Rs 500 debıted from your bank a/c", 'VK-HDFCBK') == MessageType.OTHER
+    assert extractor.classify_message("Rs 500 debited from your bank a/c", 'VK-HDFCBK') == MessageType.TRANSACTION
+
+def test_extraction_offsets_survive_a_dotted_capital_i():
+    # 'İ' lowers to two characters; the token stream reads the folded text
+    body = "İMPS: Rs.500.00 debited from HDFC Bank A/c XX1234 to İNDIA STORES. Avl bal Rs.900.00"
+    result = EnhancedConfidenceExtractor(template_cache_size=0).extract_with_confidence(body, 'VK-HDFCBK')
+    assert result['is_transaction']
+    assert (result['amount'], result['transaction_type'], result['account_number']) == (500.0, 'debit', '1234')
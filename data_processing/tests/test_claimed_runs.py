@@ -0,0 +1,103 @@
+import threading
+import pytest
+from benchmark_memory import make_messages
+from extraction_daemon import ExtractionDaemon
+from processing_api_stub import ProcessingApiStub
+from transaction_extractor import TransactionExtractor
+
+def extractor_for(stub: ProcessingApiStub) -> TransactionExtractor:
+    extractor = TransactionExtractor(stub.base_url, fingerprint_index_path=None)
+    # The stub's failures are deliberate, so retry them without waiting
+    extractor.writer.backoff_seconds = 0
+    return extractor
+
+def test_concurrent_claimed_runs_split_the_backlog():
+    messages = make_messages(1200, 10)
+    summaries = []
+
+    def run(pipelined: bool):
+        summaries.append(extractor_for(stub).run(chunk_size=100, pipelined=pipelined, claim=True))
+
+    with ProcessingApiStub(messages) as stub:
+        threads = [threading.Thread(target=run, args=(pipelined,)) for pipelined in (False, True, False)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(summaries) == 3
+    assert all(summary['saved'] for summary in summaries)
+    assert sum(summary['processed'] for summary in summaries) == len(messages)
+    assert all(message['processed'] for message in stub.messages.values())
+    assert stub.saved_twice == []
+    assert stub.claimed() == []
+
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_failed_save_releases_unsaved_leases(pipelined):
+    messages = make_messages(1000, 11)
+
+    with ProcessingApiStub(messages, fail_after=3) as stub:
+        summary = extractor_for(stub).run(chunk_size=100, pipelined=pipelined, claim=True)
+        assert not summary['saved']
+        assert summary['processed'] == 300
+        assert stub.claimed() == []
+
+        # Released messages are claimable at once, without waiting out the lease
+        stub.fail_after = None
+        summary = extractor_for(stub).run(chunk_size=100, pipelined=pipelined, claim=True)
+
+    assert summary['saved']
+    assert summary['processed'] == 700
+    assert all(message['processed'] for message in stub.messages.values())
+    assert stub.saved_twice == []
+
+def test_daemon_job_and_manual_run_claim_by_default():
+    # The backend's daemon job and a manual run_extraction.py at the same time
+    messages = make_messages(1000, 12)
+    replies = []
+
+    with ProcessingApiStub(messages) as stub:
+        daemon = ExtractionDaemon(stub.base_url, default_chunk_size=100)
+        daemon.extractor.fingerprint_index_path = None
+        daemon.extractor.writer.backoff_seconds = 0
+        job = threading.Thread(target=lambda: replies.append(daemon.handle('{"id": "1"}')))
+        job.start()
+        extractor_for(stub).process_messages(chunk_size=100)
+        job.join()
+
+    assert replies[0]['ok']
+    assert all(message['processed'] for message in stub.messages.values())
+    assert stub.saved_twice == []
+
+def test_retried_save_after_a_lost_reply_saves_nothing_twice():
+    # The first two chunks commit but their replies are lost; the writer resends them
+    messages = make_messages(500, 13)
+
+    with ProcessingApiStub(messages, lost_replies=2) as stub:
+        summary = extractor_for(stub).run(chunk_size=100, claim=True)
+
+    assert summary['saved']
+    assert stub.lost_replies == 0
+    source_ids = [t['source_message_id'] for t in stub.transactions]
+    assert source_ids and len(source_ids) == len(set(source_ids))
+    assert all(message['processed'] for message in stub.messages.values())
+
+def test_daemon_keeps_its_options_and_one_pool_across_jobs():
+    messages = make_messages(600, 14)
+
+    with ProcessingApiStub(messages) as stub:
+        daemon = ExtractionDaemon(stub.base_url, default_workers=2, default_chunk_size=100, fast_consensus=True)
+        daemon.extractor.fingerprint_index_path = None
+        daemon.extractor.writer.backoff_seconds = 0
+        try:
+            assert daemon.extractor.confidence_extractor.fast_consensus
+            first = daemon.handle('{"id": "1", "limit": 300}')
+            pool = daemon._pool
+            second = daemon.handle('{"id": "2"}')
+            assert daemon._pool is pool and pool is not None
+        finally:
+            daemon.close()
+
+    assert first['ok'] and second['ok']
+    assert first['processed'] + second['processed'] == len(messages)
+    assert stub.saved_twice == []
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+from duplicate_matcher import DuplicateMatcher, usable_reference
+
+AT = datetime(2025, 5, 1, 12, 0, 0)
+
+def test_junk_references_are_not_usable():
+    assert usable_reference('und') is None
+    assert usable_reference('No') is None
+    assert usable_reference('512345678901') == '512345678901'
+
+def test_reference_match_is_confirmed_by_amount_type_and_window():
+    matcher = DuplicateMatcher(300)
+    assert not matcher.check_and_add('u1', 250.0, 'credit', AT, '512345678901', 'VM-BOBSMS')
+    # Same reference days later, or for another amount, is not the same transaction
+    assert not matcher.is_duplicate('u1', 250.0, 'credit', AT + timedelta(days=8), '512345678901', 'VK-BOBTXN')
+    assert not matcher.is_duplicate('u1', 99.0, 'credit', AT + timedelta(seconds=30), '512345678901', 'VK-BOBTXN')
+    assert matcher.is_duplicate('u1', 250.0, 'credit', AT + timedelta(seconds=30), '512345678901', 'VK-BOBTXN')
+
+def test_refunds_with_junk_references_from_one_sender_stay_separate():
+    matcher = DuplicateMatcher(300)
+    assert not matcher.check_and_add('u1', 250.0, 'credit', AT, 'und', 'VM-BOBSMS')
+    assert not matcher.check_and_add('u1', 99.0, 'credit', AT + timedelta(days=8), 'und', 'VM-BOBSMS')
+    assert not matcher.check_and_add('u1', 250.0, 'credit', AT + timedelta(seconds=60), 'und', 'VM-BOBSMS')
+
+def test_other_sender_within_window_is_a_duplicate_unless_references_or_accounts_conflict():
+    matcher = DuplicateMatcher(300)
+    matcher.add('u1', 40.0, 'debit', AT, None, 'VM-BOBSMS', 'XXXXXX9212')
+    assert matcher.is_duplicate('u1', 40.0, 'debit', AT + timedelta(seconds=20), None, 'VK-BOBTXN', '9212')
+    assert not matcher.is_duplicate('u1', 40.0, 'debit', AT + timedelta(seconds=20), None, 'VK-BOBTXN', 'XX4455')
+    assert not matcher.is_duplicate('u1', 40.0, 'debit', AT + timedelta(seconds=400), None, 'VK-BOBTXN', '9212')
+
+    matcher.add('u1', 60.0, 'debit', AT, '512345678901', 'VM-BOBSMS')
+    assert not matcher.is_duplicate('u1', 60.0, 'debit', AT + timedelta(seconds=20), '598765432109', 'VK-BOBTXN')
+
+def test_equal_debits_at_two_banks_are_not_duplicates():
+    matcher = DuplicateMatcher(300)
+    assert not matcher.check_and_add('u1', 500.0, 'debit', AT, None, 'VM-BOBSMS')
+    assert not matcher.check_and_add('u1', 500.0, 'debit', AT + timedelta(seconds=60), None, 'VK-HDFCBK')
+    assert not matcher.check_and_add('u1', 500.0, 'debit', AT + timedelta(seconds=90), 'und', 'AD-SBIUPI')
+    # Another sender ID of the first bank is the same debit reported again
+    assert matcher.is_duplicate('u1', 500.0, 'debit', AT + timedelta(seconds=30), None, 'VK-BOBTXN')
@@ -0,0 +1,52 @@
+import random
+from benchmark_latency import adversarial_messages, long_messages
+from benchmark_memory import make_messages
+from enhanced_confidence_extractor import EnhancedConfidenceExtractor
+
+# (body, sender, is a transaction)
+NON_TRANSACTIONS = [
+    ("123456 is your OTP for login to net banking. Never share it with anyone - BOB", 'VM-BOBSMS', False),
+    ("Your loan is ready! Rs 5,00,000 pre-approved personal loan. Apply now: https://fh.example/a", 'AD-FINHRO', False),
+    ("Congratulations! You won a prize of Rs 10000. Click here to claim now", 'AD-PROMOS', False),
+    ("You have used 90% of your 2GB daily data quota. Recharge with Rs 299 for more data - Jio", 'JM-JIOPAY', False),
+    ("Flat 50% off on all orders above Rs 499. Use coupon SAVE50. Offer valid till Sunday", 'VK-MYNTRA', False),
+    ("Dear investor, NAV of Rs 45.67 for folio 1234 growth option as on 01-05", 'VM-HDFCMF', False),
+    ("IRCTC CF has requested money through UPI. On approval Rs 540 will be debited from your bank account", 'VM-BOBSMS', False),
+    ("Your bill of Rs 449 for mobile 98XXXX1234 is due on 05-05. Pay via app to avoid late fee - Airtel", 'VK-AIRTEL', False),
+]
+
+def labelled_corpus():
+    """Templated SMS, hand-written non-transactions and unlabelled fuzz, all seeded"""
+    # Every benchmark template is a bank transaction except Jio's data usage alert
+    corpus = [(m['message_body'], m['sender'], m['sender'] != 'JE-JioPay') for m in make_messages(1500, 15)]
+    corpus += NON_TRANSACTIONS
+    rng = random.Random(15)
+    corpus += [(body, sender, None) for body, sender in long_messages(150, rng)]
+    corpus += [(body, sender, None) for body, sender in adversarial_messages(400, rng)]
+    return corpus
+
+def decision(result):
+    fields = ('is_transaction', 'amount', 'transaction_type', 'account_number', 'confidence', 'reference_id')
+    return tuple(result.get(field) for field in fields)
+
+def test_fast_consensus_matches_full_vote_on_labelled_corpus():
+    # No template cache, so every message goes through the vote
+    full = EnhancedConfidenceExtractor(template_cache_size=0)
+    fast = EnhancedConfidenceExtractor(template_cache_size=0, fast_consensus=True)
+
+    mismatches = []
+    labelled = correct_full = correct_fast = 0
+    for body, sender, label in labelled_corpus():
+        full_result = full.extract_with_confidence(body, sender)
+        fast_result = fast.extract_with_confidence(body, sender)
+        if decision(full_result) != decision(fast_result):
+            mismatches.append(body[:80])
+        if label is not None:
+            labelled += 1
+            correct_full += full_result['is_transaction'] == label
+            correct_fast += fast_result['is_transaction'] == label
+
+    assert mismatches == []
+    assert correct_fast == correct_full == labelled
+    # The mode must actually skip extractors on this corpus, or the comparison proves nothing
+    assert sum(fast.consensus_stats['skipped'].values()) > 0
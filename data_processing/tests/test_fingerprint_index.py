@@ -0,0 +1,46 @@
+from fingerprint_index import FingerprintIndex
+from transaction_extractor import TransactionExtractor
+
+BOB_UPI_DEBIT = ("Rs.40.00 debited from A/C XXXXXX9212 and credited to {payee}@okicici UPI Ref:{ref}. "
+                 "Not you? Call 18005700 -BOB")
+
+def message(message_id: str, body: str, received_at: str = '2025-04-01T10:00:00Z'):
+    return {'id': message_id, 'user_id': 'user-1', 'sender': 'VM-BOBSMS', 'message_body': body, 'received_at': received_at}
+
+def run_once(index_path: str, messages):
+    """One run's dedup: process a batch and record its fingerprints as a successful save would"""
+    extractor = TransactionExtractor('http://localhost:5000/api', fingerprint_index_path=index_path)
+    fingerprints = []
+    transactions, processed_ids, stats = extractor.process_batch(messages, new_fingerprints=fingerprints)
+    extractor.fingerprint_index.add_many(fingerprints)
+    extractor.fingerprint_index.close()
+    return transactions, stats
+
+def test_same_amount_payment_in_a_later_run_is_not_a_duplicate(tmp_path):
+    index_path = str(tmp_path / 'fingerprints.sqlite3')
+    first = message('m1', BOB_UPI_DEBIT.format(payee='zomato', ref='512345678901'))
+    later = message('m2', BOB_UPI_DEBIT.format(payee='uber', ref='598765432109'), '2025-05-01T10:00:00Z')
+
+    transactions, stats = run_once(index_path, [first])
+    assert len(transactions) == 1
+    transactions, stats = run_once(index_path, [later])
+    assert len(transactions) == 1
+    assert stats['duplicates'] == 0
+
+def test_repeated_message_in_a_later_run_is_a_duplicate(tmp_path):
+    index_path = str(tmp_path / 'fingerprints.sqlite3')
+    body = BOB_UPI_DEBIT.format(payee='zomato', ref='512345678901')
+
+    run_once(index_path, [message('m1', body)])
+    transactions, stats = run_once(index_path, [message('m2', body)])
+    assert transactions == []
+    assert stats['duplicates'] == 1
+
+def test_fingerprints_without_reference_or_timestamp_are_not_persisted(tmp_path):
+    index_path = str(tmp_path / 'fingerprints.sqlite3')
+    body = "Rs.40.00 debited from A/C XXXXXX9212 and credited to zomato@okicici. Not you? Call 18005700 -BOB"
+
+    run_once(index_path, [message('m1', body)])
+    index = FingerprintIndex(index_path)
+    assert index.conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0] == 0
+    index.close()
@@ -0,0 +1,36 @@
+from merchant_memo import MerchantMemo, merchant_key
+from transaction_categorizer import TransactionCategorizer
+
+def test_merchant_key_prefers_vpa_then_named_payee():
+    assert merchant_key('Rs 5 sent to rsp9974-1@okicici Ref 1234') == 'rsp9974-1@okicici'
+    assert merchant_key('Rs 40 debited thru UPI/511857530160 by atodariyadharme.') == 'atodariyadharme'
+    assert merchant_key('Rs 40 credited to your a/c') is None
+
+def test_aggregator_vpas_are_not_merchants():
+    assert merchant_key('Rs 100 debited to VPA paytmqr281005050101@paytm for Uber ride') is None
+    assert merchant_key('Rs 60 paid to bharatpe09876@yesbankltd') is None
+    assert merchant_key('Rs 60 paid to q123456789@ybl') is None
+
+def test_memo_is_opt_in():
+    assert TransactionCategorizer().memo is None
+    assert TransactionCategorizer(category_set='description_categories').memo is None
+
+def test_categories_through_aggregator_do_not_leak_between_merchants():
+    categorizer = TransactionCategorizer(memo_size=16)
+    assert categorizer.categorize('Rs 250 to VPA paytmqr281005050101@paytm for Zomato order') == 'Food & Dining'
+    assert categorizer.categorize('Rs 100 to VPA paytmqr281005050101@paytm for Uber ride') == 'Transport & Travel'
+
+def test_memo_persists_and_is_invalidated_by_rule_changes(tmp_path):
+    path = str(tmp_path / 'memo.sqlite3')
+    memo = MerchantMemo('rules-a', path)
+    memo.put('zomato@paytm', 'Food & Dining')
+    memo.close()
+
+    reopened = MerchantMemo('rules-a', path)
+    assert reopened.get('zomato@paytm') == 'Food & Dining'
+    assert reopened.stats()['hits'] == 1
+    reopened.close()
+
+    changed_rules = MerchantMemo('rules-b', path)
+    assert changed_rules.get('zomato@paytm') is None
+    changed_rules.close()
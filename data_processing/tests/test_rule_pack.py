@@ -0,0 +1,38 @@
+import json
+import pickle
+import rule_pack
+from enhanced_confidence_extractor import EnhancedConfidenceExtractor
+from rule_pack import RULE_PACK_PATH, load_rule_pack
+
+def write_pack(tmp_path, edit=None):
+    with open(RULE_PACK_PATH) as f:
+        rules = json.load(f)
+    if edit:
+        edit(rules)
+    path = tmp_path / 'rule_pack.json'
+    path.write_text(json.dumps(rules))
+    return str(path)
+
+def test_edited_amount_context_words_reach_the_extractors(tmp_path):
+    message = "Rs 750.00 remitted from your HDFC Bank a/c XX1234"
+    bundled = load_rule_pack()
+    edited = load_rule_pack(write_pack(tmp_path, lambda rules: rules['extraction']['amount_context_words'].append('remitted')))
+
+    assert bundled.scanner.prepare(message).scan.keyword_then_amount(bundled.amount_context_words) is None
+    match = edited.scanner.prepare(message).scan.amount_then_keyword(edited.amount_context_words)
+    assert match is not None and match[0].value == 750.0
+    extractor = EnhancedConfidenceExtractor(rule_pack=edited, template_cache_size=0)
+    assert extractor._scan_keyword_extractor(extractor.prepare(message, 'VK-HDFCBK').scan).amount == 750.0
+
+def test_cache_written_by_other_code_is_rebuilt(tmp_path, monkeypatch):
+    path = write_pack(tmp_path)
+    cache_path = path + '.cache'
+    load_rule_pack(path, cache_path)
+    with open(cache_path, 'rb') as f:
+        assert pickle.load(f)[1] == rule_pack.CODE_DIGEST
+
+    # Same pack JSON, different matcher code: the cached pack is not reused
+    monkeypatch.setattr(rule_pack, 'CODE_DIGEST', 'edited')
+    load_rule_pack(path, cache_path)
+    with open(cache_path, 'rb') as f:
+        assert pickle.load(f)[1] == 'edited'
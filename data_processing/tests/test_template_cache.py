@@ -0,0 +1,86 @@
+import random
+import sys
+import threading
+from enhanced_confidence_extractor import EnhancedConfidenceExtractor
+from template_cache import TemplateCache
+
+def run_threads(target, count: int = 6):
+    """Run target(seed) on count threads with frequent thread switches and return what they raised"""
+    errors = []
+
+    def run(seed):
+        try:
+            target(seed)
+        except Exception as e:
+            errors.append(e)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=run, args=(seed,)) for seed in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    return errors
+
+def test_shared_cache_survives_concurrent_lookups_and_evictions():
+    # api_server's request threads share one extractor, and with it one cache.
+    # Twelve templates cycling through eight slots keep evicting entries that
+    # other threads are in the middle of looking up.
+    cache = TemplateCache(max_templates=8)
+    slots = ['100.00', '1234']
+
+    def extract(seed):
+        rng = random.Random(seed)
+        for _ in range(40000):
+            key = ('vm-bobsms', f"template {rng.randint(0, 11)}")
+            if cache.lookup(key, slots) is None:
+                cache.observe(key, slots, (100.0, 'debit', '1234', 90, None), [100.0])
+
+    assert run_threads(extract) == []
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 6 * 40000
+    assert stats['templates'] == 8
+
+# The extractors split 2-2 between the two amounts, and the vote takes the larger
+FEE_TEMPLATE = "Your a/c XX4321 is debited Rs {amount}. Rs {fee} transferred to wallet. HDFC Bank Ref 512345678901"
+
+def test_cached_template_agrees_with_the_vote_whatever_the_digits():
+    full = EnhancedConfidenceExtractor(template_cache_size=0)
+    cached = EnhancedConfidenceExtractor()
+    # Learned and confirmed with the amount above the fee, then equal amounts
+    # (the votes agree: confidence 100, not the learned 90) and a fee above the
+    # amount (the tie goes to the other slot)
+    for amount, fee in [('500.00', '200.00'), ('700.00', '300.00'), ('600.00', '600.00'),
+                        ('300.00', '800.00'), ('900.00', '100.00')]:
+        body = FEE_TEMPLATE.format(amount=amount, fee=fee)
+        expected = full.extract_with_confidence(body, 'VK-HDFCBK')
+        result = cached.extract_with_confidence(body, 'VK-HDFCBK')
+        assert (result['amount'], result['confidence']) == (expected['amount'], expected['confidence'])
+
+    stats = cached.template_cache.stats()
+    assert stats['trusted_templates'] == 1
+    assert stats['hits'] == 1
+
+BALANCE_TEMPLATE = "Rs.{amount} paid from HDFC Bank A/c XX1234 to {vpa}. Avl bal Rs.{balance}"
+
+def test_cached_template_agrees_with_the_vote_whatever_the_vpa():
+    full = EnhancedConfidenceExtractor(template_cache_size=0)
+    cached = EnhancedConfidenceExtractor()
+    # Long VPAs keep the balance out of the amount's 50-character window; a short
+    # one pulls it in and the vote rejects the amount. Keywords inside a VPA
+    # (refund, credited) reach the extractors too.
+    vpas = ['rameshkumar.verylongname.shop@okhdfcbank', 'sureshkumarsharma.store123@okaxis',
+            'rameshkumar.verylongname.shop@okhdfcbank', 'lakshmanrao.bigshopstore.shop@okhdfcbank', 'ab@ybl', 'cd@ybl', 'refund.shop@paytm',
+            'credited.xy@paytm', 'marketplace.one@paytm']
+    for i, vpa in enumerate(vpas):
+        body = BALANCE_TEMPLATE.format(amount=f"{500 + i}.00", balance=f"{900 + i}.00", vpa=vpa)
+        expected = full.extract_with_confidence(body, 'VK-HDFCBK')
+        result = cached.extract_with_confidence(body, 'VK-HDFCBK')
+        fields = ('is_transaction', 'amount', 'transaction_type', 'confidence', 'reference_id')
+        assert [result.get(field) for field in fields] == [expected.get(field) for field in fields]
+
+    assert cached.template_cache.stats()['hits'] >= 1
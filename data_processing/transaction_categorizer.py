@@ -1,62 +1,67 @@
-import re
-from typing import Optional
+import json
+import hashlib
+from typing import Dict, Iterable, List, Optional
+from rule_pack import RulePack, current_rule_pack
+from merchant_memo import MerchantMemo, merchant_key, MERCHANT_MEMO_SIZE
 
 class TransactionCategorizer:
-    def __init__(self):
-        self.categories = {
-            'Food & Dining': [
-                'zomato', 'swiggy', 'dominos', 'pizza', 'burger', 'kfc', 'mcdonalds',
-                'restaurant', 'food', 'cafe', 'hotel', 'dining', 'eatery', 'bakery',
-                'subway', 'starbucks', 'dunkin', 'baskin', 'haldirams', 'barbeque'
-            ],
-            'Petrol & Fuel': [
-                'petrol', 'fuel', 'diesel', 'gas', 'pump', 'hp', 'iocl', 'bpcl',
-                'shell', 'reliance', 'essar', 'bharat petroleum'
-            ],
-            'Shopping & E-commerce': [
-                'amazon', 'flipkart', 'myntra', 'shopping', 'mall', 'store', 'purchase',
-                'nykaa', 'ajio', 'meesho', 'snapdeal', 'paytm mall', 'bigbasket'
-            ],
-            'Transport & Travel': [
-                'uber', 'ola', 'taxi', 'metro', 'bus', 'train', 'irctc', 'makemytrip',
-                'ixigo', 'travel', 'ticket', 'rapido', 'auto', 'cab', 'flight'
-            ],
-            'Utilities & Bills': [
-                'recharge', 'mobile', 'electricity', 'gas', 'water', 'bill',
-                'airtel', 'jio', 'vodafone', 'broadband', 'wifi', 'internet'
-            ],
-            'Education': [
-                'coursera', 'udemy', 'education', 'school', 'college', 'byjus',
-                'unacademy', 'course', 'tuition', 'fees', 'books'
-            ],
-            'Entertainment': [
-                'netflix', 'spotify', 'movie', 'cinema', 'entertainment', 'music',
-                'hotstar', 'prime', 'youtube', 'gaming', 'pvr', 'inox'
-            ],
-            'Healthcare': [
-                'hospital', 'doctor', 'medical', 'pharmacy', 'medicine', 'health',
-                'apollo', 'medplus', 'clinic', 'diagnostic'
-            ],
-            'Banking': [
-                'atm', 'neft', 'imps', 'minimum balance', 'charges', 'fee', 'bank',
-                'transfer', 'upi', 'rtgs', 'credited', 'debited'
-            ],
-            'Personal': [
-                'atodariyadharme', 'neetu.collation', '_fam', 'family', 'personal',
-                '8487005334_fam'
-            ]
-        }
+    def __init__(self, rule_pack: RulePack = None, category_set: str = 'categories',
+                 memo_path: Optional[str] = None, memo_size: int = 0):
+        # Category keywords come from the shared rule pack, in priority order
+        self.rule_pack = rule_pack or current_rule_pack()
+        self.categories = getattr(self.rule_pack, category_set)
+        
+        # Prebuilt automaton over every category's keywords; the earliest category among its matches wins
+        self._matcher = self.rule_pack.category_matchers[category_set]
+        self._priority = {category: i for i, category in enumerate(self.categories)}
+        # `'' in text` is always true, so a category with an empty keyword matches everything
+        self._catch_all: Optional[str] = next(
+            (category for category, keywords in self.categories.items() if '' in keywords), None)
+        
+        # Opt-in merchant -> category memo, enabled by a memo_size or a memo_path. It makes a
+        # merchant keep the category of the first description seen for it, so categorize() is
+        # then no longer a function of the description alone. Keyed by the category rules
+        # alone, so pack edits that leave these categories untouched keep the memo warm.
+        self.rules_digest = hashlib.sha256(json.dumps([category_set, self.categories]).encode()).hexdigest()
+        self.memo = None
+        if memo_size or memo_path:
+            self.memo = MerchantMemo(self.rules_digest, memo_path, memo_size or MERCHANT_MEMO_SIZE)
     
     def categorize(self, description: str) -> str:
         """Categorize transaction based on description"""
         if not description:
             return 'Others'
+        if self.memo is None:
+            return self._categorize(description)
         
-        desc_lower = description.lower()
-        
-        # Check each category
-        for category, keywords in self.categories.items():
-            if any(keyword in desc_lower for keyword in keywords):
-                return category
+        # A known merchant skips the keyword scan and keeps the category it was first given
+        merchant = merchant_key(description)
+        if merchant is None:
+            return self._categorize(description)
+        category = self.memo.get(merchant)
+        if category is None:
+            category = self._categorize(description)
+            self.memo.put(merchant, category)
+        return category
+    
+    def _categorize(self, description: str) -> str:
+        # One pass over the description finds every category with a keyword in it
+        matches = self._matcher.match(description.lower())
+        if self._catch_all is not None:
+            matches.add(self._catch_all)
+        if not matches:
+            return 'Others'
         
-        return 'Others'
\ No newline at end of file
+        # Same precedence as checking each category in order
+        return min(matches, key=self._priority.__getitem__)
+    
+    def categorize_many(self, descriptions: Iterable[str]) -> List[str]:
+        """Categorize a batch of descriptions, in order; repeated descriptions are categorized once"""
+        categorized: Dict[str, str] = {}
+        categories = []
+        for description in descriptions:
+            category = categorized.get(description)
+            if category is None:
+                category = categorized[description] = self.categorize(description)
+            categories.append(category)
+        return categories
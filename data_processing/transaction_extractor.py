@@ -1,10 +1,24 @@
 import requests
 import sys
+import math
+import os
 import re
+import queue
+import threading
+from collections import OrderedDict
+from multiprocessing import Pool
 from datetime import datetime
-from typing import Dict, List, Optional
-from enhanced_confidence_extractor import EnhancedConfidenceExtractor, MessageType
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from enhanced_confidence_extractor import EnhancedConfidenceExtractor, MessageType, TRANSACTION_TYPES, SOURCE_TEMPLATE
 from transaction_categorizer import TransactionCategorizer
+from transaction_writer import TransactionWriter
+from records import TransactionPayload
+from fingerprint_index import FingerprintIndex
+from duplicate_matcher import DuplicateMatcher, usable_reference
+from rule_pack import RulePack
+
+# Fingerprints of saved transactions, shared by every run on this machine
+FINGERPRINT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fingerprints.sqlite3')
 
 # Set UTF-8 encoding for Windows
 if sys.platform == 'win32':
@@ -12,33 +26,187 @@ if sys.platform == 'win32':
     sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
     sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
 
+class ExtractionResult:
+    """Confidence extraction for one message, computed once and reused downstream.
+    
+    A view of one row of an extract_batch result; rows of a batch share its columns.
+    """
+    
+    __slots__ = ('message', 'columns', 'row', 'transaction', 'built')
+    
+    def __init__(self, message: Dict, columns: Dict, row: int = 0):
+        self.message = message
+        self.columns = columns
+        self.row = row
+        # Payload built ahead of dedup (in a worker process), if any
+        self.transaction = None
+        self.built = False
+    
+    @property
+    def is_transaction(self) -> bool:
+        return bool(self.columns['is_transaction'][self.row])
+    
+    @property
+    def confidence(self) -> int:
+        return self.columns['confidence'][self.row]
+    
+    @property
+    def amount(self) -> Optional[float]:
+        amount = self.columns['amount'][self.row]
+        return None if math.isnan(amount) else amount
+    
+    @property
+    def transaction_type(self) -> Optional[str]:
+        return TRANSACTION_TYPES[self.columns['type'][self.row]]
+    
+    @property
+    def account_number(self) -> Optional[str]:
+        return self.columns['account'][self.row]
+    
+    @property
+    def reference_id(self) -> Optional[str]:
+        return self.columns['reference'][self.row]
+    
+    @property
+    def source(self) -> Optional[str]:
+        """None for the full vote, 'template' for a template cache hit, else the bank parser name"""
+        return self.columns['source'][self.row]
+    
+    @property
+    def user_fingerprint(self) -> Optional[str]:
+        """Per-user duplicate key, or None when the message is not a transaction"""
+        fingerprint = self.columns['fingerprint'][self.row]
+        if fingerprint is not None:
+            return f"{self.message['user_id']}_{fingerprint}"
+        return None
+    
+    @property
+    def duplicate_key(self) -> Optional[str]:
+        """User fingerprint narrowed by the reference id, the key exact duplicates are checked on"""
+        user_fingerprint = self.user_fingerprint
+        reference_id = usable_reference(self.reference_id)
+        if user_fingerprint is not None and reference_id:
+            return f"{user_fingerprint}_{reference_id}"
+        return user_fingerprint
+    
+    @property
+    def index_fingerprint(self) -> Optional[str]:
+        """Key for the cross-run fingerprint index, or None when it cannot tell payments apart.
+        
+        Common templates fingerprint to amount and type alone ("40.00___credit_"),
+        which every later payment of that amount shares; only keys carrying a
+        reference id or the message's timestamp (the fingerprint's last field)
+        are kept across runs.
+        """
+        user_fingerprint = self.user_fingerprint
+        if user_fingerprint is None:
+            return None
+        if usable_reference(self.reference_id) or not user_fingerprint.endswith('_'):
+            return self.duplicate_key
+        return None
+
+def _chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Per-process extractor used by pool workers
+_worker_extractor = None
+
+def _init_worker(api_base_url: str, fast_consensus: bool = False, rule_pack: RulePack = None,
+                 merchant_memo_path: Optional[str] = None):
+    """Preinitialise one extractor (confidence extractor + categorizer) per worker.
+    
+    With fork the rule pack arrives as the parent's compiled object, shared
+    copy-on-write, so workers start without recompiling it.
+    """
+    global _worker_extractor
+    _worker_extractor = TransactionExtractor(api_base_url, fast_consensus=fast_consensus, rule_pack=rule_pack,
+                                             merchant_memo_path=merchant_memo_path)
+
+def _extract_in_worker(messages: List[Dict]) -> List[ExtractionResult]:
+    """Extract and build the payloads for one shard of messages inside a worker"""
+    extractions = _worker_extractor.extract_many(messages)
+    for extraction in extractions:
+        extraction.transaction = _worker_extractor.build_transaction(extraction)
+        extraction.built = True
+    # Workers are terminated without cleanup, so merchants they memoised are written per shard
+    if _worker_extractor.categorizer.memo is not None:
+        _worker_extractor.categorizer.memo.flush()
+    return extractions
+
 class TransactionExtractor:
-    def __init__(self, api_base_url: str):
+    def __init__(self, api_base_url: str, fingerprint_index_path: Optional[str] = FINGERPRINT_INDEX_PATH,
+                 fast_consensus: bool = False, rule_pack: RulePack = None, merchant_memo_path: Optional[str] = None):
         self.api_base_url = api_base_url
-        self.confidence_extractor = EnhancedConfidenceExtractor()
-        self.categorizer = TransactionCategorizer()
+        self.confidence_extractor = EnhancedConfidenceExtractor(fast_consensus=fast_consensus, rule_pack=rule_pack)
+        # Both share the rule pack, loaded here (before any pool forks) if none was given
+        self.rule_pack = self.confidence_extractor.rule_pack
+        # Opt-in: with a memo path, merchants seen before skip the keyword scan and keep their first
+        # category. Each pool worker keeps its own LRU in front of the shared table.
+        self.merchant_memo_path = merchant_memo_path
+        self.categorizer = TransactionCategorizer(self.rule_pack, memo_path=merchant_memo_path)
         
         # Confidence thresholds
         self.HIGH_CONFIDENCE = 80
         self.MEDIUM_CONFIDENCE = 50
+        
+        # Messages fetched and processed per page
+        self.PAGE_SIZE = 500
+        # Chunks buffered between pipeline stages
+        self.PIPELINE_DEPTH = 2
+        # How long claimed messages stay reserved for this run
+        self.LEASE_SECONDS = 300
+        
+        # Chunked, retrying bulk-create writer over a keep-alive session
+        self.writer = TransactionWriter(api_base_url)
+        self.last_save_report = None
+        self.last_fetch_error = None
+        
+        # Cross-run duplicate index, opened on first use (None disables it)
+        self.fingerprint_index_path = fingerprint_index_path
+        self.FINGERPRINT_RETENTION_DAYS = 90
+        self._fingerprint_index = None
+        # Same transaction from another sender variant within this many seconds
+        self.DUPLICATE_WINDOW_SECONDS = 300
+    
+    @property
+    def fingerprint_index(self) -> Optional[FingerprintIndex]:
+        if self._fingerprint_index is None and self.fingerprint_index_path:
+            self._fingerprint_index = FingerprintIndex(self.fingerprint_index_path, self.FINGERPRINT_RETENTION_DAYS)
+        return self._fingerprint_index
+    
+    def extract(self, message: Dict) -> ExtractionResult:
+        """Run the confidence extractor once for a message"""
+        return self.extract_many([message])[0]
     
-    def extract_transaction_data(self, message: Dict) -> Optional[Dict]:
-        """Extract transaction data using confidence-based system"""
+    def extract_many(self, messages: List[Dict]) -> List[ExtractionResult]:
+        """Run the columnar batch extractor once over messages"""
+        columns = self.confidence_extractor.extract_batch([message['message_body'] for message in messages],
+                                                          [message.get('sender', '') for message in messages])
+        return [ExtractionResult(message, columns, row) for row, message in enumerate(messages)]
+    
+    def build_transaction(self, extraction: ExtractionResult) -> Optional[TransactionPayload]:
+        """Build the transaction payload from an existing extraction result"""
+        message = extraction.message
         message_body = message['message_body']
-        
-        # Use confidence extractor with sender info
-        sender = message.get('sender', '')
-        result = self.confidence_extractor.extract_with_confidence(message_body, sender)
+        confidence = extraction.confidence
         
         # Only process high and medium confidence transactions
-        if not result['is_transaction'] or result['confidence'] < self.MEDIUM_CONFIDENCE:
+        if not extraction.is_transaction or confidence < self.MEDIUM_CONFIDENCE:
             # Skip printing message content to avoid encoding issues
-            print(f"Skipping message (confidence: {result.get('confidence', 0)}%)")
+            print(f"Skipping message (confidence: {confidence}%)")
             return None
         
         # Log confidence level
-        confidence_level = "HIGH" if result['confidence'] >= self.HIGH_CONFIDENCE else "MEDIUM"
-        print(f"[{confidence_level} CONFIDENCE: {result['confidence']}%] Processing transaction: Rs.{result['amount']}")
+        confidence_level = "HIGH" if confidence >= self.HIGH_CONFIDENCE else "MEDIUM"
+        print(f"[{confidence_level} CONFIDENCE: {confidence}%] Processing transaction: Rs.{extraction.amount}")
         
         # Convert timestamp to proper format
         transaction_date = message['received_at']
@@ -53,75 +221,128 @@ class TransactionExtractor:
         # Categorize the transaction
         category = self.categorizer.categorize(message_body)
         
-        return {
-            'user_id': message['user_id'],
-            'source_message_id': message['id'],
-            'account_number': str(result['account_number']) if result['account_number'] else 'unknown',
-            'transaction_type': result['transaction_type'],
-            'category': category,
-            'amount': float(result['amount']),
-            'currency': 'INR',
-            'transaction_date': transaction_date.isoformat() if hasattr(transaction_date, 'isoformat') else str(transaction_date),
-            'description': message_body[:200] if message_body else '',
-            'reference_id': result['reference_id'] if result['reference_id'] else None
-        }
+        return TransactionPayload(
+            user_id=message['user_id'],
+            source_message_id=message['id'],
+            account_number=str(extraction.account_number) if extraction.account_number else 'unknown',
+            transaction_type=extraction.transaction_type,
+            category=category,
+            amount=float(extraction.amount),
+            transaction_date=transaction_date.isoformat() if hasattr(transaction_date, 'isoformat') else str(transaction_date),
+            description=message_body[:200] if message_body else '',
+            reference_id=extraction.reference_id if extraction.reference_id else None
+        )
     
     def process_single_message(self, message: Dict) -> bool:
         """Process a single message and return success status"""
-        transaction = self.extract_transaction_data(message)
+        extraction = self.extract(message)
+        index_fingerprint = extraction.index_fingerprint
+        index = self.fingerprint_index
+        if index_fingerprint is not None and index is not None and index_fingerprint in index:
+            print(f"Skipping duplicate transaction: Rs.{extraction.amount} for user {message['user_id']}")
+            return self.save_transactions([], [message['id']])
+        
+        transaction = self.build_transaction(extraction)
         transactions = [transaction] if transaction else []
         processed_message_ids = [message['id']]
         
-        return self.save_transactions(transactions, processed_message_ids)
+        if not self.save_transactions(transactions, processed_message_ids):
+            return False
+        if index_fingerprint is not None and index is not None:
+            index.add_many([index_fingerprint])
+        return True
     
-    def fetch_unprocessed_messages_with_limit(self, limit: int = None) -> List[Dict]:
-        """Fetch unprocessed messages with optional limit from API"""
-        try:
-            url = f"{self.api_base_url}/processing/messages/unprocessed"
-            if limit:
-                url += f"?limit={limit}"
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()['messages']
-        except Exception as e:
-            print(f"Error fetching messages: {e}")
-            return []
+    def fetch_unprocessed_page(self, limit: int, after: str = None) -> List[Dict]:
+        """Fetch one page of unprocessed messages ordered by id, starting after a cursor"""
+        params = {'limit': limit}
+        if after:
+            params['after'] = after
+        response = requests.get(f"{self.api_base_url}/processing/messages/unprocessed", params=params)
+        response.raise_for_status()
+        return response.json()['messages']
     
-    def save_transactions(self, transactions: List[Dict], processed_message_ids: List[str]) -> bool:
-        """Save extracted transactions to API"""
-        try:
-            payload = {
-                'transactions': transactions,
-                'processedMessageIds': processed_message_ids
-            }
-            
-            # Log sample transaction for debugging
-            if transactions:
-                print(f"Sample transaction: {transactions[0]}")
-            
-            response = requests.post(f"{self.api_base_url}/processing/transactions/bulk-create", json=payload)
-            
-            if response.status_code != 200:
-                print(f"Server error response: {response.status_code}")
-                print(f"Response body: {response.text}")
+    def iter_unprocessed_messages(self, limit: int = None, page_size: int = None) -> Iterator[Dict]:
+        """Yield unprocessed messages page by page, so only one page is held at a time"""
+        page_size = page_size or self.PAGE_SIZE
+        after = None
+        fetched = 0
+        while limit is None or fetched < limit:
+            size = page_size if limit is None else min(page_size, limit - fetched)
+            try:
+                page = self.fetch_unprocessed_page(size, after)
+            except Exception as e:
+                print(f"Error fetching messages: {e}")
+                self.last_fetch_error = str(e)
+                return
             
+            yield from page
+            fetched += len(page)
+            if len(page) < size:
+                return
+            after = page[-1]['id']
+    
+    def claim_messages(self, limit: int, lease_seconds: int = None) -> Dict:
+        """Claim up to limit unprocessed, unclaimed messages under a lease that expires on its own"""
+        payload = {'limit': limit, 'leaseSeconds': lease_seconds or self.LEASE_SECONDS}
+        response = requests.post(f"{self.api_base_url}/processing/messages/claim", json=payload)
+        response.raise_for_status()
+        return response.json()
+    
+    def release_claims(self, lease_id: str, message_ids: List[str] = None) -> bool:
+        """Give claimed messages back so another run can pick them up before the lease expires"""
+        payload = {'leaseId': lease_id}
+        if message_ids is not None:
+            payload['messageIds'] = message_ids
+        try:
+            response = requests.post(f"{self.api_base_url}/processing/messages/release", json=payload)
             response.raise_for_status()
-            
-            if transactions:
-                print(f"Saved {len(transactions)} transactions, marked {len(processed_message_ids)} messages as processed")
-            else:
-                print(f"Marked {len(processed_message_ids)} messages as processed (no transactions)")
-            
             return True
-        except requests.exceptions.RequestException as e:
-            print(f"Request error saving transactions: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"Response status: {e.response.status_code}")
-                print(f"Response body: {e.response.text}")
-            return False
         except Exception as e:
-            print(f"Unexpected error saving transactions: {e}")
+            print(f"Error releasing claimed messages: {e}")
+            return False
+    
+    def iter_claimed_pages(self, limit: int = None, page_size: int = None, leases: Dict[str, List[str]] = None) -> Iterator[List[Dict]]:
+        """Yield pages of messages claimed for this run, recording each page's lease in leases"""
+        page_size = page_size or self.PAGE_SIZE
+        claimed = 0
+        while limit is None or claimed < limit:
+            size = page_size if limit is None else min(page_size, limit - claimed)
+            try:
+                claim = self.claim_messages(size)
+            except Exception as e:
+                print(f"Error claiming messages: {e}")
+                self.last_fetch_error = str(e)
+                return
+            
+            page = claim['messages']
+            if not page:
+                return
+            if leases is not None:
+                leases[claim['leaseId']] = [message['id'] for message in page]
+            yield page
+            claimed += len(page)
+            if len(page) < size:
+                return
+    
+    def save_transactions(self, transactions: List[TransactionPayload], processed_message_ids: List[str]) -> bool:
+        """Save extracted transactions to API in chunks; the report is kept in last_save_report"""
+        # Log sample transaction for debugging
+        if transactions:
+            print(f"Sample transaction: {transactions[0]}")
+        
+        report = self.writer.write(transactions, processed_message_ids)
+        self.last_save_report = report
+        
+        if not report['success']:
+            print(f"Saved {report['saved_chunks']}/{report['chunks']} chunks before chunk {report['failed_chunk'] + 1} failed; "
+                  f"{len(report['remaining_message_ids'])} messages left to resend")
             return False
+        
+        if transactions:
+            print(f"Saved {len(transactions)} transactions, marked {len(processed_message_ids)} messages as processed")
+        else:
+            print(f"Marked {len(processed_message_ids)} messages as processed (no transactions)")
+        return True
     
     def extract_balance_from_message(self, message_body: str) -> float:
         """Extract balance from message text"""
@@ -139,98 +360,330 @@ class TransactionExtractor:
         
         return None
     
-    def update_user_balance(self, messages: List[Dict]):
+    def find_latest_balance(self, messages: List[Dict], latest: Optional[Dict] = None) -> Optional[Dict]:
+        """Return the latest balance info across messages, starting from a previous result"""
+        for message in messages:
+            balance = self.extract_balance_from_message(message['message_body'])
+            if balance:
+                message_date = message['received_at']
+                if not latest or message_date > latest['received_at']:
+                    latest = {'user_id': message['user_id'], 'balance': balance, 'received_at': message_date}
+        return latest
+    
+    def update_user_balance(self, messages: List[Dict], latest: Optional[Dict] = None):
         """Update user balance from latest message with balance info"""
         try:
             # Find latest message with balance info
-            latest_balance = None
-            latest_user_id = None
-            latest_date = None
-            
-            for message in messages:
-                balance = self.extract_balance_from_message(message['message_body'])
-                if balance:
-                    message_date = message['received_at']
-                    if not latest_date or message_date > latest_date:
-                        latest_balance = balance
-                        latest_user_id = message['user_id']
-                        latest_date = message_date
+            latest = self.find_latest_balance(messages, latest)
             
             # Update user balance if found
-            if latest_balance and latest_user_id:
+            if latest and latest['user_id']:
                 payload = {
-                    'user_id': latest_user_id,
-                    'balance': latest_balance
+                    'user_id': latest['user_id'],
+                    'balance': latest['balance']
                 }
                 response = requests.post(f"{self.api_base_url}/user/update-balance", json=payload)
                 response.raise_for_status()
-                print(f"Updated user balance: Rs.{latest_balance}")
+                print(f"Updated user balance: Rs.{latest['balance']}")
                 
         except Exception as e:
             print(f"Error updating user balance: {e}")
     
-    def process_messages(self, limit: int = None):
-        """Main processing function for batch processing"""
-        if limit:
-            print(f"Starting confidence-based transaction extraction with limit: {limit}...")
-        else:
-            print("Starting confidence-based transaction extraction for ALL messages...")
-        messages = self.fetch_unprocessed_messages_with_limit(limit)
-        
-        if not messages:
-            print("No unprocessed messages found.")
+    def extract_all(self, messages: List[Dict], workers: int = 1, pool: Pool = None):
+        """Yield an ExtractionResult per message, in order, optionally sharded over a process pool"""
+        if pool is None and (workers <= 1 or len(messages) <= 1):
+            yield from self.extract_many(messages)
             return
         
-        print(f"Processing {len(messages)} messages...")
+        # Each worker extracts whole shards, so results travel back as shared columns
+        shards = _chunked(messages, max(1, len(messages) // (workers * 4)))
+        if pool is not None:
+            for extractions in pool.imap(_extract_in_worker, shards):
+                yield from extractions
+            return
+        with self.create_pool(workers) as pool:
+            for extractions in pool.imap(_extract_in_worker, shards):
+                yield from extractions
+    
+    def create_pool(self, workers: int) -> Pool:
+        """Process pool whose workers each hold a preinitialised extractor on this extractor's rule pack"""
+        return Pool(workers, initializer=_init_worker,
+                    initargs=(self.api_base_url, self.confidence_extractor.fast_consensus, self.rule_pack,
+                              self.merchant_memo_path))
+    
+    def process_batch(self, messages: List[Dict], workers: int = 1, seen_fingerprints: set = None, pool: Pool = None,
+                      new_fingerprints: List[str] = None, duplicate_matcher: DuplicateMatcher = None):
+        """Extract each message once and dedup, bucket and build payloads from that result.
         
+        Duplicates are checked against this run (seen_fingerprints) and earlier runs
+        (the fingerprint index). Fingerprints first seen here are appended to
+        new_fingerprints, to be recorded once the batch is saved. Transactions that
+        survive the exact check are matched fuzzily (amount, type, time window,
+        account, reference id, sender) against the run's earlier transactions by
+        duplicate_matcher.
+        """
         transactions = []
         processed_message_ids = []
-        confidence_stats = {'high': 0, 'medium': 0, 'low': 0, 'skipped': 0, 'duplicates': 0}
-        seen_fingerprints = set()  # Track transaction fingerprints
+        confidence_stats = {'high': 0, 'medium': 0, 'low': 0, 'skipped': 0, 'duplicates': 0, 'template_hits': 0, 'parser_hits': 0}
+        if seen_fingerprints is None:
+            seen_fingerprints = set()  # Track transaction fingerprints
+        if duplicate_matcher is None:
+            duplicate_matcher = DuplicateMatcher(self.DUPLICATE_WINDOW_SECONDS)
+        index = self.fingerprint_index
+        if index is not None:
+            index.refresh()
         
-        for message in messages:
-            sender = message.get('sender', '')
-            result = self.confidence_extractor.extract_with_confidence(message['message_body'], sender)
+        # Results arrive in message order, so the first occurrence wins across shards
+        for extraction in self.extract_all(messages, workers, pool):
+            message = extraction.message
+            if extraction.source == SOURCE_TEMPLATE:
+                confidence_stats['template_hits'] += 1
+            elif extraction.source is not None:
+                confidence_stats['parser_hits'] += 1
             
-            # Check for duplicates using transaction fingerprint + user_id
-            if result['is_transaction'] and 'transaction_fingerprint' in result:
-                user_fingerprint = f"{message['user_id']}_{result['transaction_fingerprint']}"
-                if user_fingerprint in seen_fingerprints:
+            # Check for duplicates using transaction fingerprint + user_id (+ reference id)
+            duplicate_key = extraction.duplicate_key
+            if duplicate_key is not None:
+                index_fingerprint = extraction.index_fingerprint
+                if duplicate_key in seen_fingerprints or (index is not None and index_fingerprint is not None
+                                                          and index_fingerprint in index):
                     confidence_stats['duplicates'] += 1
-                    print(f"Skipping duplicate transaction: Rs.{result['amount']} for user {message['user_id']}")
+                    print(f"Skipping duplicate transaction: Rs.{extraction.amount} for user {message['user_id']}")
+                    processed_message_ids.append(message['id'])
+                    continue
+                seen_fingerprints.add(duplicate_key)
+                if new_fingerprints is not None and index_fingerprint is not None:
+                    new_fingerprints.append(index_fingerprint)
+            
+            # Same transaction reported again, e.g. formatted differently by another sender
+            if extraction.is_transaction and extraction.confidence >= self.MEDIUM_CONFIDENCE:
+                if duplicate_matcher.check_and_add(message['user_id'], extraction.amount, extraction.transaction_type,
+                                                   message['received_at'], extraction.reference_id, message.get('sender', ''),
+                                                   extraction.account_number):
+                    confidence_stats['duplicates'] += 1
+                    print(f"Skipping transaction reported twice: Rs.{extraction.amount} for user {message['user_id']}")
                     processed_message_ids.append(message['id'])
                     continue
-                seen_fingerprints.add(user_fingerprint)
             
             # Track confidence statistics
-            if result['confidence'] >= self.HIGH_CONFIDENCE:
+            if extraction.confidence >= self.HIGH_CONFIDENCE:
                 confidence_stats['high'] += 1
-            elif result['confidence'] >= self.MEDIUM_CONFIDENCE:
+            elif extraction.confidence >= self.MEDIUM_CONFIDENCE:
                 confidence_stats['medium'] += 1
-            elif result['confidence'] > 0:
+            elif extraction.confidence > 0:
                 confidence_stats['low'] += 1
             else:
                 confidence_stats['skipped'] += 1
             
-            transaction = self.extract_transaction_data(message)
+            transaction = extraction.transaction if extraction.built else self.build_transaction(extraction)
             if transaction:
                 transactions.append(transaction)
             processed_message_ids.append(message['id'])
         
+        return transactions, processed_message_ids, confidence_stats
+    
+    def run(self, limit: int = None, workers: int = 1, chunk_size: int = None, pipelined: bool = False,
+            progress: Callable[[Dict], None] = None, claim: bool = False, pool: Pool = None) -> Dict:
+        """Fetch, extract and save unprocessed messages chunk by chunk and return a summary.
+        
+        Memory stays bounded by a few chunks regardless of the backlog size. With
+        pipelined=True the next page is fetched and the previous chunk saved while
+        the current chunk is being extracted. progress, if given, is called with
+        the running summary after every saved chunk.
+        
+        With claim=True each chunk is a page claimed under a lease, so concurrent
+        runs split the backlog instead of repeating it. Leases of chunks that were
+        not saved are released when the run stops.
+        
+        pool, if given, is a create_pool(workers) pool that the caller keeps open
+        across runs; otherwise a run with workers > 1 starts and stops its own.
+        """
+        chunk_size = chunk_size or self.PAGE_SIZE
+        summary = {
+            'processed': 0,
+            'transactions': 0,
+            'saved': True,
+            'confidence_stats': {'high': 0, 'medium': 0, 'low': 0, 'skipped': 0, 'duplicates': 0, 'template_hits': 0, 'parser_hits': 0},
+            'template_cache': None,
+            'merchant_memo': None,
+            'latest_balance': None,
+            'fetch_error': None
+        }
+        self.last_fetch_error = None
+        seen_fingerprints = set()  # Track transaction fingerprints across chunks
+        duplicate_matcher = DuplicateMatcher(self.DUPLICATE_WINDOW_SECONDS)
+        leases = OrderedDict()  # Lease id -> message ids, for claimed chunks not yet saved
+        if claim:
+            chunks = self.iter_claimed_pages(limit, chunk_size, leases)
+            on_progress = progress
+            
+            def progress(summary: Dict):
+                # Chunks are saved in claim order, so the oldest lease is the one just saved
+                leases.popitem(last=False)
+                if on_progress:
+                    on_progress(summary)
+        else:
+            chunks = _chunked(self.iter_unprocessed_messages(limit, chunk_size), chunk_size)
+        
+        own_pool = pool is None and workers > 1
+        if own_pool:
+            pool = self.create_pool(workers)
+        try:
+            if pipelined:
+                self._run_pipelined(chunks, workers, seen_fingerprints, duplicate_matcher, pool, summary, progress)
+            else:
+                for messages in chunks:
+                    print(f"Processing {len(messages)} messages...")
+                    fingerprints = []
+                    batch = self.process_batch(messages, workers, seen_fingerprints, pool, fingerprints, duplicate_matcher)
+                    if not self._save_chunk(messages, batch, summary, progress, fingerprints):
+                        break
+        finally:
+            if own_pool:
+                pool.close()
+                pool.join()
+            for lease_id, message_ids in leases.items():
+                self.release_claims(lease_id, message_ids)
+        summary['fetch_error'] = self.last_fetch_error
+        # Pool workers keep their own caches; only hit counts come back from them
+        if workers <= 1 and self.confidence_extractor.template_cache is not None:
+            summary['template_cache'] = self.confidence_extractor.template_cache.stats()
+        if self.categorizer.memo is not None:
+            self.categorizer.memo.flush()
+            if workers <= 1:
+                summary['merchant_memo'] = self.categorizer.memo.stats()
+        return summary
+    
+    def _save_chunk(self, messages: List[Dict], batch, summary: Dict, progress: Callable[[Dict], None] = None,
+                    fingerprints: List[str] = None) -> bool:
+        """Save one extracted chunk, record its fingerprints and fold it into the run summary"""
+        transactions, processed_message_ids, chunk_stats = batch
+        for key, count in chunk_stats.items():
+            summary['confidence_stats'][key] += count
+        
+        if not self.save_transactions(transactions, processed_message_ids):
+            summary['saved'] = False
+            return False
+        
+        index = self.fingerprint_index
+        if fingerprints and index is not None:
+            index.add_many(fingerprints)
+        
+        summary['processed'] += len(messages)
+        summary['transactions'] += len(transactions)
+        summary['latest_balance'] = self.find_latest_balance(messages, summary['latest_balance'])
+        if progress:
+            progress(summary)
+        return True
+    
+    def _run_pipelined(self, chunks: Iterator[List[Dict]], workers: int, seen_fingerprints: set,
+                       duplicate_matcher: DuplicateMatcher, pool: Pool, summary: Dict,
+                       progress: Callable[[Dict], None] = None):
+        """Overlap fetching, extraction and saving with bounded queues between the stages"""
+        fetched = queue.Queue(maxsize=self.PIPELINE_DEPTH)
+        extracted = queue.Queue(maxsize=self.PIPELINE_DEPTH)
+        stop = threading.Event()
+        
+        def put(stage: queue.Queue, item) -> bool:
+            # Block for space, but give up once another stage has stopped the run
+            while not stop.is_set():
+                try:
+                    stage.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def get(stage: queue.Queue):
+            while not stop.is_set():
+                try:
+                    return stage.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return None
+        
+        def fetch():
+            for messages in chunks:
+                if not put(fetched, messages):
+                    return
+            put(fetched, None)
+        
+        def save():
+            while True:
+                item = get(extracted)
+                if item is None:
+                    return
+                messages, batch, fingerprints = item
+                if not self._save_chunk(messages, batch, summary, progress, fingerprints):
+                    stop.set()
+                    return
+        
+        fetcher = threading.Thread(target=fetch, name='extraction-fetch', daemon=True)
+        saver = threading.Thread(target=save, name='extraction-save', daemon=True)
+        fetcher.start()
+        saver.start()
+        try:
+            # Extraction stays on this thread (and the process pool, if any)
+            while True:
+                messages = get(fetched)
+                if messages is None:
+                    break
+                print(f"Processing {len(messages)} messages...")
+                fingerprints = []
+                batch = self.process_batch(messages, workers, seen_fingerprints, pool, fingerprints, duplicate_matcher)
+                if not put(extracted, (messages, batch, fingerprints)):
+                    break
+            put(extracted, None)
+            saver.join()
+        finally:
+            stop.set()
+            saver.join()
+            fetcher.join()
+    
+    def process_messages(self, limit: int = None, workers: int = 1, chunk_size: int = None, pipelined: bool = False, claim: bool = True):
+        """Main processing function for batch processing"""
+        if limit:
+            print(f"Starting confidence-based transaction extraction with limit: {limit}...")
+        else:
+            print("Starting confidence-based transaction extraction for ALL messages...")
+        
+        summary = self.run(limit, workers, chunk_size, pipelined, claim=claim)
+        confidence_stats = summary['confidence_stats']
+        
+        if not summary['processed'] and summary['saved']:
+            print("No unprocessed messages found.")
+            return
+        
         print(f"Confidence Statistics:")
         print(f"   High (80-100%): {confidence_stats['high']} transactions")
         print(f"   Medium (50-79%): {confidence_stats['medium']} transactions") 
         print(f"   Low (1-49%): {confidence_stats['low']} transactions")
         print(f"   Skipped (0%): {confidence_stats['skipped']} messages")
         print(f"   Duplicates: {confidence_stats['duplicates']} transactions")
+        template_cache = summary['template_cache']
+        if template_cache:
+            print(f"Template cache: {template_cache['hits']} hits ({template_cache['hit_rate']}%), "
+                  f"{template_cache['templates']} templates ({template_cache['trusted_templates']} trusted)")
+        else:
+            print(f"Template cache: {confidence_stats['template_hits']} hits")
+        merchant_memo = summary['merchant_memo']
+        if merchant_memo:
+            print(f"Merchant memo: {merchant_memo['hits']} hits ({merchant_memo['hit_rate']}%), "
+                  f"{merchant_memo['merchants']} merchants")
+        print(f"Bank parsers: {confidence_stats['parser_hits']} messages parsed by a sender-specific template")
+        if self.confidence_extractor.fast_consensus and workers <= 1:
+            consensus_stats = self.confidence_extractor.consensus_stats
+            skipped = ', '.join(f"{name} {count}" for name, count in consensus_stats['skipped'].items())
+            print(f"Fast consensus: {consensus_stats['messages']} votes, extractors skipped: {skipped}")
         
-        if self.save_transactions(transactions, processed_message_ids):
-            print(f"Successfully processed {len(messages)} messages, created {len(transactions)} transactions!")
-            
-            # Update user balance from latest message
-            self.update_user_balance(messages)
+        if summary['saved']:
+            print(f"Successfully processed {summary['processed']} messages, created {summary['transactions']} transactions!")
         else:
-            print("Failed to save transactions.")
+            print(f"Failed to save transactions after {summary['processed']} messages.")
+        
+        # Update user balance from latest saved message
+        if summary['latest_balance']:
+            self.update_user_balance([], summary['latest_balance'])
 
 if __name__ == "__main__":
     # Test with sample messages
@@ -0,0 +1,122 @@
+import gzip
+import json
+import time
+import requests
+from typing import Dict, List
+from records import TransactionPayload, to_json
+
+class TransactionWriter:
+    """Saves transactions to the bulk-create endpoint in chunks over one keep-alive session"""
+
+    # Status codes worth retrying; other HTTP errors fail the chunk immediately
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_base_url: str, chunk_size: int = 200, max_retries: int = 3,
+                 backoff_seconds: float = 0.5, max_backoff_seconds: float = 8.0,
+                 gzip_bodies: bool = True, gzip_min_bytes: int = 1024, timeout: float = 30):
+        self.url = f"{api_base_url}/processing/transactions/bulk-create"
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.gzip_bodies = gzip_bodies
+        self.gzip_min_bytes = gzip_min_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def chunks(self, transactions: List[TransactionPayload], processed_message_ids: List[str]) -> List[Dict]:
+        """Split a save into payloads that keep each message with its transactions"""
+        by_message: Dict[str, List[TransactionPayload]] = {}
+        processed = set(processed_message_ids)
+        orphans = []
+        for transaction in transactions:
+            message_id = transaction.source_message_id
+            if message_id in processed:
+                by_message.setdefault(message_id, []).append(transaction)
+            else:
+                orphans.append(transaction)
+
+        payloads = []
+        for i in range(0, len(processed_message_ids), self.chunk_size):
+            message_ids = processed_message_ids[i:i + self.chunk_size]
+            payloads.append({
+                'transactions': [t for message_id in message_ids for t in by_message.get(message_id, [])],
+                'processedMessageIds': message_ids
+            })
+
+        # Transactions without a processed message still need saving
+        for i in range(0, len(orphans), self.chunk_size):
+            payloads.append({'transactions': orphans[i:i + self.chunk_size], 'processedMessageIds': []})
+        return payloads
+
+    def write(self, transactions: List[TransactionPayload], processed_message_ids: List[str]) -> Dict:
+        """Send all chunks in order and stop at the first chunk that still fails after retries.
+
+        The report lists the failed chunk and the unsaved remainder, so a retry can
+        resend only what was not saved.
+        """
+        payloads = self.chunks(transactions, processed_message_ids)
+        report = {
+            'success': True,
+            'chunks': len(payloads),
+            'saved_chunks': 0,
+            'saved_transactions': 0,
+            'saved_message_ids': 0,
+            'failed_chunk': None,
+            'error': None,
+            'remaining_transactions': [],
+            'remaining_message_ids': []
+        }
+
+        for index, payload in enumerate(payloads):
+            error = self._post_with_retries(payload)
+            if error:
+                report['success'] = False
+                report['failed_chunk'] = index
+                report['error'] = error
+                for remaining in payloads[index:]:
+                    report['remaining_transactions'].extend(remaining['transactions'])
+                    report['remaining_message_ids'].extend(remaining['processedMessageIds'])
+                print(f"Failed to save chunk {index + 1}/{len(payloads)}: {error}")
+                break
+
+            report['saved_chunks'] += 1
+            report['saved_transactions'] += len(payload['transactions'])
+            report['saved_message_ids'] += len(payload['processedMessageIds'])
+
+        return report
+
+    def _post_with_retries(self, payload: Dict):
+        """POST one chunk, retrying transient failures with exponential backoff; return the error or None.
+
+        A timeout or 5xx may come after the backend committed the chunk; the retry
+        is still safe because bulk-create skips transactions whose source message
+        already has one and marking a message processed twice changes nothing.
+        """
+        # Transaction records are turned into JSON objects only here
+        body = json.dumps(payload, default=to_json).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.gzip_bodies and len(body) >= self.gzip_min_bytes:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(min(self.backoff_seconds * 2 ** (attempt - 1), self.max_backoff_seconds))
+            try:
+                response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = f"Request error: {e}"
+                continue
+
+            if response.status_code == 200:
+                return None
+
+            error = f"Server error response: {response.status_code} {response.text}"
+            if response.status_code not in self.RETRY_STATUS_CODES:
+                break
+        return error
+
+    def close(self):
+        self.session.close()